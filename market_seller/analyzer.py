@@ -1,19 +1,80 @@
-from typing import List, Optional, Dict
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, List, Dict, Optional
 
 from config import *
+from market_seller.other.inventory import NO_FREE_SLOTS, OrderRejected
+from market_seller.other.metrics import metrics
+from market_seller.other.models import MarketInfo, MarketItem
+from market_seller.other.order_dispatcher import OrderDispatcher
+from market_seller.other.order_state import OrderRecord
+from market_seller.other.snapshot_diff import SnapshotDiffEngine
+from market_seller.other.tracing import ReactionTracer
 from market_seller.other.utils import play_notification_sound, DotDict
 from other.market_changer import MarketChangesTracker
 
 
+@dataclass
+class AnalyzerParams:
+    """Пороги анализа. По умолчанию берутся из config; переопределяются при подборе на записанных данных."""
+
+    significant_price_change: int = SIGNIFICANT_PRICE_CHANGE
+    significant_active_count_change: int = SIGNIFICANT_ACTIVE_COUNT_CHANGE
+    extreme_price_change: int = EXTREME_PRICE_CHANGE
+    difference_sell_price: float = DIFFERENCE_SELL_PRICE
+    frequency: int = FREQUENCY
+    frequency_window: Optional[timedelta] = FREQUENCY_WINDOW
+    freq_sell_price: int = FREQ_SELL_PRICE
+    extreme_sell_price: int = EXTREME_SELL_PRICE
+
+
 class MarketAnalyzer:
-    def __init__(self, client, logger, bot=None):
+    def __init__(
+        self,
+        client,
+        logger,
+        bot=None,
+        params: Optional[AnalyzerParams] = None,
+        tracer: Optional[ReactionTracer] = None,
+    ):
+        self.params = params or AnalyzerParams()
+        self.tracer = tracer
         self.previous_data = {}
         self.client = client
-        self.selling_list = []
+        self.orders = client.orders  # Общее с клиентом и Telegram-ботом состояние своих ордеров
         self.bot = bot
         self.logger = logger
-        self.tracker = MarketChangesTracker(history_size=HISTORY_FREQUENT_SIZE)
-        self.price_drop_orders: Dict[str, Dict] = {}  # item_id -> {trade_id, price}
+        self.tracker = MarketChangesTracker(
+            history_size=HISTORY_FREQUENT_SIZE, window=self.params.frequency_window, frequency=self.params.frequency
+        )
+        self.dispatcher = OrderDispatcher(logger)
+        self.diff_engine = SnapshotDiffEngine()
+
+    def start(self):
+        """Запуск исполнителей ордеров."""
+        self.dispatcher.start()
+
+    async def stop(self):
+        """Ожидание поставленных ордеров и остановка исполнителей."""
+        await self.dispatcher.stop()
+
+    def export_state(self) -> Dict[str, Any]:
+        """Снимок состояния для тёплого перезапуска."""
+        return {
+            "previous_data": dict(self.previous_data),
+            "orders": self.orders.export_state(),
+            "tracker": self.tracker.export_state(),
+        }
+
+    def restore_state(self, state: Dict[str, Any]):
+        """Восстановление состояния, сохранённого export_state."""
+        self.previous_data = state["previous_data"]
+        if "orders" in state:
+            self.orders.restore_state(state["orders"])
+        if "tracker" in state:
+            self.tracker.restore_state(state["tracker"])
+        self.diff_engine.seed(self.previous_data)
 
     @staticmethod
     def _is_token_invalid(error: Exception) -> bool:
@@ -22,15 +83,32 @@ class MarketAnalyzer:
 
     async def create_sell_order(self, item_data: DotDict, price: int = DEFAULT_SELL_PRICE):
         """Создание ордера на продажу с обработкой различных сценариев."""
+        if self.client.inventory.full:
+            # Ожидание слота не занимает исполнителя: иначе ожидания остановили бы и отмены, освобождающие слоты
+            self.dispatcher.park(item_data.item_id, self._create_sell_order(item_data, price))
+            return
+        await self._create_sell_order(item_data, price)
+
+    async def _create_sell_order(self, item_data: DotDict, price: int):
         self.logger.info(self._format_order_creation_message(item_data))
 
+        trace = item_data.get("trace")
+        started = time.perf_counter()
         try:
             response = await self._execute_sell_order(item_data, price)
+            metrics.observe("order_seconds", time.perf_counter() - started, outcome="created")
+            if trace:
+                self.tracer.finish(trace, "created")
             self._handle_successful_order(item_data, price, response)
-            await self.bot.notify_order_created(item_data)
+            if self.bot:
+                # Уведомление с загрузкой картинки не должно задерживать следующие ордера
+                self.dispatcher.fire_and_forget(self.bot.notify_order_created(item_data))
             play_notification_sound()
         except Exception as e:
-            self._handle_order_creation_error(e, item_data)
+            outcome = await self._handle_order_creation_error(e, item_data)
+            metrics.observe("order_seconds", time.perf_counter() - started, outcome=outcome)
+            if trace:
+                self.tracer.finish(trace, outcome)
 
     @staticmethod
     def _format_order_creation_message(item_data: DotDict) -> str:
@@ -44,38 +122,48 @@ class MarketAnalyzer:
             item_id=item_data.item_id,
             quantity=1,
             price=price,
+            trace=item_data.get("trace"),
         )
 
     def _handle_successful_order(self, item_data: DotDict, price: int, response: dict):
         """Обработка успешного создания ордера."""
         self.logger.info(f"Ордер создан: {item_data.name} за {price}")
-        self.selling_list.append(item_data.item_id)
 
-        # Если ордер создан из-за падения цены, сохраняем его
-        if item_data.item_id in self.previous_data:
-            prev_info = self.previous_data[item_data.item_id]
-            if prev_info.highest_price / price <= DIFFERENCE_SELL_PRICE:
+        # Ордер уже записан клиентом; если он создан из-за падения цены, отмечаем это.
+        # Предыдущая цена берётся из намерения: к моменту исполнения previous_data уже обновлён
+        previous_highest_price = item_data.get("previous_highest_price")
+        if previous_highest_price:
+            if previous_highest_price / price <= self.params.difference_sell_price:
                 trade_id = response["createSellOrder"]["trade"]["tradeId"]
-                self.price_drop_orders[item_data.item_id] = {"trade_id": trade_id, "price": price}
+                self.orders.mark_price_drop(item_data.item_id)
                 self.logger.info(f"Сохранен ордер на падении цены: {item_data.name} (ID: {trade_id})")
 
         self.print_change_info(item_data)
 
-    def _handle_order_creation_error(self, error: Exception, item_data: DotDict):
-        """Обработка ошибок при создании ордера."""
+    async def _handle_order_creation_error(self, error: Exception, item_data: DotDict) -> str:
+        """Обработка ошибок при создании ордера. Возвращает исход для метрик."""
         error_message = str(error)
 
+        if isinstance(error, OrderRejected):
+            # Запрос не отправлялся: модель слотов и инвентаря уже знает, почему он бы не прошёл
+            self.logger.info(f"Ордер не отправлен для {item_data.name}: {error_message}")
+            return "rejected_locally"
+
         for error_code, message in ERROR_MAPPING.items():
             if error_code in error_message:
                 self.logger.warning(message)
-                self.selling_list.append(item_data.item_id)
-                return
+                # Нехватка слотов - общая для всех предметов, сам предмет продавать можно
+                if error_code != NO_FREE_SLOTS:
+                    self.orders.block(item_data.item_id, error_code)
+                metrics.inc("order_errors_total", code=error_code)
+                return error_code
 
         if self._is_token_invalid(error):
             self.logger.warning("Невалидный токен, обновляем...")
-            self.client.auth.refresh_token()
-        else:
-            play_notification_sound()
+            await self.client.token_manager.refresh()
+            return "invalid_token"
+        play_notification_sound()
+        return "error"
 
     def print_change_info(self, item_data: DotDict):
         """Вывод детальной информации об изменении предмета."""
@@ -91,21 +179,7 @@ class MarketAnalyzer:
         self.logger.info(change_info)
 
     @staticmethod
-    def _calculate_market_changes(current_market_info: DotDict, previous_market_info: DotDict) -> Optional[DotDict]:
-        """Расчет изменений на рынке для конкретного предмета."""
-        if not (current_market_info.last_sold_price and previous_market_info.last_sold_price):
-            return None
-
-        price_change = current_market_info.last_sold_price - previous_market_info.last_sold_price
-        active_count_change = previous_market_info.active_listings - current_market_info.active_listings
-
-        last_sold_date = current_market_info.last_sold_at
-        prev_last_sold_date = previous_market_info.last_sold_at
-
-        return (abs(price_change) > 0 or active_count_change > 0) and last_sold_date != prev_last_sold_date
-
-    @staticmethod
-    def _prepare_change_data(item: DotDict, market_info: DotDict, previous_market_info: DotDict) -> DotDict:
+    def _prepare_change_data(item: MarketItem, market_info: MarketInfo, previous_market_info: MarketInfo) -> DotDict:
         """Подготовка данных об изменениях."""
         return DotDict(
             {
@@ -118,83 +192,114 @@ class MarketAnalyzer:
                 "old_price": previous_market_info.last_sold_price,
                 "active_listings": market_info.active_listings,
                 "type": item.type,
-                "owner": item.get("tags", [""])[0].split(".")[-1],
-                "active_buy_count": market_info.get("active_buy_count", 0),
+                "owner": (item.tags or ("",))[0].split(".")[-1],
+                "active_buy_count": market_info.active_buy_count,
                 "sell_range": f"{market_info.lowest_price} - {market_info.highest_price}",
                 "highest_price": market_info.highest_price,
+                "previous_highest_price": previous_market_info.highest_price,
                 "buy_range": f"{market_info.lowest_buy_price} - {market_info.highest_buy_price}",
                 "highest_buy_price": market_info.highest_buy_price,
             }
         )
 
-    async def check_and_cancel_price_drop_orders(self, item_data: DotDict, market_info: DotDict):
-        """Проверка и отмена ордеров, созданных при падении цены."""
+    def check_and_cancel_price_drop_orders(self, item_data: MarketItem, market_info: MarketInfo):
+        """Проверка и постановка в очередь отмены ордеров, созданных при падении цены."""
         item_id = item_data.item_id
-        if item_id in self.price_drop_orders:
-            order_info = self.price_drop_orders[item_id]
-            if market_info.data["highest_price"] == order_info["price"]:
-                try:
-                    await self.client.cancel_old_trade(space_id=SPACE_ID, trade_id=order_info["trade_id"])
-                    self.logger.info(
-                        f"Отменен ордер {order_info['trade_id']} для {item_data.name} "
-                        f"так как последняя цена совпадает с нашей ({order_info['price']})"
-                    )
-                    del self.price_drop_orders[item_id]
-                except Exception as e:
-                    self.logger.error(f"Ошибка при отмене ордера: {e}")
-
-    async def analyze(self, items: List[DotDict], sell_price: int = DEFAULT_SELL_PRICE):
-        """Основной метод анализа рыночных данных."""
+        order = self.orders.price_drops.get(item_id)
+        if order is not None and market_info.highest_price == order.price:
+            self.dispatcher.submit(f"cancel:{item_id}", lambda: self._cancel_price_drop_order(item_data, order))
+
+    async def _cancel_price_drop_order(self, item_data: MarketItem, order: OrderRecord):
+        """Отмена ордера, созданного при падении цены (клиент сам убирает его из хранилища)."""
+        try:
+            await self.client.cancel_old_trade(space_id=SPACE_ID, trade_id=order.trade_id)
+            self.logger.info(
+                f"Отменен ордер {order.trade_id} для {item_data.name} "
+                f"так как последняя цена совпадает с нашей ({order.price})"
+            )
+        except Exception as e:
+            self.logger.error(f"Ошибка при отмене ордера: {e}")
+
+    def _start_trace(self, change_data: DotDict, item: MarketItem, parsed_at: Optional[float]):
+        """Трасса реакции на изменение: от last_sold_at до подтверждения ордера."""
+        received_at = datetime.fromisoformat(item.market_info.recorded_at).replace(tzinfo=timezone.utc).timestamp()
+        change_data.trace = self.tracer.start(
+            item.item_id, item.name, item.market_info.last_sold_at, received_at, parsed_at or received_at
+        )
+
+    async def analyze(
+        self, items: List[MarketItem], sell_price: int = DEFAULT_SELL_PRICE, parsed_at: Optional[float] = None
+    ):
+        """
+        Основной метод анализа рыночных данных.
+        parsed_at - time.time() окончания разбора снимка, для трассировки реакции.
+        """
         significant_changes = []
+        self.orders.expire()
 
-        for item in items:
-            item_id = item.item_id
-            market_info = item.market_info
-            # Проверяем и отменяем ордера при необходимости
-            await self.check_and_cancel_price_drop_orders(item, market_info)
+        # Проверяем и отменяем ордера при необходимости
+        if self.orders.price_drops:
+            for item in items:
+                if item.item_id in self.orders.price_drops:
+                    self.check_and_cancel_price_drop_orders(item, item.market_info)
 
-            if item_id in self.previous_data:
-                previous_market_info = self.previous_data[item_id]
+        diff = self.diff_engine.diff(items, self.params.difference_sell_price)
 
-                if self._calculate_market_changes(market_info, previous_market_info):
-                    change_data = self._prepare_change_data(item, market_info, previous_market_info)
-                    significant_changes.append(change_data)
+        for position in diff.changed:
+            item = items[position]
+            change_data = self._prepare_change_data(item, item.market_info, self.previous_data[item.item_id])
+            if self.tracer:
+                self._start_trace(change_data, item, parsed_at)
+            significant_changes.append(change_data)
 
-                    if self._should_create_sell_order(change_data):
-                        await self._process_sell_order(change_data, sell_price)
+            if self._should_create_sell_order(change_data):
+                self._process_sell_order(change_data, sell_price)
 
-                if previous_market_info.highest_price / market_info.highest_price <= DIFFERENCE_SELL_PRICE:
-                    change_data = self._prepare_change_data(item, market_info, previous_market_info)
-                    await self._process_sell_order(change_data, int(market_info.highest_price * 0.9))
+        for position in diff.price_drops:
+            item = items[position]
+            change_data = self._prepare_change_data(item, item.market_info, self.previous_data[item.item_id])
+            if self.tracer:
+                self._start_trace(change_data, item, parsed_at)
+            self._process_sell_order(change_data, int(item.market_info.highest_price * 0.9))
 
-            self.previous_data[item_id] = market_info
+        self.previous_data.update((item.item_id, item.market_info) for item in items)
 
         if significant_changes:
-            frequent_changes = self.tracker.add_changes(significant_changes, FREQUENCY)
+            # Время снимка, а не текущее: при воспроизведении и бэктесте окно считается по истории
+            snapshot_time = datetime.fromisoformat(items[0].market_info.recorded_at).replace(tzinfo=timezone.utc)
+            frequent_changes = self.tracker.add_changes(
+                significant_changes, self.params.frequency, now=snapshot_time.timestamp()
+            )
             for change in significant_changes:
                 self.logger.info(self.format_log_change_message(change))
 
             if frequent_changes:
                 for change in frequent_changes:
-                    await self.create_sell_order(change, FREQ_SELL_PRICE)
+                    self._submit_sell_order(change, self.params.freq_sell_price)
         return significant_changes
 
     def _should_create_sell_order(self, change_data: DotDict) -> bool:
         """Определение необходимости создания ордера на продажу."""
         is_significant_change = (
-            change_data.get("price_change", 0) > SIGNIFICANT_PRICE_CHANGE
-            or change_data.get("active_count_change", 0) > SIGNIFICANT_ACTIVE_COUNT_CHANGE
+            change_data.get("price_change", 0) > self.params.significant_price_change
+            or change_data.get("active_count_change", 0) > self.params.significant_active_count_change
         )
-        is_not_selling = change_data.item_id not in self.selling_list
-        return is_significant_change and is_not_selling
+        is_not_selling = change_data.item_id not in self.orders
+        return is_significant_change and is_not_selling and not self.dispatcher.is_in_flight(change_data.item_id)
+
+    def _submit_sell_order(self, change_data: DotDict, price: int) -> bool:
+        """Постановка ордера на продажу в очередь исполнителей."""
+        trace = change_data.get("trace")
+        if trace and trace.decided_at is None:
+            trace.mark("decided_at")
+        return self.dispatcher.submit(change_data.item_id, lambda: self.create_sell_order(change_data, price))
 
-    async def _process_sell_order(self, change_data: DotDict, sell_price: int):
+    def _process_sell_order(self, change_data: DotDict, sell_price: int):
         """Обработка создания ордера на продажу."""
-        if change_data.get("price_change", 0) > EXTREME_PRICE_CHANGE:
-            self.selling_list.append(change_data)
-            await self.create_sell_order(change_data, EXTREME_SELL_PRICE)
+        if change_data.get("price_change", 0) > self.params.extreme_price_change:
+            self._submit_sell_order(change_data, self.params.extreme_sell_price)
         else:
-            await self.create_sell_order(change_data, sell_price)
+            self._submit_sell_order(change_data, sell_price)
 
     @staticmethod
     def format_log_change_message(change: DotDict) -> str:
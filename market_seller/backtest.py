@@ -0,0 +1,285 @@
+"""
+Бэктест решений MarketAnalyzer по таблице price_history.
+
+История читается потоком по возрастанию recorded_at, строки одного recorded_at образуют тик.
+Ордера анализатора попадают в симулированную книгу заказов: ордер исполняется, если позже
+по предмету прошла продажа не дешевле цены ордера, и снимается через MAX_AGE_MINUTES_TRADE.
+Наборы параметров считаются параллельно в отдельных процессах.
+
+    python backtest.py ubisoft_market.db
+    python backtest.py ubisoft_market.db --significant-price-change 300,500,800 --sell-price 9900,15432
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import itertools
+import logging
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+
+from config import *
+from market_seller import config
+from market_seller.analyzer import AnalyzerParams, MarketAnalyzer
+from market_seller.other.database import DatabaseManager
+from market_seller.other.models import MarketItem
+from market_seller.other.requests_params import RequestsParams
+from market_seller.other.utils import setup_logger
+from market_seller.replay import ReplayMarketClient
+
+SAMPLE_SIZE = 10000  # Сколько замеров хранить для перцентилей (выборка постоянного размера)
+
+
+@dataclass
+class SimulatedOrder:
+    trade_id: str
+    item_id: str
+    price: int
+    placed_at: datetime
+
+
+class Reservoir:
+    """Равномерная выборка постоянного размера для перцентилей по неограниченному потоку."""
+
+    def __init__(self, size: int = SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.count = 0
+        self.values: List[float] = []
+        self._rng = random.Random(seed)
+
+    def add(self, value: float):
+        self.count += 1
+        if len(self.values) < self.size:
+            self.values.append(value)
+        else:
+            index = self._rng.randrange(self.count)
+            if index < self.size:
+                self.values[index] = value
+
+    def percentile(self, p: int) -> float:
+        if not self.values:
+            return 0.0
+        if len(self.values) == 1:
+            return self.values[0]
+        return statistics.quantiles(self.values, n=100, method="inclusive")[p - 1]
+
+
+@dataclass
+class BacktestResult:
+    params: AnalyzerParams
+    sell_price: int
+    ticks: int = 0
+    rows: int = 0
+    orders: int = 0
+    filled: int = 0
+    expired: int = 0
+    cancelled: int = 0
+    revenue: float = 0.0  # Выручка исполненных ордеров за вычетом комиссии, без учёта стоимости предметов
+    analysis_ms: Reservoir = field(default_factory=Reservoir)  # Время анализа одного тика
+    detection_delay: Reservoir = field(default_factory=Reservoir)  # Продажа на рынке -> ордер, сек
+
+    @property
+    def hit_rate(self) -> float:
+        return self.filled / self.orders if self.orders else 0.0
+
+
+class BacktestClient(ReplayMarketClient):
+    """Replay-клиент, который дополнительно запоминает tradeId выданных ордеров."""
+
+    def __init__(self, logger):
+        super().__init__(logger)
+        # Исполнения и истечение ордеров моделируются по времени данных, поэтому лимит слотов настоящий
+        self.inventory.capacity = SELL_SLOTS
+        self.placed: List[Tuple[str, Dict]] = []  # (trade_id, variables) новых ордеров на продажу
+        self.cancelled: List[str] = []
+
+    async def execute_query(self, query, variables, *args, **kwargs):
+        result = await super().execute_query(query, variables, *args, **kwargs)
+        if query is RequestsParams.CREATE_SELL_ORDER_REQUEST:
+            self.placed.append((result["createSellOrder"]["trade"]["tradeId"], variables))
+        elif query is RequestsParams.CANCEL_OLD_TRADE_QUERY:
+            self.cancelled.append(variables["tradeId"])
+        return result
+
+
+def iter_ticks(db: DatabaseManager, chunk_size: int) -> Iterator[Tuple[str, List[MarketItem]]]:
+    """Строки истории, сгруппированные по recorded_at."""
+    recorded_at, items = None, []
+    for row in db.iter_price_history(chunk_size):
+        if row[-1] != recorded_at:
+            if items:
+                yield recorded_at, items
+            recorded_at, items = row[-1], []
+        items.append(MarketItem.from_history_row(row))
+    if items:
+        yield recorded_at, items
+
+
+def _to_utc(recorded_at: str) -> datetime:
+    return datetime.fromisoformat(recorded_at).replace(tzinfo=timezone.utc)
+
+
+class OrderBook:
+    def __init__(self, result: BacktestResult, max_age: timedelta):
+        self.result = result
+        self.max_age = max_age
+        self.orders: Dict[str, SimulatedOrder] = {}  # trade_id -> ордер
+        self.by_item: Dict[str, List[SimulatedOrder]] = {}
+
+    def place(self, order: SimulatedOrder):
+        self.orders[order.trade_id] = order
+        self.by_item.setdefault(order.item_id, []).append(order)
+        self.result.orders += 1
+
+    def _remove(self, order: SimulatedOrder):
+        del self.orders[order.trade_id]
+        self.by_item[order.item_id].remove(order)
+
+    def cancel(self, trade_id: str):
+        if trade_id in self.orders:
+            self._remove(self.orders[trade_id])
+            self.result.cancelled += 1
+
+    def match(self, items: List[MarketItem]) -> List[str]:
+        """Исполнение ордеров продажами, прошедшими после их выставления. Возвращает tradeId исполненных."""
+        filled = []
+        for item in items:
+            info = item.market_info
+            orders = self.by_item.get(item.item_id)
+            if not orders or not info.last_sold_at or not info.last_sold_price:
+                continue
+            for order in list(orders):
+                if info.last_sold_at > order.placed_at and info.last_sold_price >= order.price:
+                    self._remove(order)
+                    self.result.filled += 1
+                    self.result.revenue += order.price * (1 - MARKET_FEE)
+                    filled.append(order.trade_id)
+        return filled
+
+    def expire(self, now: datetime):
+        """Снятие старых ордеров, как это делает monitor_and_cancel_old_trades."""
+        for order in [order for order in self.orders.values() if now - order.placed_at > self.max_age]:
+            self._remove(order)
+            self.result.expired += 1
+
+
+async def _run(db_path: str, params: AnalyzerParams, sell_price: int, chunk_size: int) -> BacktestResult:
+    logger = setup_logger(name="market_backtest")
+    logger.setLevel(logging.WARNING)
+    config.USE_SOUND = False
+
+    result = BacktestResult(params=params, sell_price=sell_price)
+    book = OrderBook(result, timedelta(minutes=MAX_AGE_MINUTES_TRADE))
+    client = BacktestClient(logger)
+    # Ордера анализатора истекают по времени записанных данных, как и в OrderBook
+    now = datetime.fromtimestamp(0, tz=timezone.utc)  # До первого тика записанного времени ещё нет
+    client.orders.clock = lambda: now.timestamp()
+    analyzer = MarketAnalyzer(client, logger, params=params)
+    analyzer.start()
+    db = DatabaseManager(db_path)
+    try:
+        for recorded_at, items in iter_ticks(db, chunk_size):
+            now = _to_utc(recorded_at)
+            book.expire(now)
+            # Исполненные ордера освобождают слоты продажи, как после сверки с активными заказами
+            for trade_id in book.match(items):
+                client.orders.remove_trade(trade_id)
+
+            started = time.perf_counter()
+            await analyzer.analyze(items, sell_price=sell_price)
+            await analyzer.dispatcher.join()
+            result.analysis_ms.add((time.perf_counter() - started) * 1000)
+
+            last_sold = {item.item_id: item.market_info.last_sold_at for item in items}
+            for trade_id, variables in client.placed:
+                item_id = variables["tradeItems"][0]["itemId"]
+                book.place(SimulatedOrder(trade_id, item_id, variables["paymentOptions"][0]["price"], now))
+                if last_sold.get(item_id):
+                    result.detection_delay.add((now - last_sold[item_id]).total_seconds())
+            for trade_id in client.cancelled:
+                book.cancel(trade_id)
+            client.placed.clear()
+            client.cancelled.clear()
+            client.requests.clear()
+
+            result.ticks += 1
+            result.rows += len(items)
+    finally:
+        await analyzer.stop()
+        db.close_connection()
+    return result
+
+
+def run_backtest(db_path: str, params: AnalyzerParams, sell_price: int, chunk_size: int = 10000) -> BacktestResult:
+    """Один прогон; вызывается в процессе пула, поэтому создаёт свой event loop."""
+    return asyncio.run(_run(db_path, params, sell_price, chunk_size))
+
+
+def _values(text: str, cast) -> List:
+    return [cast(value) for value in text.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("db", help="Файл базы данных (ubisoft_market.db)")
+    parser.add_argument("--sell-price", default=str(SELL_PRICE), help="Значения через запятую")
+    parser.add_argument("--significant-price-change", default=str(SIGNIFICANT_PRICE_CHANGE))
+    parser.add_argument("--significant-active-count-change", default=str(SIGNIFICANT_ACTIVE_COUNT_CHANGE))
+    parser.add_argument("--extreme-price-change", default=str(EXTREME_PRICE_CHANGE))
+    parser.add_argument("--difference-sell-price", default=str(DIFFERENCE_SELL_PRICE))
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Строк истории в одной пачке чтения")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    # Индексы создаются один раз здесь, а не одновременно в каждом процессе
+    DatabaseManager(args.db).close_connection()
+
+    grid = [
+        (
+            AnalyzerParams(
+                significant_price_change=significant,
+                significant_active_count_change=active,
+                extreme_price_change=extreme,
+                difference_sell_price=difference,
+            ),
+            sell_price,
+        )
+        for significant, active, extreme, difference, sell_price in itertools.product(
+            _values(args.significant_price_change, int),
+            _values(args.significant_active_count_change, int),
+            _values(args.extreme_price_change, int),
+            _values(args.difference_sell_price, float),
+            _values(args.sell_price, int),
+        )
+    ]
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(grid))) as pool:
+        futures = [pool.submit(run_backtest, args.db, params, sell_price, args.chunk_size) for params, sell_price in grid]
+        results = [future.result() for future in futures]
+
+    for result in sorted(results, key=lambda r: r.revenue, reverse=True):
+        changed = {key: value for key, value in asdict(result.params).items() if value != getattr(AnalyzerParams(), key)}
+        print(
+            f"sell_price={result.sell_price} {changed or 'параметры по умолчанию'}\n"
+            f"  тиков {result.ticks}, строк {result.rows}, ордеров {result.orders}: исполнено {result.filled}, "
+            f"снято по сроку {result.expired}, отменено {result.cancelled}\n"
+            f"  выручка {result.revenue:.0f}, hit rate {result.hit_rate:.1%}, "
+            f"анализ тика p50 {result.analysis_ms.percentile(50):.2f} мс / p95 {result.analysis_ms.percentile(95):.2f} мс, "
+            f"задержка обнаружения p50 {result.detection_delay.percentile(50):.1f} с"
+        )
+    print(f"Наборов параметров: {len(grid)}, время: {time.perf_counter() - started:.1f} с")
+
+
+if __name__ == "__main__":
+    main()
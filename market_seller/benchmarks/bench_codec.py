@@ -0,0 +1,87 @@
+"""
+Кодирование запросов и декодирование ответов за один тик (8 страниц по 40 предметов):
+прежний путь (json.dumps всего payload с исходным многострочным запросом, json.loads ответа)
+против предкодированного минифицированного документа со stdlib json и с orjson.
+
+Запуск из папки market_seller: python benchmarks/bench_codec.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import json
+import time
+
+from market_seller.benchmarks.synthetic import make_snapshot
+from market_seller.other.codec import OrjsonCodec, StdlibCodec, encode_request, orjson
+from market_seller.other.requests_params import RequestsParams
+
+ROUNDS = 300
+PAGES = 8
+LIMIT = 40
+
+
+def page_variables(page: int) -> dict:
+    return {
+        "spaceId": "0d2ae42d-4c27-4cb7-af6c-2099062302bb",
+        "limit": LIMIT,
+        "offset": page * LIMIT,
+        "withOwnership": True,
+        "filterBy": {"types": [], "tags": [], "hideOwned": True},
+        "sortBy": {
+            "field": "ACTIVE_COUNT",
+            "orderType": "Sell",
+            "direction": "ASC",
+            "paymentItemId": "9ef71262-515b-46e8-b9a8-b6b6ad456c67",
+        },
+    }
+
+
+def tick_stdlib_payload(responses):
+    query = RequestsParams.GET_SELLABLE_ITEMS_REQUEST.value
+    for page in range(PAGES):
+        json.dumps({"query": query, "variables": page_variables(page)}).encode()
+    return [json.loads(raw) for raw in responses]
+
+
+def make_tick(json_codec):
+    def tick(responses):
+        query = RequestsParams.GET_SELLABLE_ITEMS_REQUEST
+        for page in range(PAGES):
+            encode_request(query, page_variables(page), json_codec)
+        return [json_codec.loads(raw) for raw in responses]
+
+    return tick
+
+
+def measure(name, tick, responses):
+    tick(responses)  # прогрев кэшей
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        tick(responses)
+    elapsed_ms = (time.perf_counter() - start) / ROUNDS * 1000
+    print(f"{name:<28} {elapsed_ms:8.3f} мс/тик")
+
+
+def main():
+    responses = [json.dumps({"data": page}).encode() for page in make_snapshot(PAGES, LIMIT)]
+    request_size = len(json.dumps({"query": RequestsParams.GET_SELLABLE_ITEMS_REQUEST.value, "variables": {}}))
+    minified_size = len(encode_request(RequestsParams.GET_SELLABLE_ITEMS_REQUEST, {}, StdlibCodec()))
+    print(
+        f"Страниц: {PAGES} x {LIMIT}, ответы {sum(map(len, responses)) / 1024:.1f} КБ, "
+        f"запрос без переменных {request_size} -> {minified_size} байт"
+    )
+
+    measure("json.dumps(payload)", tick_stdlib_payload, responses)
+    measure("предкодированный + json", make_tick(StdlibCodec()), responses)
+    if orjson is not None:
+        measure("предкодированный + orjson", make_tick(OrjsonCodec()), responses)
+    else:
+        print("orjson не установлен")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Стоимость DatabaseManager.insert_items_batch в зависимости от размера price_history.
+
+Таблица заполняется до 1M строк; на каждом уровне замеряется вставка снимка из 320 предметов
+(половина изменилась) и время прогрева кэша последних записей при старте.
+
+Запуск из папки market_seller: python benchmarks/bench_database.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import logging
+import random
+import tempfile
+import time
+from dataclasses import replace
+
+from market_seller.benchmarks.synthetic import make_snapshot
+from market_seller.market_client import AsyncUbisoftMarketClient
+from market_seller.other.database import DatabaseManager
+
+CATALOG_SIZE = 5000
+LEVELS = [10_000, 100_000, 1_000_000]
+ROUNDS = 20
+
+
+def fill_history(db: DatabaseManager, rows: int, rng: random.Random):
+    """Быстрое заполнение price_history синтетическими строками."""
+    cursor = db.connection.cursor()
+    current = cursor.execute("SELECT COUNT(*) FROM price_history").fetchone()[0]
+    chunk = 50_000
+    while current < rows:
+        size = min(chunk, rows - current)
+        cursor.executemany(
+            """
+            INSERT INTO price_history (
+                item_id, lowest_price, highest_price, active_listings,
+                last_sold_price, last_sold_at, lowest_buy_price,
+                highest_buy_price, active_buy_count, recorded_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+            (
+                (f"item-{rng.randrange(CATALOG_SIZE)}", 1, 2, 3, 4, "2025-01-01T00:00:00+00:00", 0, 0, 0, "x")
+                for _ in range(size)
+            ),
+        )
+        current += size
+    db.connection.commit()
+
+
+def main():
+    rng = random.Random(0)
+    client = AsyncUbisoftMarketClient.__new__(AsyncUbisoftMarketClient)
+    client.logger = logging.getLogger("bench")
+    client.catalog = {}
+    snapshot = [item for page in make_snapshot() for item in client.parse_market_data(page, "x")]
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_name = os.path.join(directory, "bench.db")
+        db = DatabaseManager(db_name)
+
+        for level in LEVELS:
+            fill_history(db, level, rng)
+            db.close_connection()
+
+            start = time.perf_counter()
+            db = DatabaseManager(db_name)
+            warmup_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            for round_number in range(ROUNDS):
+                items = [
+                    replace(item, market_info=replace(item.market_info, active_listings=round_number))
+                    if index % 2
+                    else item
+                    for index, item in enumerate(snapshot)
+                ]
+                db.insert_items_batch(items)
+            batch_ms = (time.perf_counter() - start) / ROUNDS * 1000
+
+            print(
+                f"{level:>9} строк: вставка снимка {batch_ms:7.2f} мс, "
+                f"прогрев кэша при старте {warmup_ms:8.1f} мс ({len(db.last_records)} предметов)"
+            )
+
+        db.close_connection()
+
+
+if __name__ == "__main__":
+    main()
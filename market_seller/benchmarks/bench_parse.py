@@ -0,0 +1,119 @@
+"""
+Время разбора и память одного снимка рынка (8 страниц по 40 предметов):
+старый путь через DotDict против MarketItem/MarketInfo, а также проекция hot
+(только цены, статика из кэша каталога) против полного ответа.
+
+Запуск из папки market_seller: python benchmarks/bench_parse.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import json
+import logging
+import time
+import tracemalloc
+from datetime import datetime
+
+from market_seller.benchmarks.synthetic import hot_node, make_page, make_snapshot
+from market_seller.market_client import AsyncUbisoftMarketClient
+from market_seller.other.models import CatalogEntry
+from market_seller.other.utils import DotDict
+
+ROUNDS = 200
+
+
+def parse_with_dotdict(response):
+    """Прежняя реализация parse_market_data."""
+    items = []
+    response = DotDict(response)
+    nodes = response.game.viewer.meta.marketableItems.nodes
+    for node in nodes:
+        item_data = node.item
+        market_data = node.marketData
+        sell_stats = DotDict(market_data.sellStats[0] if market_data.sellStats else {})
+        last_sold = DotDict(market_data.lastSoldAt[0] if market_data.lastSoldAt else {})
+        buy_stats = DotDict(market_data.buyStats[0] if market_data.buyStats else {})
+        if sell_stats and last_sold:
+            items.append(
+                DotDict(
+                    {
+                        "name": item_data.name,
+                        "type": item_data.type,
+                        "item_id": item_data.itemId,
+                        "tags": item_data.tags,
+                        "asset_url": item_data.assetUrl,
+                        "market_info": {
+                            "lowest_price": sell_stats.lowestPrice,
+                            "highest_price": sell_stats.highestPrice,
+                            "active_listings": sell_stats.activeCount,
+                            "last_sold_price": last_sold.price,
+                            "last_sold_at": datetime.fromisoformat(last_sold.performedAt.replace("Z", "+00:00")),
+                            "lowest_buy_price": buy_stats.get("lowest_price", 0),
+                            "highest_buy_price": buy_stats.get("highestPrice", 0),
+                            "active_buy_count": buy_stats.get("activeCount", 0),
+                            "recorded_at": datetime.utcnow().isoformat(),
+                        },
+                    }
+                )
+            )
+    return items
+
+
+def parse_with_models(client, response, recorded_at):
+    return client.parse_market_data(response, recorded_at)
+
+
+def measure(name, parse_snapshot, snapshot):
+    parse_snapshot(snapshot)  # прогрев кэшей
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        parse_snapshot(snapshot)
+    elapsed_ms = (time.perf_counter() - start) / ROUNDS * 1000
+
+    tracemalloc.start()
+    result = parse_snapshot(snapshot)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(
+        f"{name:<10} {elapsed_ms:8.3f} мс/снимок  "
+        f"память: {retained / 1024:8.1f} КБ удержано, {peak / 1024:8.1f} КБ пик  ({len(result)} предметов)"
+    )
+
+
+def hot_snapshot(snapshot):
+    """Тот же снимок в проекции hot."""
+    return [
+        make_page([hot_node(node) for node in AsyncUbisoftMarketClient._nodes(page)], len(snapshot) * 40)
+        for page in snapshot
+    ]
+
+
+def main():
+    snapshot = make_snapshot()
+    hot = hot_snapshot(snapshot)
+    client = AsyncUbisoftMarketClient.__new__(AsyncUbisoftMarketClient)
+    client.logger = logging.getLogger("bench")
+    client.catalog = {}
+
+    def parse_snapshot(pages):
+        recorded_at = datetime.utcnow().isoformat()
+        return [i for page in pages for i in parse_with_models(client, page, recorded_at)]
+
+    print(f"Ответ: full {len(json.dumps(snapshot)) / 1024:.1f} КБ, hot {len(json.dumps(hot)) / 1024:.1f} КБ")
+    measure("DotDict", lambda pages: [i for page in pages for i in parse_with_dotdict(page)], snapshot)
+    measure("MarketItem", parse_snapshot, snapshot)
+
+    for page in snapshot:
+        for node in AsyncUbisoftMarketClient._nodes(page):
+            client.catalog[node["item"]["itemId"]] = CatalogEntry.from_item(node["item"])
+    measure("hot", parse_snapshot, hot)
+
+
+if __name__ == "__main__":
+    main()
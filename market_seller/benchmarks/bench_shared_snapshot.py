@@ -0,0 +1,78 @@
+"""
+Работа главного процесса за тик полного обхода каталога (по умолчанию 50 страниц по 40 предметов):
+декодирование и разбор ответов в самом процессе против чтения SharedSnapshot (копия колонок
+под seqlock) и сборки MarketItem. Отдельно - стоимость записи страниц в процессе-опросчике.
+
+Запуск из папки market_seller: python benchmarks/bench_shared_snapshot.py [страниц]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import json
+import logging
+import time
+from datetime import datetime
+
+from market_seller.benchmarks.synthetic import make_snapshot
+from market_seller.market_client import AsyncUbisoftMarketClient
+from market_seller.other.codec import codec
+from market_seller.other.models import CatalogEntry
+from market_seller.other.shared_snapshot import SharedSnapshot, materialize
+
+ROUNDS = 50
+LIMIT = 40
+
+
+def measure(name, tick):
+    tick()  # прогрев кэшей
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        tick()
+    elapsed_ms = (time.perf_counter() - start) / ROUNDS * 1000
+    print(f"{name:<36} {elapsed_ms:8.3f} мс/тик")
+
+
+def main():
+    pages = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    snapshot = make_snapshot(pages, LIMIT)
+    raw = [json.dumps({"data": page}).encode() for page in snapshot]
+    client = AsyncUbisoftMarketClient.__new__(AsyncUbisoftMarketClient)
+    client.logger = logging.getLogger("bench")
+    client.catalog = {}
+    parsed = [client.parse_market_data(page) for page in snapshot]
+    catalog = {item.item_id: CatalogEntry(item.name, item.type, item.tags, item.asset_url) for p in parsed for item in p}
+    print(f"Страниц: {pages} x {LIMIT}, ответы {sum(map(len, raw)) / 1024:.1f} КБ")
+
+    def in_process():
+        recorded_at = datetime.utcnow().isoformat()
+        return [i for body in raw for i in client.parse_market_data(codec.loads(body)["data"], recorded_at)]
+
+    shared = SharedSnapshot.create(pages * LIMIT, 1)
+    try:
+        for page, items in enumerate(parsed):
+            shared.write_rows(page * LIMIT, items, LIMIT)
+
+        def from_shared():
+            ids, values, _ = shared.read()
+            return materialize(ids, values, catalog, datetime.utcnow().isoformat())[0]
+
+        def write_unchanged():
+            for page, items in enumerate(parsed):
+                shared.write_rows(page * LIMIT, items, LIMIT)
+
+        assert [i.market_info.fingerprint() for i in from_shared()] == [
+            i.market_info.fingerprint() for i in in_process()
+        ]
+        measure("главный: декодирование + разбор", in_process)
+        measure("главный: SharedSnapshot + MarketItem", from_shared)
+        measure("опросчик: запись без изменений", write_unchanged)
+    finally:
+        shared.close()
+
+
+if __name__ == "__main__":
+    main()
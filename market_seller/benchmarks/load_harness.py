@@ -0,0 +1,161 @@
+"""
+Нагрузочный прогон main.run_main_logic и buy_items.buy_cheap_items против mock-сервера.
+
+Выводит тики в секунду, количество запросов и объём ответов по операциям, число "Too many requests"
+и задержку реакции (сделка на рынке -> CreateSellOrder). Лог, БД и токены пишутся во
+временную папку.
+
+Запуск из папки market_seller: python benchmarks/load_harness.py --duration 30 --mode both
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from typing import List
+
+from market_seller.benchmarks.mock_server import MarketModel, MockUbisoftServer, add_server_arguments
+from market_seller.other.metrics import metrics
+
+
+def percentiles(values: List[float]) -> str:
+    if not values:
+        return "нет данных"
+    if len(values) == 1:
+        return f"{values[0] * 1000:.0f} мс"
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return f"p50 {cuts[49] * 1000:.0f} мс, p95 {cuts[94] * 1000:.0f} мс, max {max(values) * 1000:.0f} мс"
+
+
+async def run_seller(main, token_manager, server: MockUbisoftServer, duration: float, poll_token_managers=()):
+    """Запуск основной логики на duration секунд и подсчёт тиков опроса."""
+    ticks = 0
+    fetch_market_items = main.fetch_market_items
+
+    async def counted_fetch(*args):
+        nonlocal ticks
+        items = await fetch_market_items(*args)
+        ticks += 1
+        return items
+
+    poll_workers_fetch = main.PollWorkers.fetch
+
+    async def counted_poll_workers_fetch(self):
+        nonlocal ticks
+        items = await poll_workers_fetch(self)
+        ticks += 1
+        return items
+
+    main.fetch_market_items = counted_fetch
+    main.PollWorkers.fetch = counted_poll_workers_fetch
+    task = asyncio.create_task(
+        main.run_main_logic(token_manager, api_url=server.api_url, poll_token_managers=poll_token_managers)
+    )
+    await asyncio.sleep(duration)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    main.fetch_market_items = fetch_market_items
+    main.PollWorkers.fetch = poll_workers_fetch
+
+    print(f"\n=== run_main_logic, {duration:.0f} с ===")
+    print(f"Тиков: {ticks} ({ticks / duration:.2f}/с)")
+    print(metrics.render_text())
+
+
+async def run_buyer(buy_items, config, token_manager, server: MockUbisoftServer):
+    started = time.perf_counter()
+    await buy_items.buy_cheap_items(
+        token_manager,
+        config.SPACE_ID,
+        max_price=config.LIMIT_MASS_BUY_PRICE,
+        items_limit=config.ITEMS_LIMIT,
+        pages_to_fetch=config.PAGES_TO_FETCH_BUY,
+        api_url=server.api_url,
+    )
+    print(f"\n=== buy_cheap_items ===\nВремя: {(time.perf_counter() - started) * 1000:.0f} мс")
+
+
+async def main_async(args):
+    capture = os.path.abspath(args.capture) if args.capture else None
+    # Модули скрипта пишут лог и БД в текущую папку, поэтому импортируются уже во временной
+    os.chdir(tempfile.mkdtemp(prefix="market_load_"))
+    print(f"Рабочая папка: {os.getcwd()}")
+
+    import main
+    import buy_items
+    from market_seller import config
+    from market_seller.other.auth import UbisoftAuth
+    from market_seller.other.token_manager import AsyncTokenManager
+
+    server = MockUbisoftServer(
+        MarketModel(items=args.items, trade_rate=args.trade_rate, seed=args.seed, sell_slots=args.sell_slots),
+        latency=args.latency,
+        rate_limit_rps=args.rps,
+        rate_limit_burst=args.burst,
+        slow_probability=args.slow_probability,
+    )
+    await server.start()
+    if args.interval:
+        main.SLEEP_INTERVAL = args.interval
+    if capture:
+        main.CAPTURE_FILE = capture
+    main.POLL_WORKERS = args.workers
+
+    auth = UbisoftAuth("load@test.local", "password", main.logger, base_url=server.base_url, token_file="token.json")
+    token_manager = AsyncTokenManager(auth, main.logger)
+    await token_manager.basic_auth(auth.email, auth.password)
+    poll_token_managers = []
+    for index in range(1, args.accounts):
+        poll_auth = UbisoftAuth(
+            f"poll{index}@test.local", "password", main.logger, base_url=server.base_url, token_file=f"token_{index}.json"
+        )
+        poll_token_managers.append(AsyncTokenManager(poll_auth, main.logger))
+        await poll_token_managers[-1].basic_auth(poll_auth.email, poll_auth.password)
+
+    try:
+        if args.mode in ("main", "both"):
+            await run_seller(main, token_manager, server, args.duration, poll_token_managers)
+        if args.mode in ("buy", "both"):
+            await run_buyer(buy_items, config, token_manager, server)
+    finally:
+        await token_manager.close()
+        for poll_token_manager in poll_token_managers:
+            await poll_token_manager.close()
+        await server.stop()
+
+    stats = server.stats
+    print("\n=== Mock-сервер ===")
+    for operation, count in stats.requests.most_common():
+        print(f"{operation:<32} {count:>6}  {stats.response_bytes[operation] / 1024:10.1f} КБ")
+    print(f"Запросов авторизации: {stats.auth_requests}")
+    print(f"Too many requests: {stats.rate_limited}")
+    for profile in sorted({profile for profile, _ in stats.profile_requests}):
+        print(
+            f"  {profile:<24} запросов {stats.profile_requests[profile, 'query']:>5}, "
+            f"мутаций {stats.profile_requests[profile, 'mutation']:>4}, "
+            f"Too many requests {stats.profile_rate_limited[profile]:>4}"
+        )
+    print(f"Сделок на рынке: {stats.market_trades}")
+    print(f"Заказов на продажу: {stats.sell_orders} (исполнено {stats.sell_orders_filled}), на покупку: {stats.buy_orders}")
+    if stats.market_errors:
+        print("Отказы CreateSellOrder: " + ", ".join(f"{code}: {n}" for code, n in sorted(stats.market_errors.items())))
+    print(f"Задержка реакции: {percentiles(stats.reaction_latencies)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["main", "buy", "both"], default="both")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность прогона run_main_logic, сек")
+    parser.add_argument("--interval", type=float, default=None, help="Переопределить SLEEP_INTERVAL")
+    parser.add_argument("--capture", default=None, help="Записывать ответы API в файл (для replay.py)")
+    parser.add_argument("--accounts", type=int, default=1, help="Аккаунтов опроса вместе с торговым")
+    parser.add_argument("--workers", type=int, default=0, help="Процессов-опросчиков (POLL_WORKERS)")
+    add_server_arguments(parser)
+    asyncio.run(main_async(parser.parse_args()))
@@ -0,0 +1,490 @@
+"""
+Локальный mock-сервер Ubisoft: GraphQL маркета и /v3/profiles/sessions.
+
+Синтетический рынок сам генерирует сделки, сервер добавляет задержку ответа и отвечает
+"Too many requests" при превышении лимита запросов - у каждого аккаунта (email при входе)
+свой лимит, как у настоящего API, так что опрос несколькими аккаунтами проверяется локально. Используется load_harness.py, но
+может работать и отдельно:
+
+    python benchmarks/mock_server.py --port 8080 --latency 0.05 --rps 10
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import argparse
+import asyncio
+import base64
+import copy
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+from market_seller.benchmarks.synthetic import catalog_node, hot_node, make_node
+
+OPERATION_RE = re.compile(r"\b(?:query|mutation)\s+(\w+)")
+ALIAS_RE = re.compile(r"\bpage(\d+)\s*:")
+PROJECTIONS = {"Hot": hot_node, "Catalog": catalog_node}
+SORT_KEYS = {
+    "ACTIVE_COUNT": lambda node: node["marketData"]["sellStats"][0]["activeCount"],
+    "LAST_TRANSACTION_PRICE": lambda node: node["marketData"]["lastSoldAt"][0]["price"],
+}
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+def _graphql_error(message: str, status: int = 200, code: Optional[int] = None) -> web.Response:
+    error = {"message": message}
+    if code is not None:
+        error["extensions"] = {"code": code}
+    return web.json_response({"errors": [error], "data": None}, status=status)
+
+
+class MarketError(Exception):
+    """Отказ маркета с кодом из ERROR_MAPPING (нет слотов, уже продаётся)."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+@dataclass
+class MockStats:
+    requests: Counter = field(default_factory=Counter)  # Запросы по операциям GraphQL
+    response_bytes: Counter = field(default_factory=Counter)  # Байт в ответах по операциям
+    auth_requests: int = 0
+    rate_limited: int = 0
+    profile_requests: Counter = field(default_factory=Counter)  # (аккаунт, "query"/"mutation") -> запросов
+    profile_rate_limited: Counter = field(default_factory=Counter)  # Аккаунт -> ответов "Too many requests"
+    market_trades: int = 0
+    sell_orders: int = 0
+    buy_orders: int = 0
+    sell_orders_filled: int = 0
+    market_errors: Counter = field(default_factory=Counter)  # Код отказа CreateSellOrder -> количество
+    reaction_latencies: List[float] = field(default_factory=list)  # Сделка на рынке -> CreateSellOrder, сек
+
+
+class MarketModel:
+    """
+    Синтетический рынок. Сделки случайны: меняется цена последней продажи и
+    количество предложений, иногда цена прыгает достаточно сильно для создания заказа.
+    Сделка по предмету исполняет наши заказы на его продажу; sell_slots - лимит одновременно
+    выставленных заказов на продажу (None - без лимита).
+    """
+
+    def __init__(
+        self,
+        items: int = 320,
+        trade_rate: float = 2.0,
+        jump_probability: float = 0.3,
+        seed: int = 0,
+        sell_slots: Optional[int] = None,
+    ):
+        self.rng = random.Random(seed)
+        self.nodes: List[Dict] = [make_node(self.rng) for _ in range(items)]
+        self.by_id: Dict[str, Dict] = {node["item"]["itemId"]: node for node in self.nodes}
+        self.trade_rate = trade_rate
+        self.jump_probability = jump_probability
+        self.last_trade_at: Dict[str, float] = {}  # item_id -> time.monotonic() последней сделки
+        self.trades: Dict[str, Dict] = {}  # Собственные заказы: trade_id -> trade
+        self.sell_slots = sell_slots
+        self.stats = MockStats()
+
+    def step(self, dt: float):
+        """Генерация сделок за dt секунд (пуассоновский поток с интенсивностью trade_rate)."""
+        elapsed = self.rng.expovariate(self.trade_rate) if self.trade_rate > 0 else dt + 1
+        while elapsed < dt:
+            self._trade(self.rng.choice(self.nodes))
+            elapsed += self.rng.expovariate(self.trade_rate)
+
+    def _trade(self, node: Dict):
+        sell_stats = node["marketData"]["sellStats"][0]
+        last_sold = node["marketData"]["lastSoldAt"][0]
+
+        if self.rng.random() < self.jump_probability:
+            last_sold["price"] += self.rng.randint(600, 5000)
+        else:
+            last_sold["price"] = max(10, last_sold["price"] + self.rng.randint(-200, 200))
+        last_sold["performedAt"] = _now_iso()
+        sell_stats["activeCount"] = max(0, sell_stats["activeCount"] - 1) or self.rng.randint(1, 50)
+        sell_stats["highestPrice"] = max(sell_stats["highestPrice"], last_sold["price"])
+
+        self.last_trade_at[node["item"]["itemId"]] = time.monotonic()
+        self.stats.market_trades += 1
+        for trade in self.sell_trades(node["item"]["itemId"]):
+            del self.trades[trade["tradeId"]]
+            self.stats.sell_orders_filled += 1
+
+    def sell_trades(self, item_id: Optional[str] = None) -> List[Dict]:
+        return [
+            trade
+            for trade in self.trades.values()
+            if trade["category"] == "Sell" and item_id in (None, trade["tradeItems"][0]["item"]["itemId"])
+        ]
+
+    def select(
+        self, offset: int, limit: int, filter_by: Optional[Dict], sort_by: Optional[Dict] = None
+    ) -> Tuple[List[Dict], int]:
+        """Страница предметов и общее число подходящих под фильтр (totalCount)."""
+        nodes = self.nodes
+        if sort_by and sort_by.get("field") in SORT_KEYS:
+            nodes = sorted(nodes, key=SORT_KEYS[sort_by["field"]], reverse=sort_by.get("direction") == "DESC")
+        if filter_by:
+            types = set(filter_by.get("types") or ())
+            tags = set(filter_by.get("tags") or ())
+            if types:
+                nodes = [node for node in nodes if node["item"]["type"] in types]
+            if tags:
+                nodes = [node for node in nodes if tags.intersection(node["item"]["tags"])]
+        return nodes[offset : offset + limit], len(nodes)
+
+    def sellable_page(
+        self,
+        offset: int,
+        limit: int,
+        filter_by: Optional[Dict],
+        sort_by: Optional[Dict] = None,
+        projection: Optional[str] = None,
+    ) -> Dict:
+        nodes, total_count = self.select(offset, limit, filter_by, sort_by)
+        if projection:
+            nodes = [PROJECTIONS[projection](node) for node in nodes]
+        return {
+            "id": "game",
+            "viewer": {
+                "meta": {
+                    "id": "meta",
+                    "marketableItems": {"nodes": nodes, "totalCount": total_count},
+                }
+            },
+        }
+
+    def marketable_page(self, offset: int, limit: int, filter_by: Optional[Dict], sort_by: Optional[Dict] = None) -> Dict:
+        nodes = []
+        page, total_count = self.select(offset, limit, filter_by, sort_by)
+        for node in page:
+            # Все предметы рынка есть и в GetSellableItems, то есть у аккаунта они в инвентаре
+            trades = self.sell_trades(node["item"]["itemId"])
+            active_trade = None
+            if trades:
+                active_trade = {key: trades[0][key] for key in ("id", "tradeId", "state", "category", "createdAt")}
+            node = copy.copy(node)
+            node["item"] = dict(node["item"], viewer={"meta": {"id": "meta", "isOwned": True, "quantity": 1}})
+            node["viewer"] = {"meta": {"id": "meta", "activeTrade": active_trade}}
+            nodes.append(node)
+        return {"id": "game", "marketableItems": {"nodes": nodes, "totalCount": total_count}}
+
+    def create_trade(self, category: str, item_id: str, price: int) -> Dict:
+        node = self.by_id.get(item_id)
+        if node is None:
+            raise KeyError(item_id)
+
+        trade_id = str(uuid.UUID(int=self.rng.getrandbits(128)))
+        now = _now_iso()
+        self.trades[trade_id] = {
+            "id": trade_id,
+            "tradeId": trade_id,
+            "state": "Created",
+            "category": category,
+            "createdAt": now,
+            "expiresAt": now,
+            "lastModifiedAt": now,
+            "failures": [],
+            "tradeItems": [{"id": trade_id, "item": node["item"]}],
+            "payment": None,
+            "paymentOptions": [{"id": trade_id, "item": None, "price": price, "transactionFee": price // 10}],
+            "paymentProposal": None,
+        }
+        return self.trades[trade_id]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Забрать токен; возвращает 0 или время (сек) до появления следующего."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class MockUbisoftServer:
+    def __init__(
+        self,
+        model: MarketModel,
+        latency: float = 0.05,
+        rate_limit_rps: float = 10.0,
+        rate_limit_burst: int = 10,
+        step_interval: float = 0.05,
+        slow_probability: float = 0.0,
+        slow_factor: float = 20.0,
+    ):
+        self.model = model
+        self.stats = model.stats
+        self.latency = latency
+        self.rate_limit_rps = rate_limit_rps
+        self.rate_limit_burst = rate_limit_burst
+        self.step_interval = step_interval
+        self.slow_probability = slow_probability  # Доля ответов с задержкой в slow_factor раз больше (хвост)
+        self.slow_factor = slow_factor
+        self.tickets: Dict[str, str] = {}  # ticket / rememberMeTicket -> profile_id
+        self.buckets: Dict[str, TokenBucket] = {}  # profile_id -> лимит запросов
+        self.root_url = None
+        self._runner: Optional[web.AppRunner] = None
+        self._market_task: Optional[asyncio.Task] = None
+
+        self.app = web.Application()
+        self.app.router.add_post("/v3/profiles/sessions", self.handle_sessions)
+        self.app.router.add_get("/v3/profiles/me", self.handle_profile)
+        self.app.router.add_post("/v1/profiles/me/uplay/graphql", self.handle_graphql)
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.root_url}/v1/profiles/me/uplay/graphql"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.root_url}/v3"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.root_url = f"http://{host}:{port}"
+        self._market_task = asyncio.create_task(self._run_market())
+
+    async def stop(self):
+        if self._market_task:
+            self._market_task.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _run_market(self):
+        last = time.monotonic()
+        while True:
+            await asyncio.sleep(self.step_interval)
+            now = time.monotonic()
+            self.model.step(now - last)
+            last = now
+
+    async def _delay(self):
+        if self.latency:
+            latency = self.model.rng.uniform(self.latency * 0.5, self.latency * 1.5)
+            if self.model.rng.random() < self.slow_probability:
+                latency *= self.slow_factor
+            await asyncio.sleep(latency)
+
+    def _issue_ticket(self, profile_id: str) -> Dict:
+        ticket = uuid.uuid4().hex
+        remember_me = uuid.uuid4().hex
+        self.tickets[ticket] = profile_id
+        self.tickets[remember_me] = profile_id
+        return {
+            "ticket": ticket,
+            "rememberMeTicket": remember_me,
+            "sessionId": uuid.uuid4().hex,
+            "profileId": profile_id,
+            "expiration": _now_iso(),
+        }
+
+    def _profile_from_headers(self, request: web.Request) -> Optional[str]:
+        authorization = request.headers.get("Authorization", "")
+        if authorization.lower().startswith("ubi_v1 t="):
+            return self.tickets.get(authorization[len("ubi_v1 t=") :])
+        return None
+
+    async def handle_sessions(self, request: web.Request) -> web.Response:
+        self.stats.auth_requests += 1
+        await self._delay()
+        authorization = request.headers.get("Authorization", "")
+        remember_me = request.headers.get("ubi-rememberdeviceticket")
+
+        if authorization.startswith("Basic "):
+            email = base64.b64decode(authorization[len("Basic ") :]).decode().partition(":")[0]
+            return web.json_response(self._issue_ticket(email))
+        if authorization.lower().startswith("ubi_2fa_v1 t="):
+            return web.json_response(self._issue_ticket(uuid.uuid4().hex))
+
+        profile_id = self._profile_from_headers(request) or self.tickets.get(remember_me)
+        if profile_id is None:
+            return web.json_response({"errorCode": 1, "message": "Invalid ticket"}, status=401)
+        return web.json_response(self._issue_ticket(profile_id))
+
+    async def handle_profile(self, request: web.Request) -> web.Response:
+        await self._delay()
+        profile_id = self._profile_from_headers(request)
+        if profile_id is None:
+            return web.json_response({"message": "Invalid ticket"}, status=401)
+        return web.json_response({"profileId": profile_id})
+
+    async def handle_graphql(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        query, variables = payload.get("query", ""), payload.get("variables") or {}
+        match = OPERATION_RE.search(query)
+        operation = match.group(1) if match else "Unknown"
+        self.stats.requests[operation] += 1
+
+        profile_id = self._profile_from_headers(request)
+        if profile_id is None:
+            return _graphql_error("Invalid Ticket")
+
+        kind = "mutation" if query.lstrip().startswith("mutation") else "query"
+        self.stats.profile_requests[profile_id, kind] += 1
+        bucket = self.buckets.setdefault(profile_id, TokenBucket(self.rate_limit_rps, self.rate_limit_burst))
+        wait = bucket.take()
+        if wait:
+            self.stats.rate_limited += 1
+            self.stats.profile_rate_limited[profile_id] += 1
+            return _graphql_error(f"Too many requests. Try again in {max(1, round(wait))} seconds", status=429)
+
+        await self._delay()
+        handler = getattr(self, f"_op_{operation}", None)
+        if handler is None:
+            return _graphql_error(f"Unknown operation {operation}")
+        try:
+            response = web.json_response({"data": handler(query, variables)})
+            self.stats.response_bytes[operation] += len(response.body)
+            return response
+        except KeyError as e:
+            return _graphql_error(f"Not found: {e}")
+        except MarketError as e:
+            self.stats.market_errors[e.code] += 1
+            return _graphql_error(str(e), code=e.code)
+
+    def _op_GetSellableItems(self, query: str, variables: Dict, projection: Optional[str] = None) -> Dict:
+        return {
+            "game": self.model.sellable_page(
+                variables.get("offset") or 0,
+                variables["limit"],
+                variables.get("filterBy"),
+                variables.get("sortBy"),
+                projection,
+            )
+        }
+
+    def _op_GetSellableItemsBatch(self, query: str, variables: Dict, projection: Optional[str] = None) -> Dict:
+        # Переменные бывают общими ($filterBy) или своими для каждой страницы ($filterBy0, ...)
+        return {
+            f"page{i}": self.model.sellable_page(
+                variables[f"offset{i}"],
+                variables["limit"],
+                variables.get(f"filterBy{i}", variables.get("filterBy")),
+                variables.get(f"sortBy{i}", variables.get("sortBy")),
+                projection,
+            )
+            for i in sorted({int(index) for index in ALIAS_RE.findall(query)})
+        }
+
+    def _op_GetSellableItemsHot(self, query: str, variables: Dict) -> Dict:
+        return self._op_GetSellableItems(query, variables, "Hot")
+
+    def _op_GetSellableItemsHotBatch(self, query: str, variables: Dict) -> Dict:
+        return self._op_GetSellableItemsBatch(query, variables, "Hot")
+
+    def _op_GetSellableItemsCatalog(self, query: str, variables: Dict) -> Dict:
+        return self._op_GetSellableItems(query, variables, "Catalog")
+
+    def _op_GetSellableItemsCatalogBatch(self, query: str, variables: Dict) -> Dict:
+        return self._op_GetSellableItemsBatch(query, variables, "Catalog")
+
+    def _op_GetMarketableItems(self, query: str, variables: Dict) -> Dict:
+        return {
+            "game": self.model.marketable_page(
+                variables.get("offset") or 0, variables["limit"], variables.get("filterBy"), variables.get("sortBy")
+            )
+        }
+
+    def _op_GetTransactionsPending(self, query: str, variables: Dict) -> Dict:
+        offset, limit = variables.get("offset") or 0, variables["limit"]
+        nodes = list(self.model.trades.values())[offset : offset + limit]
+        return {"game": {"id": "game", "viewer": {"meta": {"id": "meta", "trades": {"nodes": nodes}}}}}
+
+    def _op_CreateSellOrder(self, query: str, variables: Dict) -> Dict:
+        item_id = variables["tradeItems"][0]["itemId"]
+        if self.model.sell_trades(item_id):
+            raise MarketError(1821, "Item is already on sale")
+        if self.model.sell_slots is not None and len(self.model.sell_trades()) >= self.model.sell_slots:
+            raise MarketError(1898, "No free sell slots")
+        trade = self.model.create_trade("Sell", item_id, variables["paymentOptions"][0]["price"])
+        self.stats.sell_orders += 1
+        traded_at = self.model.last_trade_at.get(item_id)
+        if traded_at is not None:
+            self.stats.reaction_latencies.append(time.monotonic() - traded_at)
+        return {"createSellOrder": {"trade": {"id": trade["id"], "state": trade["state"], "tradeId": trade["tradeId"]}}}
+
+    def _op_UpdateSellOrder(self, query: str, variables: Dict) -> Dict:
+        trade = self.model.trades[variables["tradeId"]]
+        trade["paymentOptions"][0]["price"] = variables["paymentOptions"][0]["price"]
+        trade["lastModifiedAt"] = _now_iso()
+        return {"updateSellOrder": {"trade": trade}}
+
+    def _op_CancelOrder(self, query: str, variables: Dict) -> Dict:
+        trade = self.model.trades.pop(variables["tradeId"])
+        trade["state"] = "Cancelled"
+        return {"cancelOrder": {"trade": trade}}
+
+    def _op_CreateBuyOrder(self, query: str, variables: Dict) -> Dict:
+        item_id = variables["tradeItems"][0]["itemId"]
+        trade = self.model.create_trade("Buy", item_id, variables["paymentProposal"]["price"])
+        self.stats.buy_orders += 1
+        return {"createBuyOrder": {"trade": {"id": trade["id"], "state": trade["state"], "tradeId": trade["tradeId"]}}}
+
+
+async def serve(args):
+    server = MockUbisoftServer(
+        MarketModel(items=args.items, trade_rate=args.trade_rate, seed=args.seed, sell_slots=args.sell_slots),
+        latency=args.latency,
+        rate_limit_rps=args.rps,
+        rate_limit_burst=args.burst,
+        slow_probability=args.slow_probability,
+    )
+    await server.start(args.host, args.port)
+    print(f"API_URL = {server.api_url}\nBASE_URL = {server.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--items", type=int, default=320, help="Количество предметов на рынке")
+    parser.add_argument("--trade-rate", type=float, default=2.0, help="Сделок в секунду на всём рынке")
+    parser.add_argument("--latency", type=float, default=0.05, help="Средняя задержка ответа, сек")
+    parser.add_argument("--rps", type=float, default=10.0, help="Лимит запросов в секунду на аккаунт")
+    parser.add_argument("--burst", type=int, default=10, help="Запас запросов сверх лимита")
+    parser.add_argument("--slow-probability", type=float, default=0.0, help="Доля очень медленных ответов")
+    parser.add_argument("--sell-slots", type=int, default=None, help="Лимит выставленных заказов на продажу")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    add_server_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,103 @@
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+ITEM_TYPES = [
+    "CharacterUniform",
+    "WeaponSkin",
+    "CharacterHeadgear",
+    "Charm",
+    "OperatorCardBackground",
+    "OperatorCardPortrait",
+    "WeaponAttachmentSkinSet",
+]
+OPERATORS = ["Ash", "Thermite", "Sledge", "Mute", "Jager", "Bandit", "Valkyrie", "Caveira"]
+
+
+def make_node(rng: random.Random, item_id: str = None) -> Dict:
+    """Узел marketableItems.nodes в формате ответа GetSellableItems."""
+    item_id = item_id or str(uuid.UUID(int=rng.getrandbits(128)))
+    lowest = rng.randint(10, 5000)
+    performed_at = datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, 86400))
+    return {
+        "item": {
+            "id": item_id,
+            "assetUrl": f"https://ubiservices.cdn.ubi.com/{item_id}.png",
+            "itemId": item_id,
+            "name": f"{rng.choice(OPERATORS)} {rng.choice(['Elite', 'Pro League', 'Black Ice', 'Gold'])}",
+            "tags": [f"Character.Operator.{rng.choice(OPERATORS)}", "rarity_epic", "Y9S1"],
+            "type": rng.choice(ITEM_TYPES),
+        },
+        "marketData": {
+            "id": item_id,
+            "sellStats": [
+                {
+                    "paymentItemId": "9ef71262-515b-46e8-b9a8-b6b6ad456c67",
+                    "lowestPrice": lowest,
+                    "highestPrice": lowest + rng.randint(0, 20000),
+                    "activeCount": rng.randint(1, 300),
+                }
+            ],
+            "lastSoldAt": [
+                {
+                    "paymentItemId": "9ef71262-515b-46e8-b9a8-b6b6ad456c67",
+                    "price": lowest + rng.randint(0, 1000),
+                    "performedAt": performed_at.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z",
+                }
+            ],
+            "buyStats": [
+                {
+                    "id": item_id,
+                    "paymentItemId": "9ef71262-515b-46e8-b9a8-b6b6ad456c67",
+                    "lowestPrice": rng.randint(10, lowest),
+                    "highestPrice": lowest,
+                    "activeCount": rng.randint(0, 50),
+                }
+            ],
+        },
+    }
+
+
+def hot_node(node: Dict) -> Dict:
+    """Узел в проекции hot: item_id и цены без служебных полей."""
+    market_data = node["marketData"]
+    return {
+        "item": {"itemId": node["item"]["itemId"]},
+        "marketData": {
+            "sellStats": [
+                {key: stats[key] for key in ("lowestPrice", "highestPrice", "activeCount")}
+                for stats in market_data["sellStats"]
+            ],
+            "lastSoldAt": [
+                {key: sale[key] for key in ("price", "performedAt")} for sale in market_data["lastSoldAt"]
+            ],
+            "buyStats": [
+                {key: stats[key] for key in ("lowestPrice", "highestPrice", "activeCount")}
+                for stats in market_data["buyStats"]
+            ],
+        },
+    }
+
+
+def catalog_node(node: Dict) -> Dict:
+    """Узел в проекции catalog: только статические поля предмета."""
+    item = node["item"]
+    return {"item": {key: item[key] for key in ("assetUrl", "itemId", "name", "tags", "type")}}
+
+
+def make_page(nodes: List[Dict], total_count: int) -> Dict:
+    """Ответ GetSellableItems (data) для одной страницы."""
+    return {
+        "game": {
+            "id": "game",
+            "viewer": {"meta": {"id": "meta", "marketableItems": {"nodes": nodes, "totalCount": total_count}}},
+        }
+    }
+
+
+def make_snapshot(pages: int = 8, items_per_page: int = 40, seed: int = 0) -> List[Dict]:
+    """Синтетический снимок рынка: pages страниц по items_per_page предметов."""
+    rng = random.Random(seed)
+    total = pages * items_per_page
+    return [make_page([make_node(rng) for _ in range(items_per_page)], total) for _ in range(pages)]
@@ -1,11 +1,13 @@
 import asyncio
 import os
+from datetime import datetime
 
 from dotenv import load_dotenv
 
-from config import SPACE_ID, ITEMS_LIMIT, LIMIT_MASS_BUY_PRICE, PAGES_TO_FETCH_BUY
+from config import API_URL, SPACE_ID, ITEMS_LIMIT, LIMIT_MASS_BUY_PRICE, PAGES_TO_FETCH_BUY
 from market_seller.market_client import AsyncUbisoftMarketClient
 from market_seller.other.auth import UbisoftAuth
+from market_seller.other.token_manager import AsyncTokenManager
 from market_seller.other.utils import setup_logger
 from other.requests_params import RequestsParams
 
@@ -26,14 +28,20 @@ async def fetch_market_items(client, space_id: str, items_limit: int, pages_to_f
     ]
 
     responses = await asyncio.gather(*tasks)
-    return [item for response in responses for item in client.parse_market_data(response)]
+    recorded_at = datetime.utcnow().isoformat()
+    return [item for response in responses for item in client.parse_market_data(response, recorded_at)]
 
 
 async def buy_cheap_items(
-    auth: UbisoftAuth, space_id: str, max_price: int = 30, items_limit: int = 100, pages_to_fetch: int = 5
+    token_manager: AsyncTokenManager,
+    space_id: str,
+    max_price: int = 30,
+    items_limit: int = 100,
+    pages_to_fetch: int = 5,
+    api_url: str = API_URL,
 ):
     """Основная логика покупки дешевых предметов."""
-    client = AsyncUbisoftMarketClient(auth=auth, logger=logger)
+    client = AsyncUbisoftMarketClient(token_manager=token_manager, logger=logger, api_url=api_url)
     await client.init_session()
 
     try:
@@ -79,35 +87,38 @@ async def buy_cheap_items(
         await client.close_session()
 
 
-async def authenticate(email: str, password: str) -> UbisoftAuth:
+async def authenticate(email: str, password: str) -> AsyncTokenManager:
     """Аутентификация пользователя."""
-    auth = UbisoftAuth(email, password, logger)
+    token_manager = AsyncTokenManager(UbisoftAuth(email, password, logger), logger)
 
-    if auth.is_token_expired():
+    if await token_manager.is_token_expired():
         logger.warning("Токен истек или недействителен. Пытаемся обновить сессию...")
-        if not auth.ensure_valid_token():
+        if not await token_manager.ensure_valid_token():
             logger.warning("Не удалось обновить сессию. Требуется ручная аутентификация.")
-            auth.basic_auth(auth.email, auth.password)
-            if auth.two_factor_ticket:
+            await token_manager.basic_auth(email, password)
+            if token_manager.auth.two_factor_ticket:
                 code = input("Введите код двухфакторной аутентификации: ")
-                auth.complete_2fa(code)
+                await token_manager.complete_2fa(code)
     else:
         logger.info("Успешная аутентификация с использованием сохраненных токенов")
 
-    return auth
+    return token_manager
 
 
 async def main():
     """Точка входа."""
-    auth = await authenticate(os.getenv("EMAIL"), os.getenv("PASSWORD"))
-
-    await buy_cheap_items(
-        auth=auth,
-        space_id=SPACE_ID,
-        max_price=LIMIT_MASS_BUY_PRICE,
-        items_limit=ITEMS_LIMIT,
-        pages_to_fetch=PAGES_TO_FETCH_BUY,
-    )
+    token_manager = await authenticate(os.getenv("EMAIL"), os.getenv("PASSWORD"))
+
+    try:
+        await buy_cheap_items(
+            token_manager=token_manager,
+            space_id=SPACE_ID,
+            max_price=LIMIT_MASS_BUY_PRICE,
+            items_limit=ITEMS_LIMIT,
+            pages_to_fetch=PAGES_TO_FETCH_BUY,
+        )
+    finally:
+        await token_manager.close()
 
 
 if __name__ == "__main__":
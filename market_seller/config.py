@@ -18,18 +18,73 @@ PAGES_TO_FETCH_BUY = 8  # Количество страниц которые п
 DEFAULT_SELL_PRICE = 9900  # Дефолтная цена. Не трогать, смысла нет
 ITEMS_LIMIT = 40  # Кол-во предметов для парсинга одной страницы (40 макс)
 PAGES_TO_FETCH = 8  # Кол-во страниц для парсинга
-TOKEN_REFRESH_INTERVAL = timedelta(minutes=15)  # Интервал обновления токена
+BATCH_PAGES_SIZE = 4  # Сколько страниц объединять в один GraphQL-запрос (1 - каждая страница отдельным запросом)
+USE_CATALOG_SCANNER = True  # Делить PAGES_TO_FETCH между горячими предметами, первыми страницами и обходом каталога
+CATALOG_HOT_PAGES = 3  # Максимум страниц за тик на точечные запросы недавно менявшихся предметов
+CATALOG_SWEEP_PAGES = 1  # Страниц за тик на фоновый обход всего каталога
+CATALOG_HOT_TTL = timedelta(minutes=10)  # Предмет без изменений дольше этого выбывает из горячих
+CATALOG_SORT_ORDERS = [  # Сортировки, по которым по очереди обходится каталог
+    ("ACTIVE_COUNT", "ASC"),
+    ("LAST_TRANSACTION_PRICE", "DESC"),
+    ("ACTIVE_COUNT", "DESC"),
+]
 TRADES_CANCEL_CHECK_INTERVAL = timedelta(minutes=5)  # Интервал проверок отмены заказов
-RESTART_INTERVAL = timedelta(minutes=60)  # Интервал обновления для перезапуска
-SLEEP_INTERVAL = 2.5  # Время между проверками
+RESTART_INTERVAL = timedelta(minutes=60)  # Интервал обновления сессии и токена (без остановки анализа)
+SLEEP_INTERVAL = 2.5  # Период опроса рынка (запросы идут с фиксированной частотой)
+SNAPSHOT_QUEUE_SIZE = 1  # Сколько снимков ждут анализа; при переполнении старый снимок отбрасывается
+MAX_CONCURRENT_REQUESTS = 8  # Максимум одновременных запросов к API
+HTTP_POOL_SIZE = MAX_CONCURRENT_REQUESTS + 2  # Соединений в пуле: запросы к API плюс загрузка картинок
+HTTP_KEEPALIVE_TIMEOUT = 75  # Сколько секунд держать простаивающее соединение открытым
+HTTP_DNS_CACHE_TTL = 300  # Сколько секунд кэшировать DNS
+HTTP_PREWARM_CONNECTIONS = MAX_CONCURRENT_REQUESTS  # Сколько соединений открыть заранее, 0 - не прогревать
+HTTP_TIMEOUTS = {  # Таймауты по классам операций, сек (параметры aiohttp.ClientTimeout)
+    "read": {"total": 10, "sock_connect": 3},
+    "mutation": {"total": 10, "sock_connect": 2},
+    "asset": {"total": 15, "sock_connect": 5},
+}
+POLL_PROJECTION = "hot"  # Запрос опроса: "hot" - только цены, статика из кэша каталога; "full" - все поля
+JSON_CODEC = "auto"  # Кодек JSON для запросов к API: "orjson", "json" или "auto" (orjson, если установлен)
+SHARE_HTTP_POOL = True  # Загружать картинки для Telegram через тот же пул, что и запросы к API
+POLL_WITH_TRADING_ACCOUNT = True  # Торговый аккаунт тоже опрашивает рынок вместе с аккаунтами опроса
+POLL_WORKERS = 0  # Процессов-опросчиков с общим снимком в разделяемой памяти; 0 - опрос в главном процессе
+POLL_WORKER_RATE_SHARE = 0.75  # Доля лимита запросов аккаунта на процессы-опросчики, остальное - ордерам
+POLL_WORKER_WAKEUP = 0.005  # Как часто (сек) главный процесс проверяет, опубликовали ли опросчики новый тик
+RATE_LIMIT_MAX_RPS = 8.0  # Максимальная частота запросов в секунду
+RATE_LIMIT_MIN_RPS = 0.5  # Ниже этой частоты не опускаемся даже после "Too many requests"
+RATE_LIMIT_BURST = 8  # Сколько запросов можно отправить пачкой
+RATE_LIMIT_RAMP_STEP = 0.2  # На сколько запросов/сек в секунду восстанавливается частота после паузы
+HEDGE_REQUESTS = True  # Дублировать медленные запросы на чтение (ордера не дублируются никогда)
+HEDGE_QUANTILE = 0.95  # Дубль отправляется, если ответа нет дольше этого квантиля времени ответа
+HEDGE_MAX_EXTRA = 0.05  # Дублей не больше этой доли от всех запросов
+HEDGE_MIN_DELAY = 0.05  # Не дублировать раньше, чем через столько секунд
+HEDGE_MIN_SAMPLES = 20  # Сколько замеров нужно, прежде чем начать дублировать
+ORDER_EXECUTORS = 4  # Сколько ордеров может выполняться одновременно
+ORDER_QUEUE_SIZE = 100  # Максимальный размер очереди ордеров
+SELL_SLOTS = 25  # Сколько ордеров на продажу аккаунт может держать одновременно
+SELL_SLOT_WAIT = 30  # Сколько секунд ордер ждёт свободного слота, прежде чем отказаться
+SELL_SLOT_RECHECK = 5  # Как часто (сек) во время ожидания слота сверяться с активными заказами
+INVENTORY_SYNC_PAGES = 3  # Страниц GetMarketableItems (владение и активные заказы) при каждой проверке заказов
+PERSIST_FLUSH_INTERVAL = 5  # Как часто (сек) сбрасывать накопленную историю цен в БД
+PERSIST_BATCH_SIZE = 2000  # Максимум записей в одной пачке вставки
+PERSIST_QUEUE_SIZE = 100  # Сколько снимков может ждать записи в БД
+STATE_FILE = "analyzer_state.pkl.gz"  # Снимок состояния анализатора для тёплого перезапуска
+STATE_SAVE_INTERVAL = timedelta(seconds=30)  # Как часто сохранять снимок состояния
+STATE_MAX_AGE = timedelta(minutes=5)  # Более старый снимок не загружается: цены уже неактуальны
+CAPTURE_FILE = None  # Файл для записи сырых ответов API (например "capture.jsonl.gz"), None - не записывать
+METRICS_PORT = 9108  # Локальный эндпоинт метрик Prometheus (http://127.0.0.1:9108/metrics), None - отключить
+TRACE_BUFFER_SIZE = 1000  # Сколько последних трасс реакции (продажа -> ордер) хранить для перцентилей
+TRACE_SLOW_THRESHOLD = 1.0  # Трасса дольше этого (от получения снимка до ответа на ордер), сек, пишется в файл
+TRACE_SLOW_FILE = "slow_traces.jsonl"  # Файл медленных трасс, None - не записывать
 RESTART_DELAY = 2  # Таймаут между перезапусками (те которые 60 минут)
 HISTORY_FREQUENT_SIZE = 5  # Сколько изменений хранить для "частых" изменений (ПОКА ВЫКЛЮЧЕНО)
 FREQUENCY = 6  # на какое число совпадений реагировать (ПОКА ВЫКЛЮЧЕНО)
+FREQUENCY_WINDOW = None  # Окно по времени для частых изменений, например timedelta(minutes=10); None - только по количеству
 
 # Параметры маркета
 SIGNIFICANT_PRICE_CHANGE = 500  # Изменение цены на которое будет срабатывать продажа
 SIGNIFICANT_ACTIVE_COUNT_CHANGE = 1  # Если больше N продаж было
 EXTREME_PRICE_CHANGE = 7000  # Выше этого изменения цены будет игнор
+MARKET_FEE = 0.1  # Комиссия маркета с продажи (для бэктеста)
 
 
 # Пути и токены
@@ -62,8 +117,10 @@ DEFAULT_MARKETABLE_SORT_DIRECTION = "DESC"
 
 # Константы
 TOKEN_FILE = "auth_token.json"
+POLL_TOKEN_FILE = "auth_token_poll_{}.json"  # Токен аккаунта опроса N (POLL_EMAIL_N и POLL_PASSWORD_N в .env)
 TOKEN_LIFETIME_HOURS = 1
 REFRESH_INTERVAL_MINUTES = 20
+TOKEN_REFRESH_AHEAD = timedelta(minutes=5)  # За сколько до истечения токена обновлять его
 
 # URL и заголовки
 BASE_URL = "https://public-ubiservices.ubi.com/v3"
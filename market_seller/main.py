@@ -7,7 +7,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 import asyncio
 import os
 import time
+from contextlib import suppress
 from datetime import datetime
+from functools import partial
 
 from dotenv import load_dotenv
 
@@ -15,101 +17,187 @@ from config import *
 from market_seller import config
 from market_seller.analyzer import MarketAnalyzer
 from market_seller.market_client import AsyncUbisoftMarketClient
+from market_seller.other.account_pool import AccountPool
 from market_seller.other.auth import UbisoftAuth
-from market_seller.other.database import DatabaseManager
+from market_seller.other.capture import CaptureWriter
+from market_seller.other.catalog_scanner import TieredCatalogScanner
+from market_seller.other.metrics import MetricsServer, metrics
+from market_seller.other.persistence import BackgroundWriter
+from market_seller.other.pipeline import FixedRatePoller
+from market_seller.other.poll_workers import PollWorkers, share_rate_limiter
+from market_seller.other.token_manager import AsyncTokenManager
 from market_seller.other.telegram import MarketTelegramBot
+from market_seller.other.tracing import ReactionTracer
+from market_seller.other.transport import HttpTransport
 from market_seller.other.utils import setup_logger, play_notification_sound
+from market_seller.other.warm_state import load_state, save_state
 
 load_dotenv()
 logger = setup_logger(name="market_script", log_file="market_script.log")
 telegram_bot = None
 
 
-def is_token_invalid_error(error_message: str) -> bool:
-    """Проверка, является ли ошибка связанной с невалидным токеном."""
-    return "Invalid Ticket".lower() in error_message.lower()
-
-
-async def handle_exception(exception, analyzer, change):
-    """Обработка различных исключений при работе с маркетом."""
-    error_message = str(exception)
+async def fetch_market_items(client, space_id: str, scanner: TieredCatalogScanner = None) -> list:
+    """Получение всех доступных для продажи предметов с ретраями."""
+    if scanner:
+        return await scanner.fetch()
+    responses = await client.get_sellable_items_pages(
+        space_id=space_id,
+        limit=ITEMS_LIMIT,
+        pages=PAGES_TO_FETCH,
+        batch_size=BATCH_PAGES_SIZE,
+    )
+    recorded_at = datetime.utcnow().isoformat()
+    with metrics.timer("stage_seconds", stage="parse"):
+        return [item for response in responses for item in client.parse_market_data(response, recorded_at)]
 
-    for error_code, message in ERROR_MAPPING.items():
-        if error_code in error_message:
-            logger.warning(message)
-            # play_notification_sound()
-            analyzer.selling_list.append(change.get("item_id"))
-            return
 
-    if is_token_invalid_error(error_message):
-        logger.warning("Ошибка: Невалидный токен, обновляем...")
-        analyzer.client.auth.refresh_token()
-    else:
-        logger.error(f"Неожиданная ошибка: {exception}")
-        play_notification_sound()
+def restore_analyzer_state(analyzer: MarketAnalyzer):
+    """Загрузка сохранённого состояния, чтобы изменения ловились уже на первом тике."""
+    try:
+        state = load_state(STATE_FILE, STATE_MAX_AGE)
+    except Exception as e:
+        logger.warning(f"Не удалось загрузить состояние анализатора: {e}")
+        return
+    if state is None:
+        logger.info("Сохранённое состояние отсутствует или устарело, начинаем с пустого")
+        return
+    analyzer.restore_state(state)
+    logger.info(f"Состояние анализатора восстановлено: {len(analyzer.previous_data)} предметов")
 
 
-async def fetch_market_items(client, space_id: str) -> list:
-    """Получение всех доступных для продажи предметов с ретраями."""
-    tasks = [
-        client.get_sellable_items(
-            space_id=space_id,
-            limit=ITEMS_LIMIT,
-            offset=i * ITEMS_LIMIT,
-        )
-        for i in range(PAGES_TO_FETCH)
-    ]
-
-    responses = await asyncio.gather(*tasks)
-    return [item for response in responses for item in client.parse_market_data(response)]
+async def save_analyzer_state(analyzer: MarketAnalyzer):
+    """Сохранение состояния анализатора в отдельном потоке."""
+    try:
+        await asyncio.to_thread(save_state, STATE_FILE, analyzer.export_state())
+    except Exception as e:
+        logger.warning(f"Не удалось сохранить состояние анализатора: {e}")
 
 
-async def run_main_logic(auth: UbisoftAuth, sell_price: int = DEFAULT_SELL_PRICE):
-    """Основная логика работы скрипта."""
+async def sync_inventory(client: AsyncUbisoftMarketClient):
+    """Обновление модели инвентаря (владение, активные заказы); ошибка не останавливает торговлю."""
+    try:
+        observed = await client.sync_inventory(SPACE_ID)
+        logger.info(f"Инвентарь обновлён: {observed} предметов")
+    except Exception as e:
+        logger.error(f"Ошибка обновления инвентаря: {e}")
+
+
+async def refresh_connections(client: AsyncUbisoftMarketClient, token_manager: AsyncTokenManager, pool=None):
+    """Обновление сессии и токена на месте вместо полного перезапуска."""
+    started = time.perf_counter()
+    await client.refresh_session()
+    await token_manager.refresh()
+    if pool:
+        # Токены аккаунтов опроса обновляет их собственный AsyncTokenManager в фоне
+        await pool.refresh_sessions()
+    logger.info(f"Сессия и токен обновлены за {(time.perf_counter() - started) * 1000:.1f} мс")
+
+
+async def run_main_logic(
+    token_manager: AsyncTokenManager,
+    sell_price: int = DEFAULT_SELL_PRICE,
+    api_url: str = API_URL,
+    poll_token_managers: list = (),
+):
+    """
+    Основная логика работы скрипта.
+
+    poll_token_managers - аккаунты только для опроса рынка: страницы делятся между ними
+    (и торговым аккаунтом при POLL_WITH_TRADING_ACCOUNT), ордера идут только с торгового.
+    """
     global telegram_bot
-    db = DatabaseManager("ubisoft_market.db")
-    client = AsyncUbisoftMarketClient(auth=auth, logger=logger)
+    writer = BackgroundWriter("ubisoft_market.db", logger)
+    writer.start()
+    metrics_server = MetricsServer(METRICS_PORT) if METRICS_PORT else None
+    if metrics_server:
+        try:
+            await metrics_server.start()
+        except OSError as e:
+            logger.warning(f"Не удалось запустить эндпоинт метрик на порту {METRICS_PORT}: {e}")
+            metrics_server = None
+    capture = CaptureWriter(CAPTURE_FILE, logger) if CAPTURE_FILE else None
+    if capture:
+        capture.start()
+    # Один пул соединений на всё время работы: обновление сессии раз в RESTART_INTERVAL его не пересоздаёт
+    transport = HttpTransport(logger)
+    client = AsyncUbisoftMarketClient(
+        token_manager=token_manager, logger=logger, api_url=api_url, capture=capture, transport=transport
+    )
     await client.init_session()
+    token_manager.start()
+    poll_clients = [
+        AsyncUbisoftMarketClient(token_manager=poll_token_manager, logger=logger, api_url=api_url, capture=capture)
+        for poll_token_manager in poll_token_managers
+    ]
+    for poll_client in poll_clients:
+        await poll_client.init_session()
+        poll_client.token_manager.start()
+    pool = (
+        AccountPool([client, *poll_clients] if POLL_WITH_TRADING_ACCOUNT else poll_clients, logger)
+        if poll_clients
+        else None
+    )
+    market_source = pool or client
     loop = asyncio.get_running_loop()
     telegram_bot = MarketTelegramBot(
         os.getenv("TELEGRAM_TOKEN"),
         client,
         logger,
         os.getenv("ADMIN_CHAT_ID"),
+        transport=transport if SHARE_HTTP_POOL else None,
     )
     telegram_bot.run(loop)
 
-    last_token_refresh = datetime.now()
     last_trades_refresh = datetime.now()
-    analyzer = MarketAnalyzer(client, logger, bot=telegram_bot)
-    start_time = datetime.now()
+    tracer = ReactionTracer(logger)
+    analyzer = MarketAnalyzer(client, logger, bot=telegram_bot, tracer=tracer)
+    restore_analyzer_state(analyzer)
+    analyzer.start()
+    last_refresh = last_state_save = datetime.now()
     await client.monitor_and_cancel_old_trades(SPACE_ID, reserve_item_ids=config.RESERVE_ITEM_IDS)
-    db_items = []
+    await sync_inventory(client)
+    snapshots = asyncio.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+    poll_workers = None
+    if POLL_WORKERS:
+        # Разбор ответов уходит в процессы-опросчики; главному процессу остаётся доля лимита на ордера
+        client.rate_limiter = share_rate_limiter(1 - POLL_WORKER_RATE_SHARE)
+        poll_workers = PollWorkers(token_manager, logger, POLL_WORKERS, api_url=api_url, interval=SLEEP_INTERVAL)
+        poll_workers.start()
+        poller = FixedRatePoller(poll_workers.fetch, 0, snapshots, logger)
+    else:
+        scanner = TieredCatalogScanner(market_source, SPACE_ID, logger) if USE_CATALOG_SCANNER else None
+        poller = FixedRatePoller(
+            partial(fetch_market_items, market_source, SPACE_ID, scanner),
+            SLEEP_INTERVAL,
+            snapshots,
+            logger,
+            capture=capture,
+        )
+    poller_task = asyncio.create_task(poller.run())
     try:
-        while datetime.now() - start_time < RESTART_INTERVAL:
-            if datetime.now() - last_token_refresh > TOKEN_REFRESH_INTERVAL:
-                client.auth.refresh_token()
-                last_token_refresh = datetime.now()
+        while True:
+            if datetime.now() - last_refresh > RESTART_INTERVAL:
+                last_refresh = datetime.now()
+                await refresh_connections(client, token_manager, pool)
+
+            if datetime.now() - last_state_save > STATE_SAVE_INTERVAL:
+                last_state_save = datetime.now()
+                await save_analyzer_state(analyzer)
 
             if datetime.now() - last_trades_refresh > TRADES_CANCEL_CHECK_INTERVAL:
                 last_trades_refresh = datetime.now()
-                canceled_trades = await client.monitor_and_cancel_old_trades(
-                    SPACE_ID, reserve_item_ids=config.RESERVE_ITEM_IDS
-                )
-                if canceled_trades:
-                    item_ids = [
-                        key
-                        for key, values in analyzer.price_drop_orders.items()
-                        if values["trade_id"] in [v.values() for v in canceled_trades]
-                    ]
-                    for item_id in item_ids:
-                        del analyzer.price_drop_orders[item_id]
+                # Сверка с активными заказами и снятие старых обновляют client.orders, общий с анализатором
+                await client.monitor_and_cancel_old_trades(SPACE_ID, reserve_item_ids=config.RESERVE_ITEM_IDS)
+                await sync_inventory(client)
+
+            snapshot = await snapshots.get()
 
             try:
-                all_items = await fetch_market_items(client, SPACE_ID)
-                db_items.extend(all_items)
-                await analyzer.analyze(all_items, sell_price=sell_price)
-                await asyncio.sleep(SLEEP_INTERVAL)
+                writer.submit(snapshot.items)
+                with metrics.timer("stage_seconds", stage="analyze"):
+                    await analyzer.analyze(snapshot.items, sell_price=sell_price, parsed_at=snapshot.parsed_at)
+                metrics.observe("stage_seconds", time.monotonic() - snapshot.started_at, stage="tick")
 
             except Exception as e:
                 logger.critical(f"Ошибка: {e}")
@@ -119,53 +207,84 @@ async def run_main_logic(auth: UbisoftAuth, sell_price: int = DEFAULT_SELL_PRICE
         logger.critical(f"Критическая ошибка: {e}")
         play_notification_sound()
     finally:
-        seen_items = []
-        items_to_insert = []
-
-        for item in db_items:
-            item_copy = item.copy()
-            if "market_info" in item_copy:
-                item_copy["market_info"] = item_copy["market_info"].copy()
-                item_copy["market_info"].pop("recorded_at", None)
-
-            if item_copy not in seen_items:
-                items_to_insert.append(item)
-                seen_items.append(item_copy)
-
-        db.insert_items_batch(items_to_insert)
-        db.close_connection()
+        poller_task.cancel()
+        # Поллер может быть посреди тика: ждём его, пока транспорт и писатели ещё открыты
+        with suppress(asyncio.CancelledError):
+            try:
+                await poller_task
+            except Exception as e:
+                logger.error(f"Поллер завершился с ошибкой: {e}")
+        if poll_workers:
+            await asyncio.to_thread(poll_workers.stop)
+        logger.info(
+            f"Тиков: {poller.stats.ticks}, пропущено дедлайнов: {poller.stats.deadline_misses}, "
+            f"отброшено устаревших снимков: {poller.stats.dropped_snapshots}"
+        )
+        await analyzer.stop()
+        logger.info(tracer.summary())
+        await save_analyzer_state(analyzer)
+        await asyncio.to_thread(writer.stop)
+        if capture:
+            await asyncio.to_thread(capture.stop)
         await client.close_session()
+        for poll_client in poll_clients:
+            await poll_client.close_session()
+        await transport.close()
+        if telegram_bot.transport is not transport:
+            await telegram_bot.transport.close()
+        if metrics_server:
+            await metrics_server.stop()
         telegram_bot.stop()
 
 
-async def authenticate(email: str, password: str) -> UbisoftAuth:
+async def authenticate(email: str, password: str, token_file: str = TOKEN_FILE) -> AsyncTokenManager:
     """Аутентификация пользователя."""
-    auth = UbisoftAuth(email, password, logger)
+    token_manager = AsyncTokenManager(UbisoftAuth(email, password, logger, token_file=token_file), logger)
 
-    if auth.is_token_expired():
+    if await token_manager.is_token_expired():
         logger.warning("Токен истек или недействителен. Пытаемся обновить сессию...")
-        if not auth.ensure_valid_token():
+        if not await token_manager.ensure_valid_token():
             logger.warning("Не удалось обновить сессию. Требуется ручная аутентификация.")
-            auth.basic_auth(auth.email, auth.password)
-            if auth.two_factor_ticket:
+            await token_manager.basic_auth(email, password)
+            if token_manager.auth.two_factor_ticket:
                 code = input("Введите код двухфакторной аутентификации: ")
-                auth.complete_2fa(code)
+                await token_manager.complete_2fa(code)
     else:
         logger.info("Успешная аутентификация с использованием сохраненных токенов")
 
-    return auth
+    return token_manager
+
+
+def load_poll_accounts() -> list:
+    """Аккаунты опроса из .env: POLL_EMAIL_1/POLL_PASSWORD_1, POLL_EMAIL_2/POLL_PASSWORD_2 и т.д."""
+    accounts = []
+    while os.getenv(f"POLL_EMAIL_{len(accounts) + 1}"):
+        index = len(accounts) + 1
+        accounts.append((os.getenv(f"POLL_EMAIL_{index}"), os.getenv(f"POLL_PASSWORD_{index}")))
+    return accounts
 
 
 async def main(email: str, password: str, sell_price: int = DEFAULT_SELL_PRICE):
     """Основная точка входа."""
-    auth = await authenticate(email, password)
+    token_manager = await authenticate(email, password)
+    poll_token_managers = []
 
     try:
-        await run_main_logic(auth, sell_price=sell_price)
+        for index, (poll_email, poll_password) in enumerate(load_poll_accounts(), start=1):
+            poll_token_managers.append(
+                await authenticate(poll_email, poll_password, token_file=POLL_TOKEN_FILE.format(index))
+            )
+        if poll_token_managers:
+            logger.info(f"Аккаунтов опроса: {len(poll_token_managers)}")
+        await run_main_logic(token_manager, sell_price=sell_price, poll_token_managers=poll_token_managers)
     except Exception as e:
         logger.error(f"Ошибка во время выполнения: {e}")
         asyncio.timeout(30)
         play_notification_sound()
+    finally:
+        await token_manager.close()
+        for poll_token_manager in poll_token_managers:
+            await poll_token_manager.close()
 
 
 if __name__ == "__main__":
@@ -176,5 +295,5 @@ if __name__ == "__main__":
             logger.error(f"Ошибка в главном цикле: {e}")
             play_notification_sound()
 
-        logger.info(f"Перезапуск main() через {RESTART_DELAY} секунд...")
+        logger.info(f"Перезапуск main() после ошибки через {RESTART_DELAY} секунд...")
         time.sleep(RESTART_DELAY)
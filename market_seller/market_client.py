@@ -1,18 +1,40 @@
 import asyncio
 import logging
 import re
-from contextlib import suppress
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 import aiohttp
 
 from config import *
-from market_seller.other.auth import UbisoftAuth
-from market_seller.other.database import DatabaseManager
-from market_seller.other.requests_params import RequestsParams
-from market_seller.other.utils import play_notification_sound, async_retry, DotDict
+from market_seller.other.capture import CaptureWriter, operation_name
+from market_seller.other.codec import codec, encode_request
+from market_seller.other.hedging import HEDGED_OPERATIONS, RequestHedger
+from market_seller.other.inventory import NO_FREE_SLOTS, InventoryModel
+from market_seller.other.metrics import metrics
+from market_seller.other.models import CatalogEntry, MarketItem
+from market_seller.other.order_state import OrderStateStore
+from market_seller.other.rate_limiter import AdaptiveRateLimiter, Priority
+from market_seller.other.requests_params import SELLABLE_ITEMS_QUERIES, RequestsParams
+from market_seller.other.token_manager import AsyncTokenManager
+from market_seller.other.tracing import ReactionTrace
+from market_seller.other.transport import HttpTransport, operation_class
+from market_seller.other.utils import play_notification_sound, async_retry
+
+
+# Validation and parse errors of a GraphQL document (graphql-js wording)
+DOCUMENT_ERROR_MARKERS = (
+    "Cannot query field",
+    "Unknown argument",
+    "Unknown type",
+    "Syntax Error",
+    "is not defined",
+    "is never used",
+    "exceeds maximum",
+)
 
 
 @dataclass
@@ -26,19 +48,52 @@ class TradeData:
     updated_at: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class PageRequest:
+    """One page of GetSellableItems with its own filter and sort order"""
+
+    offset: int = 0
+    item_types: Tuple[str, ...] = ()
+    tags: Tuple[str, ...] = ()
+    sort_field: str = DEFAULT_SORT_FIELD
+    sort_direction: str = DEFAULT_SORT_DIRECTION
+    priority: Priority = Priority.NORMAL
+
+
 class AsyncUbisoftMarketClient:
     def __init__(
         self,
-        auth: UbisoftAuth,
+        token_manager: AsyncTokenManager,
         logger: logging.Logger,
-        db_name: str = "ubisoft_market.db",
+        api_url: str = API_URL,
+        capture: Optional[CaptureWriter] = None,
+        transport: Optional[HttpTransport] = None,
     ):
-        self.headers = self._build_headers(auth.token)
-        self.auth = auth
-        self.session = None
-        self.db = DatabaseManager(db_name)
+        self.api_url = api_url
+        self.capture = capture
+        self.headers = self._build_headers(token_manager.token)
+        self.token_manager = token_manager
+        self.auth = token_manager.auth
+        token_manager.add_listener(self._apply_token)
         self.logger = logger
-        self.semaphore = asyncio.Semaphore(8)
+        # A shared transport is closed by its owner; our own one by close_session
+        self.transport = transport or HttpTransport(logger)
+        self._owns_transport = transport is None
+        self.rate_limiter = AdaptiveRateLimiter(
+            max_rate=RATE_LIMIT_MAX_RPS,
+            min_rate=RATE_LIMIT_MIN_RPS,
+            burst=RATE_LIMIT_BURST,
+            max_concurrency=MAX_CONCURRENT_REQUESTS,
+            ramp_step=RATE_LIMIT_RAMP_STEP,
+        )
+        self.batch_size = BATCH_PAGES_SIZE
+        self.batch_supported = True
+        self.hedger = RequestHedger() if HEDGE_REQUESTS else None
+        self.poll_query = SELLABLE_ITEMS_QUERIES[POLL_PROJECTION]
+        self.catalog: Dict[str, CatalogEntry] = {}  # item_id -> static item fields for the hot projection
+        self.orders = OrderStateStore()  # Our sell orders, shared with the analyzer and the Telegram bot
+        self.inventory = InventoryModel(self.orders, logger)  # Sell slots and ownership, checked before mutations
+        self.sell_slot_wait = SELL_SLOT_WAIT
 
     @staticmethod
     def _build_headers(token: str) -> Dict[str, str]:
@@ -53,6 +108,10 @@ class AsyncUbisoftMarketClient:
             "Ubi-Countryid": "RU",
         }
 
+    def _apply_token(self, token: str):
+        """Use the refreshed ticket for all subsequent requests"""
+        self.headers["Authorization"] = f"ubi_v1 t={token}"
+
     @staticmethod
     def _create_payment_option(price: int) -> Dict:
         """Create payment option structure"""
@@ -87,17 +146,30 @@ class AsyncUbisoftMarketClient:
         }
 
     async def init_session(self):
-        """Initialize aiohttp session if not exists"""
-        if self.session is None:
-            self.session = aiohttp.ClientSession()
+        """Open the connection pool, pre-warm connections to the API host and keep them warm while idle"""
+        if HTTP_PREWARM_CONNECTIONS:
+            await self.transport.warm(self.api_url, HTTP_PREWARM_CONNECTIONS)
+            self.transport.keep_warm(self.api_url, HTTP_PREWARM_CONNECTIONS)
+
+    @property
+    def paused(self) -> bool:
+        """Requests are on hold after a "Too many requests" hint"""
+        return self.rate_limiter.paused
+
+    async def refresh_session(self):
+        """Keep the pool (and its warm connections) across refreshes; reopen it only if it was closed"""
+        if self.transport.closed:
+            await self.init_session()
 
     async def close_session(self):
-        """Close aiohttp session and database connection"""
-        if self.session:
-            await self.session.close()
-            with suppress(Exception):  # Подавляем исключение, если что-то пошло не так при закрытии
-                self.db.close_connection()
-            self.session = None
+        """Close the connection pool if this client owns it"""
+        if self._owns_transport:
+            await self.transport.close()
+
+    @staticmethod
+    def _is_auth_error(response: aiohttp.ClientResponse, errors: List[Dict]) -> bool:
+        """The server rejected the ticket (Invalid Ticket, expired session)"""
+        return response.status == 401 or any("ticket" in str(error.get("message", "")).lower() for error in errors)
 
     async def _handle_response_errors(self, response: aiohttp.ClientResponse, result: Dict):
         """Handle various API response errors"""
@@ -107,29 +179,58 @@ class AsyncUbisoftMarketClient:
 
         if "errors" in result and "cancelOrder" not in str(result):
             play_notification_sound()
-            self.auth.refresh_session_with_remember_me()
+            # Only a rejected ticket needs a new session; throttling and business errors (ERROR_MAPPING) do not
+            if self._is_auth_error(response, result["errors"]):
+                await self.token_manager.refresh(prefer_remember_me=True)
             # self.logger.error(f"GraphQL errors: {result.get('errors')[0].get('message')}")
             if "Too many requests" in result.get("errors")[0].get("message"):
+                metrics.inc("rate_limited_total")
                 match = re.search(r"\b(\d+)\s+seconds?\b", result.get("errors")[0].get("message"))
 
-                if match:
-                    seconds = int(match.group(1))
-                    await asyncio.sleep(seconds)
-            if "Internal Server Error" in result.get("errors")[0].get("message"):
-                asyncio.timeout(30)
+                # Ставим на паузу все запросы клиента, а не только текущий
+                self.rate_limiter.on_rate_limited(int(match.group(1)) if match else 1)
             raise Exception(f"GraphQL errors: {result.get('errors')}")
 
-    async def execute_query(self, query: str, variables: dict) -> Dict:
+    async def _post(self, body: bytes, timeout: aiohttp.ClientTimeout) -> Tuple[aiohttp.ClientResponse, Dict]:
+        """Single HTTP attempt; the raw body is read and decoded before the connection is released"""
+        async with self.transport.session.post(
+            self.api_url, data=body, headers=self.headers, timeout=timeout
+        ) as response:
+            result = codec.loads(await response.read())
+        self.transport.used_at = time.monotonic()
+        return response, result
+
+    async def _send(
+        self, body: bytes, operation: str, priority: Priority, timeout: aiohttp.ClientTimeout
+    ) -> Tuple[aiohttp.ClientResponse, Dict]:
+        """
+        HTTP attempt in a rate limiter slot. Reads are hedged only once the slot is granted,
+        so the time spent queued for it neither triggers a hedge nor skews the latency samples
+        """
+        async with self.rate_limiter.slot(priority):
+            if self.hedger and operation in HEDGED_OPERATIONS and not self.rate_limiter.paused:
+                return await self.hedger.run(
+                    operation, lambda: self._post(body, timeout), lambda: self.rate_limiter.slot(priority)
+                )
+            return await self._post(body, timeout)
+
+    async def execute_query(self, query: str, variables: dict, priority: Priority = Priority.NORMAL) -> Dict:
         """Execute GraphQL query with error handling and retries"""
-        payload = {"query": query, "variables": variables}
+        body = encode_request(query, variables)
+        operation = operation_name(query)
+        timeout = self.transport.timeout(operation_class(query))
 
-        if not self.session:
-            await self.init_session()
-        async with self.semaphore:
-            async with self.session.post(API_URL, json=payload, headers=self.headers, timeout=10) as response:
-                result = await response.json()
-                await self._handle_response_errors(response, result)
-                return result.get("data", [])
+        with metrics.timer("graphql_request_seconds", operation=operation):
+            response, result = await self._send(body, operation, priority, timeout)
+
+        if self.capture:
+            self.capture.write(operation, variables, result)
+        try:
+            await self._handle_response_errors(response, result)
+        except Exception:
+            metrics.inc("graphql_errors_total", operation=operation, status=response.status)
+            raise
+        return result.get("data", [])
 
     @staticmethod
     def _create_trade_data(
@@ -160,19 +261,52 @@ class AsyncUbisoftMarketClient:
                 created_at=datetime.utcnow().isoformat(),
             )
 
-    async def create_sell_order(self, space_id: str, item_id: str, quantity: int, price: int) -> Dict:
+    async def create_sell_order(
+        self, space_id: str, item_id: str, quantity: int, price: int, trace: Optional[ReactionTrace] = None
+    ) -> Dict:
+        """
+        Create a sell order; trace, if given, gets the mutation sent/acknowledged marks.
+
+        Orders the server would surely reject (already selling, not sellable yet, not owned)
+        raise OrderRejected without a request; with no free sell slot the order waits for one
+        for up to sell_slot_wait seconds.
+        """
         mutation = RequestsParams.CREATE_SELL_ORDER_REQUEST
         variables = {
             "spaceId": space_id,
             "tradeItems": [{"itemId": item_id, "quantity": quantity}],
             "paymentOptions": [self._create_payment_option(price)],
         }
-        result = await self.execute_query(mutation, variables)
-        trade_id = result.get("createSellOrder").get("trade").get("tradeId")
+        self.inventory.check(item_id)
+        await self.inventory.acquire(item_id, self.sell_slot_wait, lambda: self.get_pending_trades(space_id))
+        try:
+            if trace:
+                trace.mark("sent_at")
+            try:
+                result = await self.execute_query(mutation, variables, priority=Priority.HIGH)
+            finally:
+                if trace:
+                    trace.mark("acked_at")
+            trade_id = result.get("createSellOrder").get("trade").get("tradeId")
+            self.orders.record_order(item_id, trade_id, price)
+        except Exception as e:
+            if NO_FREE_SLOTS in str(e):
+                await self._resync_sell_slots(space_id)
+            raise
+        finally:
+            self.inventory.release()
 
         self._create_trade_data(space_id, trade_id, item_id, quantity, price)
         return result
 
+    async def _resync_sell_slots(self, space_id: str):
+        """The server ran out of sell slots before our model did: reconcile and lower the limit"""
+        try:
+            await self.get_pending_trades(space_id)
+        except Exception:
+            return
+        self.inventory.on_no_free_slots()
+
     async def update_sell_order(self, space_id: str, trade_id: str, price: int) -> Dict:
         mutation = RequestsParams.UPDATE_SELL_ORDER_REQUEST
         variables = {
@@ -182,67 +316,31 @@ class AsyncUbisoftMarketClient:
         }
 
         try:
-            result = await self.execute_query(mutation, variables)
+            result = await self.execute_query(mutation, variables, priority=Priority.HIGH)
+            self.orders.update_price(trade_id, price)
             self._create_trade_data(space_id, trade_id, None, None, price, is_update=True)
             return result
         except Exception as e:
             self.logger.error(f"Error updating sell order in update_sell_order: {e}")
 
-    @staticmethod
-    def _parse_stats(stats: Optional[List[Dict]], default: Dict = None) -> Dict:
-        """Parse market statistics"""
-        return stats[0] if stats else (default or {})
-
-    @staticmethod
-    def _parse_market_item(
-        item_data: DotDict,
-        sell_stats: DotDict,
-        last_sold: DotDict,
-        buy_stats: DotDict,
-    ) -> DotDict:
-        """Parse individual market item data"""
-        return DotDict(
-            {
-                "name": item_data.name,
-                "type": item_data.type,
-                "item_id": item_data.itemId,
-                "tags": item_data.tags,
-                "asset_url": item_data.assetUrl,
-                "market_info": {
-                    "lowest_price": sell_stats.lowestPrice,
-                    "highest_price": sell_stats.highestPrice,
-                    "active_listings": sell_stats.activeCount,
-                    "last_sold_price": last_sold.price,
-                    "last_sold_at": datetime.fromisoformat(last_sold.performedAt.replace("Z", "+00:00")),
-                    "lowest_buy_price": buy_stats.get("lowest_price", 0),
-                    "highest_buy_price": buy_stats.get("highestPrice", 0),
-                    "active_buy_count": buy_stats.get("activeCount", 0),
-                    "recorded_at": datetime.utcnow().isoformat(),
-                },
-            }
-        )
+    def parse_market_data(self, response: Dict, recorded_at: Optional[str] = None) -> List[MarketItem]:
+        """
+        Parse market data with error handling.
 
-    def parse_market_data(self, response: Dict) -> List[DotDict]:
-        """Parse market data with error handling"""
+        All items of one snapshot share `recorded_at`; pass the same value for every page of a tick.
+        """
         items = []
-        response = DotDict(response)
+        recorded_at = recorded_at or datetime.utcnow().isoformat()
         try:
-            if response.game.get("viewer"):
-                nodes = response.game.viewer.meta.marketableItems.nodes
+            game = response["game"]
+            if game.get("viewer"):
+                nodes = game["viewer"]["meta"]["marketableItems"]["nodes"]
             else:
-                nodes = response.game.marketableItems.nodes
+                nodes = game["marketableItems"]["nodes"]
             for node in nodes:
-                item_data = node.item
-                market_data = node.marketData
-
-                sell_stats = DotDict(self._parse_stats(market_data.sellStats))
-                last_sold = DotDict(self._parse_stats(market_data.lastSoldAt))
-                buy_stats = DotDict(self._parse_stats(market_data.buyStats))
-
-                if sell_stats and last_sold:
-                    parsed_item = self._parse_market_item(item_data, sell_stats, last_sold, buy_stats)
+                parsed_item = MarketItem.from_node(node, recorded_at, self.catalog)
+                if parsed_item:
                     items.append(parsed_item)
-                    self.logger.debug(f"Parsed and stored item: {parsed_item.name}")
 
             return items
         except Exception as e:
@@ -257,7 +355,6 @@ class AsyncUbisoftMarketClient:
         offset: int = 0,
         item_types: List[str] = None,
         tags: List[str] = None,
-        with_ownership: bool = False,
         sort_field: str = DEFAULT_SORT_FIELD,
         sort_direction: str = DEFAULT_SORT_DIRECTION,
         payment_item_id: str = DEFAULT_PAYMENT_ITEM_ID,
@@ -269,21 +366,276 @@ class AsyncUbisoftMarketClient:
             "spaceId": space_id,
             "limit": limit,
             "offset": offset,
-            "withOwnership": with_ownership,
             "filterBy": self._build_filter_params(item_types, tags),
             "sortBy": self._build_sort_params(sort_field, sort_direction, payment_item_id, order_type),
         }
 
         return await self.execute_query(query, variables)
 
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_batched_query(query: str, pages: int, per_page: Tuple[str, ...] = ("offset",)) -> str:
+        """
+        Merge N copies of a paged query into one aliased document (page0, page1, ...).
+
+        Variables listed in `per_page` get their own copy per alias ($offset0, $offset1, ...),
+        the rest are shared by all pages.
+        """
+        header, _, rest = getattr(query, "value", query).partition("{")
+        body = rest[: rest.rindex("}")].strip()
+        for name in per_page:
+            declaration = re.search(rf"\${name}:\s*([\w!\[\]]+)", header)
+            copies = ", ".join(f"${name}{i}: {declaration.group(1)}" for i in range(pages))
+            header = header.replace(declaration.group(0), copies, 1)
+        header = re.sub(r"\b(query\s+\w+)", r"\1Batch", header, count=1)
+
+        def page_body(index: int) -> str:
+            text = body
+            for name in per_page:
+                text = re.sub(rf"\${name}\b", f"${name}{index}", text)
+            return text
+
+        aliases = "\n".join(f"page{i}: " + page_body(i) for i in range(pages))
+        return f"{header.strip()} {{\n{aliases}\n}}"
+
+    @staticmethod
+    def _split_batched_response(data: Dict, pages: int) -> List[Dict]:
+        """Split aliased batch response back into per-page responses for parse_market_data"""
+        return [{"game": data.get(f"page{i}") or {}} for i in range(pages)]
+
+    @staticmethod
+    def _is_rejected_document(error: Exception) -> bool:
+        """
+        Check whether the server rejected the merged document itself: a validation or parse error.
+        Rate limits, ticket errors and transient server errors keep batching on.
+        """
+        message = str(error)
+        return message.startswith("GraphQL errors") and any(marker in message for marker in DOCUMENT_ERROR_MARKERS)
+
+    async def _get_sellable_items_batch(
+        self,
+        space_id: str,
+        limit: int,
+        offsets: List[int],
+        query: str = RequestsParams.GET_SELLABLE_ITEMS_REQUEST,
+        **kwargs,
+    ) -> List[Dict]:
+        """Fetch several pages in a single round-trip using GraphQL aliases"""
+        variables = {
+            "spaceId": space_id,
+            "limit": limit,
+            "filterBy": self._build_filter_params(kwargs.get("item_types"), kwargs.get("tags")),
+            "sortBy": self._build_sort_params(
+                kwargs.get("sort_field", DEFAULT_SORT_FIELD),
+                kwargs.get("sort_direction", DEFAULT_SORT_DIRECTION),
+                kwargs.get("payment_item_id", DEFAULT_PAYMENT_ITEM_ID),
+                kwargs.get("order_type", "Sell"),
+            ),
+        }
+        variables.update({f"offset{i}": offset for i, offset in enumerate(offsets)})
+
+        data = await self.execute_query(self._build_batched_query(query, len(offsets)), variables)
+        return self._split_batched_response(data, len(offsets))
+
+    async def get_sellable_items_pages(
+        self,
+        space_id: str,
+        limit: int = DEFAULT_LIMIT,
+        pages: int = 1,
+        batch_size: Optional[int] = None,
+        **kwargs,
+    ) -> List[Dict]:
+        """
+        Get several consecutive pages of sellable items with the polling projection (poll_query).
+
+        Pages are merged into batches of `batch_size` aliased queries. If the server rejects
+        the merged document, the client falls back to per-page requests for the rest of the session.
+
+        Returns:
+        List[Dict]: One response per page, each consumable by parse_market_data
+        """
+        batch_size = batch_size or self.batch_size
+        query = kwargs.pop("query", self.poll_query)
+        offsets = [i * limit for i in range(pages)]
+        responses = await self._fetch_in_batches(
+            offsets,
+            batch_size,
+            lambda batch: self._get_sellable_items_batch(space_id, limit, batch, query=query, **kwargs),
+            lambda offset: self.get_sellable_items(
+                space_id=space_id, limit=limit, offset=offset, query=query, **kwargs
+            ),
+        )
+
+        if query is SELLABLE_ITEMS_QUERIES["hot"]:
+            requests = [
+                PageRequest(
+                    offset=offset,
+                    item_types=tuple(kwargs.get("item_types") or ()),
+                    tags=tuple(kwargs.get("tags") or ()),
+                    sort_field=kwargs.get("sort_field", DEFAULT_SORT_FIELD),
+                    sort_direction=kwargs.get("sort_direction", DEFAULT_SORT_DIRECTION),
+                )
+                for offset in offsets
+            ]
+            await self._fill_catalog(space_id, limit, requests, responses, batch_size)
+        return responses
+
+    @staticmethod
+    def _nodes(response: Dict) -> List[Dict]:
+        """marketableItems.nodes of a page response, empty for a missing or failed page"""
+        game = response.get("game") or {}
+        container = game["viewer"].get("meta") if game.get("viewer") else game
+        return ((container or {}).get("marketableItems") or {}).get("nodes") or []
+
+    async def _fill_catalog(
+        self, space_id: str, limit: int, requests: List[PageRequest], responses: List[Dict], batch_size: int
+    ):
+        """
+        Fetch the catalog projection for pages that contain item_ids missing from the cache.
+
+        Catalog data is static, so after the first ticks this only runs when new items show up.
+        An item that moved off the page in between, or whose catalog page failed (throttled,
+        timed out), is skipped by parse_market_data and picked up on a later tick.
+        """
+        missing = [
+            request
+            for request, response in zip(requests, responses)
+            if any(node["item"]["itemId"] not in self.catalog for node in self._nodes(response))
+        ]
+        if not missing:
+            return
+        try:
+            pages = await self._fetch_page_requests(
+                space_id, missing, limit, batch_size, query=SELLABLE_ITEMS_QUERIES["catalog"]
+            )
+        except Exception as e:
+            self.logger.warning(f"Каталог для {len(missing)} страниц не получен, повторим на следующем тике: {e}")
+            metrics.inc("catalog_errors_total")
+            return
+        for page in pages:
+            for node in self._nodes(page):
+                item = node["item"]
+                self.catalog[item["itemId"]] = CatalogEntry.from_item(item)
+        metrics.inc("catalog_pages_total", len(missing))
+
+    async def _get_page_requests_batch(
+        self,
+        space_id: str,
+        limit: int,
+        requests: List[PageRequest],
+        query: str = RequestsParams.GET_SELLABLE_ITEMS_REQUEST,
+    ) -> List[Dict]:
+        """Fetch pages with different filters/sort orders in one round-trip"""
+        variables = {"spaceId": space_id, "limit": limit}
+        variables.update({f"offset{i}": request.offset for i, request in enumerate(requests)})
+        per_page = ["offset"]
+        for name, values in (
+            ("filterBy", [self._build_filter_params(list(r.item_types), list(r.tags)) for r in requests]),
+            ("sortBy", [self._build_sort_params(r.sort_field, r.sort_direction) for r in requests]),
+        ):
+            if all(value == values[0] for value in values):
+                variables[name] = values[0]
+            else:
+                per_page.append(name)
+                variables.update({f"{name}{i}": value for i, value in enumerate(values)})
+
+        document = self._build_batched_query(query, len(requests), tuple(per_page))
+        data = await self.execute_query(document, variables, priority=min(r.priority for r in requests))
+        return self._split_batched_response(data, len(requests))
+
+    async def get_page_requests(
+        self,
+        space_id: str,
+        requests: List[PageRequest],
+        limit: int = DEFAULT_LIMIT,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict]:
+        """
+        Get arbitrary pages of sellable items with the polling projection, each with its own
+        filter and sort order.
+
+        Requests are merged into batches of `batch_size` in the given order, so callers can
+        keep low-priority pages together at the end. Falls back to per-page requests like
+        get_sellable_items_pages.
+
+        Returns:
+        List[Dict]: One response per request, in the same order
+        """
+        batch_size = batch_size or self.batch_size
+        responses = await self._fetch_page_requests(space_id, requests, limit, batch_size, query=self.poll_query)
+        if self.poll_query is SELLABLE_ITEMS_QUERIES["hot"]:
+            await self._fill_catalog(space_id, limit, requests, responses, batch_size)
+        return responses
+
+    async def _fetch_page_requests(
+        self,
+        space_id: str,
+        requests: List[PageRequest],
+        limit: int,
+        batch_size: int,
+        query: str,
+    ) -> List[Dict]:
+        """Batched fetch of PageRequests with the given projection, see _fetch_in_batches"""
+        return await self._fetch_in_batches(
+            requests,
+            batch_size,
+            lambda batch: self._get_page_requests_batch(space_id, limit, batch, query=query),
+            lambda request: self.get_sellable_items(
+                space_id=space_id,
+                limit=limit,
+                offset=request.offset,
+                item_types=list(request.item_types),
+                tags=list(request.tags),
+                sort_field=request.sort_field,
+                sort_direction=request.sort_direction,
+                query=query,
+            ),
+        )
+
+    async def _fetch_in_batches(
+        self,
+        pages: List,
+        batch_size: int,
+        fetch_batch: Callable[[List], Awaitable[List[Dict]]],
+        fetch_page: Callable[[Any], Awaitable[Dict]],
+    ) -> List[Dict]:
+        """
+        Fetch pages in batches of `batch_size`, one response per page in the same order.
+
+        Only a batch whose merged document the server rejected is re-fetched page by page (and
+        batching is turned off for the session). Any other failure ("Too many requests", a timeout)
+        is raised once all batches are done: per-page retries would multiply the requests exactly
+        when the account is throttled, and pages of successful batches are never fetched twice.
+        """
+        if not (self.batch_supported and batch_size > 1):
+            return list(await asyncio.gather(*(fetch_page(page) for page in pages)))
+
+        batches = [pages[i : i + batch_size] for i in range(0, len(pages), batch_size)]
+        results = await asyncio.gather(*(fetch_batch(batch) for batch in batches), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException) and not self._is_rejected_document(result):
+                raise result
+
+        rejected = [index for index, result in enumerate(results) if isinstance(result, BaseException)]
+        if rejected:
+            self.batch_supported = False
+            error = results[rejected[0]]
+            self.logger.warning(f"Сервер отклонил объединённый запрос, переходим на постраничный: {error}")
+            fallback = await asyncio.gather(
+                *(asyncio.gather(*(fetch_page(page) for page in batches[index])) for index in rejected)
+            )
+            for index, responses in zip(rejected, fallback):
+                results[index] = responses
+        return [page for batch in results for page in batch]
+
     async def refresh_token_if_needed(self):
         """Refresh authentication token if expired"""
-        if self.auth.is_token_expired():
+        if await self.token_manager.is_token_expired():
             self.logger.info("Токен истек. Попытка повторной аутентификации...")
-            self.auth.basic_auth(self.auth.email, self.auth.password)
+            await self.token_manager.basic_auth(self.auth.email, self.auth.password)
             if self.auth.two_factor_ticket:
                 code = input("Введите 2FA код: ")
-                self.auth.complete_2fa(code)
+                await self.token_manager.complete_2fa(code)
                 self.logger.info("2FA успешно выполнена")
 
     @async_retry(max_retries=3, delay=1)
@@ -300,6 +652,7 @@ class AsyncUbisoftMarketClient:
         sort_direction: str = "ASC",
         payment_item_id: str = DEFAULT_PAYMENT_ITEM_ID,
         query=RequestsParams.GET_MARKETABLE_ITEMS_QUERY,
+        priority: Priority = Priority.NORMAL,
     ) -> Dict:
         variables = {
             "spaceId": space_id,
@@ -311,11 +664,34 @@ class AsyncUbisoftMarketClient:
         }
 
         try:
-            return await self.execute_query(query, variables)
+            result = await self.execute_query(query, variables, priority=priority)
         except Exception as e:
             self.logger.error(f"Ошибка при получении списка предметов: {e}")
             await asyncio.sleep(5)
             raise
+        if with_ownership:
+            self.inventory.observe_marketable(self._nodes(result or {}))
+        return result
+
+    async def sync_inventory(self, space_id: str, pages: int = INVENTORY_SYNC_PAGES) -> int:
+        """
+        Low-priority GetMarketableItems pass (owned items included) that feeds self.inventory with
+        ownership, quantity and active sell trades. Returns the number of items observed.
+        """
+        responses = await asyncio.gather(
+            *(
+                self.get_marketable_items(
+                    space_id,
+                    offset=i * DEFAULT_MARKETABLE_LIMIT,
+                    hide_owned=False,
+                    sort_field=DEFAULT_MARKETABLE_SORT_FIELD,
+                    sort_direction=DEFAULT_MARKETABLE_SORT_DIRECTION,
+                    priority=Priority.LOW,
+                )
+                for i in range(pages)
+            )
+        )
+        return sum(len(self._nodes(response or {})) for response in responses)
 
     async def get_pending_trades(
         self,
@@ -326,6 +702,8 @@ class AsyncUbisoftMarketClient:
         """
         Get information about pending trade orders.
 
+        A complete first page (fewer than `limit` trades) is reconciled into self.orders.
+
         Parameters:
         space_id (str): The space ID to query trades for
         limit (int): Maximum number of trades to return (default: 40)
@@ -337,14 +715,28 @@ class AsyncUbisoftMarketClient:
         query = RequestsParams.GET_PENDING_TRADES_QUERY
 
         variables = {"spaceId": space_id, "limit": limit, "offset": offset}
+        as_of = self.orders.clock()
 
         try:
-            return await self.execute_query(query, variables)
+            result = await self.execute_query(query, variables)
         except Exception as e:
             self.logger.error(f"Ошибка при получении списка активных заказов: {e}")
             await asyncio.sleep(5)
             raise
 
+        trades = self._pending_trade_nodes(result)
+        if offset == 0 and len(trades) < limit:
+            added, removed = self.orders.reconcile((t for t in trades if t.get("category") == "Sell"), as_of)
+            if added or removed:
+                self.logger.info(f"Сверка заказов: добавлено {added}, закрыто {removed}")
+        return result
+
+    @staticmethod
+    def _pending_trade_nodes(response: Dict) -> List[Dict]:
+        """trades.nodes of a GetTransactionsPending response, empty if missing"""
+        viewer = ((response or {}).get("game") or {}).get("viewer") or {}
+        return ((viewer.get("meta") or {}).get("trades") or {}).get("nodes") or []
+
     async def cancel_old_trade(self, space_id: str, trade_id: str) -> Dict:
         """
         Cancel a specific trade order.
@@ -361,10 +753,12 @@ class AsyncUbisoftMarketClient:
         variables = {"spaceId": space_id, "tradeId": trade_id}
 
         try:
-            return await self.execute_query(query, variables)
+            result = await self.execute_query(query, variables, priority=Priority.HIGH)
         except Exception as e:
             self.logger.error(f"Ошибка отмены заказа {trade_id}: {e}")
             raise
+        self.orders.remove_trade(trade_id)
+        return result
 
     async def monitor_and_cancel_old_trades(
         self, space_id: str, reserve_item_ids, max_age_minutes: int = MAX_AGE_MINUTES_TRADE
@@ -372,16 +766,16 @@ class AsyncUbisoftMarketClient:
         cancelled_trades = []
 
         try:
-            pending_trades = await self.get_pending_trades(space_id)
+            pending_trades = self._pending_trade_nodes(await self.get_pending_trades(space_id))
 
-            if not pending_trades.get("game", {}).get("viewer", {}).get("meta", {}).get("trades", {}).get("nodes"):
+            if not pending_trades:
                 self.logger.info("Нет подходящих заказов для снятия")
                 return cancelled_trades
 
             current_time = datetime.now(timezone.utc)
             cancel_tasks = []
 
-            for trade in pending_trades["game"]["viewer"]["meta"]["trades"]["nodes"]:
+            for trade in pending_trades:
                 if trade["category"] != "Sell" or trade["tradeItems"][0]["item"]["itemId"] in reserve_item_ids:
                     continue
 
@@ -430,7 +824,7 @@ class AsyncUbisoftMarketClient:
             "paymentProposal": {"paymentItemId": payment_item_id, "price": price},
         }
 
-        result = await self.execute_query(mutation, variables)
+        result = await self.execute_query(mutation, variables, priority=Priority.HIGH)
         trade_id = result.get("createBuyOrder").get("trade").get("tradeId")
 
         self._create_trade_data(space_id, trade_id, item_id, quantity, price)
@@ -0,0 +1,106 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from market_seller.config import DEFAULT_LIMIT
+from market_seller.market_client import AsyncUbisoftMarketClient, PageRequest
+from market_seller.other.metrics import metrics
+from market_seller.other.models import MarketItem
+
+
+class AccountPool:
+    """
+    Опрос рынка несколькими аккаунтами: у каждого свой токен, своя сессия и свой лимит запросов.
+
+    Страницы тика делятся на пачки по batch_size, и каждая пачка уходит аккаунту с наибольшим
+    запасом запросов в его ограничителе (аккаунт на паузе после "Too many requests" не получает
+    ничего, пока есть другие). Ответы собираются обратно в исходном порядке, так что для сканера
+    и анализатора пул выглядит как один клиент. Кэш каталога общий для всех аккаунтов.
+    Ордера пул не отправляет: мутации остаются на торговом клиенте.
+    """
+
+    def __init__(self, clients: List[AsyncUbisoftMarketClient], logger):
+        if not clients:
+            raise ValueError("Пул аккаунтов опроса пуст")
+        self.clients = clients
+        self.logger = logger
+        self.catalog = clients[0].catalog
+        for client in clients:
+            client.catalog = self.catalog
+        self._next = 0  # С какого аккаунта начинать при равном запасе
+
+    @property
+    def paused(self) -> bool:
+        return all(client.rate_limiter.paused for client in self.clients)
+
+    def parse_market_data(self, response: Dict, recorded_at: Optional[str] = None) -> List[MarketItem]:
+        return self.clients[0].parse_market_data(response, recorded_at)
+
+    @staticmethod
+    def _cost(client: AsyncUbisoftMarketClient, chunk: List[PageRequest], batch_size: int) -> int:
+        return 1 if client.batch_supported and batch_size > 1 else len(chunk)
+
+    def _assign(self, chunks: List[List[PageRequest]], batch_size: int) -> List[int]:
+        """Номер аккаунта для каждой пачки: жадно по оставшемуся запасу запросов."""
+        count = len(self.clients)
+        order = [(self._next + i) % count for i in range(count)]
+        self._next = (self._next + 1) % count
+        headroom = {index: self.clients[index].rate_limiter.headroom() for index in order}
+
+        assignment = []
+        for chunk in chunks:
+            index = max(order, key=lambda i: headroom[i])
+            headroom[index] -= self._cost(self.clients[index], chunk, batch_size)
+            assignment.append(index)
+        return assignment
+
+    async def _fetch_shard(
+        self, space_id: str, chunk: List[PageRequest], limit: int, batch_size: int, index: int
+    ) -> List[Dict]:
+        client = self.clients[index]
+        try:
+            return await client.get_page_requests(space_id, chunk, limit=limit, batch_size=batch_size)
+        except Exception as e:
+            if len(self.clients) == 1:
+                raise
+            # Пачку упавшего аккаунта (бан, невалидный токен, таймаут) повторяем на следующем
+            fallback = self.clients[(index + 1) % len(self.clients)]
+            self.logger.warning(f"Аккаунт опроса {client.auth.email} не получил страницы, повторяем на другом: {e}")
+            metrics.inc("poll_shard_retries_total")
+            return await fallback.get_page_requests(space_id, chunk, limit=limit, batch_size=batch_size)
+
+    async def get_page_requests(
+        self,
+        space_id: str,
+        requests: List[PageRequest],
+        limit: int = DEFAULT_LIMIT,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict]:
+        """Страницы тика, распределённые по аккаунтам; ответы в порядке requests."""
+        batch_size = batch_size or self.clients[0].batch_size
+        chunks = [requests[i : i + batch_size] for i in range(0, len(requests), batch_size)]
+        assignment = self._assign(chunks, batch_size)
+        for index in assignment:
+            metrics.inc("poll_shards_total", account=self.clients[index].auth.email or str(index))
+
+        results = await asyncio.gather(
+            *(
+                self._fetch_shard(space_id, chunk, limit, batch_size, index)
+                for chunk, index in zip(chunks, assignment)
+            )
+        )
+        return [page for shard in results for page in shard]
+
+    async def get_sellable_items_pages(
+        self,
+        space_id: str,
+        limit: int = DEFAULT_LIMIT,
+        pages: int = 1,
+        batch_size: Optional[int] = None,
+    ) -> List[Dict]:
+        """Подряд идущие страницы с сортировкой по умолчанию, как у AsyncUbisoftMarketClient."""
+        requests = [PageRequest(offset=i * limit) for i in range(pages)]
+        return await self.get_page_requests(space_id, requests, limit=limit, batch_size=batch_size)
+
+    async def refresh_sessions(self):
+        for client in self.clients:
+            await client.refresh_session()
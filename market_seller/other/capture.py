@@ -0,0 +1,106 @@
+import gzip
+import json
+import queue
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
+
+_STOP = object()
+_OPERATION_RE = re.compile(r"\b(?:query|mutation)\s+(\w+)")
+
+
+@lru_cache(maxsize=64)
+def operation_name(query: str) -> str:
+    """Имя операции GraphQL из текста запроса (GetSellableItems, CreateSellOrder, ...)."""
+    match = _OPERATION_RE.search(getattr(query, "value", query))
+    return match.group(1) if match else "Unknown"
+
+
+class CaptureWriter:
+    """
+    Запись сырых ответов API в сжатый JSONL-файл для последующего воспроизведения.
+
+    Файл только дописывается: каждый запуск добавляет новый gzip-член, а gzip читает
+    их подряд как один поток. Записи запуска помечены run (время его начала): time.monotonic()
+    в поле t сравнимо только внутри одного запуска, tick - номер тика опроса (его выставляет
+    FixedRatePoller), по нему replay.py собирает страницы тика. Сжатие и запись идут в отдельном потоке,
+    сжатый поток сбрасывается на диск не реже раза в flush_interval секунд.
+    """
+
+    def __init__(self, path: str, logger, max_pending: int = 1000, flush_interval: float = 5):
+        self.path = path
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self.run = time.time()
+        self.tick = 0  # Номер текущего тика опроса
+        self.queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="capture-writer", daemon=True)
+            self._thread.start()
+
+    def write(self, operation: str, variables: Dict, response: Dict):
+        """Неблокирующая постановка ответа в очередь на запись."""
+        record = {
+            "t": time.monotonic(),
+            "wall": time.time(),
+            "run": self.run,
+            "tick": self.tick,
+            "op": operation,
+            "variables": variables,
+            "data": response,
+        }
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.logger.warning("Очередь записи ответов переполнена, ответ пропущен")
+
+    def stop(self, timeout: float = 10):
+        """Запись оставшихся ответов и закрытие файла. Блокирующий вызов."""
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                self.logger.warning("Очередь записи ответов не разбирается, останавливаемся без записи остатка")
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        try:
+            with gzip.open(self.path, "at", encoding="utf-8", compresslevel=6) as f:
+                # Без периодического сброса при аварийном останове терялся бы весь хвост запуска
+                next_flush = time.monotonic() + self.flush_interval
+                while True:
+                    try:
+                        record = self.queue.get(timeout=max(next_flush - time.monotonic(), 0))
+                    except queue.Empty:
+                        record = None
+                    if record is _STOP:
+                        break
+                    if record is not None:
+                        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+                        f.write("\n")
+                    if time.monotonic() >= next_flush:
+                        f.flush()
+                        next_flush = time.monotonic() + self.flush_interval
+        except Exception as e:
+            self.logger.error(f"Ошибка записи ответов API: {e}")
+
+
+def read_capture(path: str) -> Iterator[Dict[str, Any]]:
+    """Записи файла в порядке записи. Оборванная последняя строка (аварийный останов) пропускается."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+        except EOFError:
+            return
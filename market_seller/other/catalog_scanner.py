@@ -0,0 +1,202 @@
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from market_seller.config import (
+    BATCH_PAGES_SIZE,
+    CATALOG_HOT_PAGES,
+    CATALOG_HOT_TTL,
+    CATALOG_SORT_ORDERS,
+    CATALOG_SWEEP_PAGES,
+    DEFAULT_SORT_DIRECTION,
+    DEFAULT_SORT_FIELD,
+    ITEMS_LIMIT,
+    PAGES_TO_FETCH,
+)
+from market_seller.market_client import AsyncUbisoftMarketClient, PageRequest
+from market_seller.other.account_pool import AccountPool
+from market_seller.other.metrics import metrics
+from market_seller.other.models import MarketItem
+from market_seller.other.rate_limiter import Priority
+
+Selector = Tuple[str, str]  # (type, tag) для filterBy
+
+
+def _total_count(response: Dict) -> Optional[int]:
+    game = response.get("game") or {}
+    meta = (game.get("viewer") or {}).get("meta") or {}
+    return (meta.get("marketableItems") or {}).get("totalCount")
+
+
+class TieredCatalogScanner:
+    """
+    Опрос рынка с фиксированным бюджетом страниц на тик, разделённым на три уровня:
+
+    - горячие предметы (недавно менялись) - точечные запросы filterBy по типу и самому
+      редкому тегу предмета, каждый тик;
+    - первые страницы основной сортировки, как раньше;
+    - фоновый обход всего каталога по totalCount в нескольких сортировках, по CATALOG_SWEEP_PAGES
+      страниц за тик (в основной сортировке - начиная за первыми страницами). Под паузой
+      ограничителя запросов обход пропускается.
+
+    Предмет, который не менялся дольше hot_ttl, выбывает из горячих. Страница filterBy - это только
+    первые limit предметов под селектором, поэтому селектор, на странице которого горячего предмета
+    не оказалось, для него больше не используется: берётся следующий по узости тег, а без
+    подходящих селекторов предмет остаётся фоновому обходу.
+    """
+
+    def __init__(
+        self,
+        client: Union[AsyncUbisoftMarketClient, AccountPool],
+        space_id: str,
+        logger,
+        limit: int = ITEMS_LIMIT,
+        pages: int = PAGES_TO_FETCH,
+        hot_pages: int = CATALOG_HOT_PAGES,
+        sweep_pages: int = CATALOG_SWEEP_PAGES,
+        hot_ttl: float = CATALOG_HOT_TTL.total_seconds(),
+        sort_orders: List[Tuple[str, str]] = CATALOG_SORT_ORDERS,
+    ):
+        self.client = client
+        self.space_id = space_id
+        self.logger = logger
+        self.limit = limit
+        self.pages = pages
+        self.hot_pages = hot_pages
+        self.sweep_pages = sweep_pages
+        self.hot_ttl = hot_ttl
+        self.sort_orders = sort_orders
+
+        self.state: Dict[str, tuple] = {}  # item_id -> последние (last_sold_at, last_sold_price, active_listings)
+        self.candidates: Dict[str, List[Selector]] = {}  # item_id -> все (type, tag) предмета
+        self.missed: Dict[str, set] = {}  # item_id -> селекторы, на странице которых предмета не было
+        self.selector_sizes: Counter = Counter()  # (type, tag) -> сколько предметов каталога под ним
+        self.hot: Dict[str, float] = {}  # item_id -> время последнего изменения
+        self.front_ids: set = set()  # Предметы, которые и так приходят с первых страниц
+
+        self.sweep_order = 0
+        self.sweep_offset = 0
+        self.sweeps_completed = 0
+
+    def selector(self, item_id: str) -> Optional[Selector]:
+        """Самый узкий (type, tag) предмета среди тех, на странице которых он находился."""
+        missed = self.missed.get(item_id, ())
+        selectors = [selector for selector in self.candidates.get(item_id, ()) if selector not in missed]
+        if not selectors:
+            return None
+        return min(selectors, key=lambda selector: self.selector_sizes[selector])
+
+    def _hot_selectors(self, now: float) -> List[Selector]:
+        """Селекторы горячих предметов, начиная с недавно изменившихся; выбывшие удаляются."""
+        for item_id in [item_id for item_id, changed_at in self.hot.items() if now - changed_at > self.hot_ttl]:
+            del self.hot[item_id]
+            self.missed.pop(item_id, None)
+
+        selectors = []
+        for item_id in sorted(self.hot, key=self.hot.get, reverse=True):
+            selector = self.selector(item_id)
+            if item_id in self.front_ids or selector is None or selector in selectors:
+                continue
+            selectors.append(selector)
+            if len(selectors) == self.hot_pages:
+                break
+        return selectors
+
+    def _check_hot_pages(self, plan: List[Tuple[str, PageRequest]], responses: List[Dict], front_ids: set):
+        """Горячие предметы, которых не оказалось на странице их селектора, переходят на другой селектор."""
+        pages = {
+            (request.item_types[0], request.tags[0]): {
+                node["item"]["itemId"] for node in AsyncUbisoftMarketClient._nodes(response)
+            }
+            for (tier, request), response in zip(plan, responses)
+            if tier == "hot" and response.get("game")
+        }
+        if not pages:
+            return
+        for item_id in self.hot:
+            if item_id in front_ids:
+                continue
+            selector = self.selector(item_id)
+            if selector in pages and item_id not in pages[selector]:
+                self.missed.setdefault(item_id, set()).add(selector)
+                metrics.inc("hot_selector_misses_total")
+
+    def plan(self, now: float) -> List[Tuple[str, PageRequest]]:
+        """Страницы текущего тика: (уровень, запрос). Обход каталога идёт последним и с низким приоритетом."""
+        sweep_pages = 0 if self.client.paused else min(self.sweep_pages, self.pages)
+        hot = self._hot_selectors(now)[: self.pages - sweep_pages]
+        front_pages = self.pages - sweep_pages - len(hot)
+
+        plan = [("hot", PageRequest(item_types=(item_type,), tags=(tag,))) for item_type, tag in hot]
+        plan += [("front", PageRequest(offset=i * self.limit)) for i in range(front_pages)]
+
+        field, direction = self.sort_orders[self.sweep_order]
+        sweep_offset = self.sweep_offset
+        if (field, direction) == (DEFAULT_SORT_FIELD, DEFAULT_SORT_DIRECTION):
+            # В основной сортировке первые страницы и так приходят в этом тике
+            sweep_offset = max(sweep_offset, front_pages * self.limit)
+        plan += [
+            (
+                "sweep",
+                PageRequest(
+                    offset=sweep_offset + i * self.limit,
+                    sort_field=field,
+                    sort_direction=direction,
+                    priority=Priority.LOW,
+                ),
+            )
+            for i in range(sweep_pages)
+        ]
+        return plan
+
+    def _advance_sweep(self, plan: List[Tuple[str, PageRequest]], responses: List[Dict]):
+        sweep = [(request, response) for (tier, request), response in zip(plan, responses) if tier == "sweep"]
+        if not sweep:
+            return
+        total = max((_total_count(response) or 0) for _, response in sweep)
+        self.sweep_offset = sweep[-1][0].offset + self.limit
+        if self.sweep_offset >= total:
+            self.sweep_offset = 0
+            self.sweep_order = (self.sweep_order + 1) % len(self.sort_orders)
+            self.sweeps_completed += 1
+            self.logger.debug(f"Обход каталога завершён: {total} предметов, всего обходов {self.sweeps_completed}")
+
+    def observe(self, items: List[MarketItem], front_ids: set, now: float):
+        """Обновление горячего набора по снимку."""
+        self.front_ids = front_ids
+        for item in items:
+            info = item.market_info
+            fingerprint = (info.last_sold_at, info.last_sold_price, info.active_listings)
+            previous = self.state.get(item.item_id)
+            if previous is None:
+                self.candidates[item.item_id] = [(item.type, tag) for tag in item.tags]
+                for selector in self.candidates[item.item_id]:
+                    self.selector_sizes[selector] += 1
+            elif previous != fingerprint:
+                self.hot[item.item_id] = now
+            self.state[item.item_id] = fingerprint
+
+    async def fetch(self) -> List[MarketItem]:
+        """Один тик опроса: запросы по плану, разбор, обновление горячего набора."""
+        now = time.monotonic()
+        plan = self.plan(now)
+        responses = await self.client.get_page_requests(
+            self.space_id, [request for _, request in plan], limit=self.limit, batch_size=BATCH_PAGES_SIZE
+        )
+        self._advance_sweep(plan, responses)
+
+        recorded_at = datetime.utcnow().isoformat()
+        items: Dict[str, MarketItem] = {}
+        front_ids = set()
+        with metrics.timer("stage_seconds", stage="parse"):
+            for (tier, _), response in zip(plan, responses):
+                for item in self.client.parse_market_data(response, recorded_at):
+                    items[item.item_id] = item
+                    if tier == "front":
+                        front_ids.add(item.item_id)
+
+        snapshot = list(items.values())
+        self._check_hot_pages(plan, responses, front_ids)
+        self.observe(snapshot, front_ids, now)
+        return snapshot
@@ -0,0 +1,70 @@
+import json
+import re
+from functools import lru_cache
+from typing import Any, Dict, Union
+
+from market_seller.config import JSON_CODEC
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен: без него используется стандартный json
+    orjson = None
+
+
+class StdlibCodec:
+    name = "json"
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+    @staticmethod
+    def loads(data: Union[bytes, str]) -> Any:
+        return json.loads(data)
+
+
+class OrjsonCodec:
+    name = "orjson"
+
+    @staticmethod
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value)
+
+    @staticmethod
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+
+def get_codec(name: str = JSON_CODEC):
+    """Кодек по имени: "orjson", "json" или "auto" (orjson, если установлен)."""
+    if name == "orjson" or (name == "auto" and orjson is not None):
+        if orjson is None:
+            raise ImportError("JSON_CODEC = 'orjson', но пакет orjson не установлен")
+        return OrjsonCodec()
+    return StdlibCodec()
+
+
+codec = get_codec()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"\s*([{}()\[\]:,!=])\s*")
+
+
+@lru_cache(maxsize=128)
+def minify_query(query: str) -> str:
+    """Документ GraphQL без лишних пробелов и переносов (в запросах нет строковых литералов)."""
+    text = _WHITESPACE_RE.sub(" ", getattr(query, "value", query))
+    return _PUNCTUATION_RE.sub(r"\1", text).strip()
+
+
+@lru_cache(maxsize=128)
+def _payload_prefix(query: str, codec_name: str) -> bytes:
+    return b'{"query":' + get_codec(codec_name).dumps(minify_query(query)) + b',"variables":'
+
+
+def encode_request(query: str, variables: Dict, json_codec=codec) -> bytes:
+    """
+    Тело запроса {"query": ..., "variables": ...}: документ минифицирован и закодирован
+    один раз на операцию, на каждый вызов кодируются только переменные.
+    """
+    return _payload_prefix(query, json_codec.name) + json_codec.dumps(variables) + b"}"
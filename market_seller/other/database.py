@@ -1,18 +1,30 @@
 import sqlite3
-from typing import Dict, List
+from typing import Dict, Iterator, List
+
+from market_seller.other.models import MarketInfo, MarketItem
 
 
 class DatabaseManager:
     def __init__(self, db_name: str = "ubisoft_market.db"):
         self.db_name = db_name
         self.connection = None
+        # Последняя запись price_history и данные items по каждому предмету: проверки дублей идут в памяти
+        self.last_records: Dict[str, tuple] = {}
+        self.known_items: Dict[str, tuple] = {}
         self.init_database()
+        self._load_last_records()
 
     def init_database(self):
         """Создание таблиц базы данных, если они отсутствуют."""
         self.connection = sqlite3.connect(self.db_name)
         cursor = self.connection.cursor()
 
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute("PRAGMA mmap_size=268435456")
+
         # Создание таблицы для предметов
         cursor.execute(
             """
@@ -47,46 +59,38 @@ class DatabaseManager:
         """
         )
 
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_item_id ON price_history (item_id, id)")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_price_history_item_recorded ON price_history (item_id, recorded_at)"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_recorded ON price_history (recorded_at)")
+
         self.connection.commit()
 
-    def has_identical_previous_record(self, cursor, item_id: str, market_info: Dict) -> bool:
-        """Проверяет, есть ли идентичная предыдущая запись для данного предмета."""
+    def _load_last_records(self):
+        """Загрузка последней записи каждого предмета одним сгруппированным запросом."""
+        cursor = self.connection.cursor()
         cursor.execute(
             """
-            SELECT 
-                lowest_price, highest_price, active_listings,
-                last_sold_price, last_sold_at, lowest_buy_price,
-                highest_buy_price, active_buy_count
-            FROM price_history 
-            WHERE item_id = ? 
-            ORDER BY id DESC 
-            LIMIT 1
-        """,
-            (item_id,),
+            SELECT
+                p.item_id, p.lowest_price, p.highest_price, p.active_listings,
+                p.last_sold_price, p.last_sold_at, p.lowest_buy_price,
+                p.highest_buy_price, p.active_buy_count
+            FROM price_history p
+            JOIN (SELECT item_id, MAX(id) AS id FROM price_history GROUP BY item_id) last ON p.id = last.id
+        """
         )
+        self.last_records = {row[0]: row[1:] for row in cursor}
 
-        last_record = cursor.fetchone()
-        if not last_record:
-            return False
-
-        # Преобразуем last_sold_at в строку ISO формата для сравнения
-        current_last_sold_at = market_info["last_sold_at"].isoformat() if market_info["last_sold_at"] else None
+        cursor.execute("SELECT name, type, item_id, tags, asset_url FROM items")
+        self.known_items = {row[2]: row for row in cursor}
 
+    def has_identical_previous_record(self, item_id: str, market_info: MarketInfo) -> bool:
+        """Проверяет, есть ли идентичная предыдущая запись для данного предмета."""
         # Сравниваем все значения кроме recorded_at
-        current_values = (
-            market_info["lowest_price"],
-            market_info["highest_price"],
-            market_info["active_listings"],
-            market_info["last_sold_price"],
-            current_last_sold_at,
-            market_info["lowest_buy_price"],
-            market_info["highest_buy_price"],
-            market_info["active_buy_count"],
-        )
-
-        return current_values == last_record
+        return self.last_records.get(item_id) == market_info.fingerprint()
 
-    def insert_item(self, item: Dict):
+    def insert_item(self, item: MarketItem):
         """Добавление или обновление предмета в базе данных и запись истории цен."""
         try:
             cursor = self.connection.cursor()
@@ -98,11 +102,12 @@ class DatabaseManager:
                     name, type, item_id, tags, asset_url
                 ) VALUES (?, ?, ?, ?, ?)
             """,
-                (item["name"], item["type"], item["item_id"], ",".join(item["tags"]), item["asset_url"]),
+                (item.name, item.type, item.item_id, ",".join(item.tags), item.asset_url),
             )
 
             # Проверяем, есть ли идентичная предыдущая запись
-            if not self.has_identical_previous_record(cursor, item["item_id"], item["market_info"]):
+            fingerprint = item.market_info.fingerprint()
+            if self.last_records.get(item.item_id) != fingerprint:
                 # Записываем новые данные только если они отличаются
                 cursor.execute(
                     """
@@ -112,25 +117,12 @@ class DatabaseManager:
                         highest_buy_price, active_buy_count, recorded_at
                     ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
-                    (
-                        item["item_id"],
-                        item["market_info"]["lowest_price"],
-                        item["market_info"]["highest_price"],
-                        item["market_info"]["active_listings"],
-                        item["market_info"]["last_sold_price"],
-                        (
-                            item["market_info"]["last_sold_at"].isoformat()
-                            if item["market_info"]["last_sold_at"]
-                            else None
-                        ),
-                        item["market_info"]["lowest_buy_price"],
-                        item["market_info"]["highest_buy_price"],
-                        item["market_info"]["active_buy_count"],
-                        item["market_info"]["recorded_at"],
-                    ),
+                    (item.item_id, *fingerprint, item.market_info.recorded_at),
                 )
 
             self.connection.commit()
+            self.known_items[item.item_id] = (item.name, item.type, item.item_id, ",".join(item.tags), item.asset_url)
+            self.last_records[item.item_id] = fingerprint
         except sqlite3.Error as e:
             print(f"Ошибка при вставке предмета: {e}")
 
@@ -152,53 +144,64 @@ class DatabaseManager:
             print(f"Ошибка при получении истории цен: {e}")
             return []
 
+    def iter_price_history(self, chunk_size: int = 10000) -> Iterator[tuple]:
+        """
+        Потоковое чтение истории цен всех предметов по возрастанию recorded_at.
+        Строки читаются пачками по chunk_size, поэтому память не зависит от размера таблицы.
+        """
+        cursor = self.connection.cursor()
+        cursor.arraysize = chunk_size
+        cursor.execute(
+            """
+            SELECT
+                p.item_id, i.name, i.type, i.tags, i.asset_url,
+                p.lowest_price, p.highest_price, p.active_listings,
+                p.last_sold_price, p.last_sold_at, p.lowest_buy_price,
+                p.highest_buy_price, p.active_buy_count, p.recorded_at
+            FROM price_history p
+            LEFT JOIN items i ON i.item_id = p.item_id
+            ORDER BY p.recorded_at, p.id
+        """
+        )
+        while rows := cursor.fetchmany():
+            yield from rows
+
     def close_connection(self):
         """Закрытие соединения с базой данных."""
         if self.connection:
             self.connection.close()
 
-    def insert_items_batch(self, items: List[Dict]):
+    def insert_items_batch(self, items: List[MarketItem]):
         """Пакетное добавление предметов в базу данных."""
         try:
             cursor = self.connection.cursor()
 
-            # Подготовка данных для items
-            items_data = [
-                (item["name"], item["type"], item["item_id"], ",".join(item["tags"]), item["asset_url"])
-                for item in items
-            ]
+            # Подготовка данных для items: только новые или изменившиеся предметы
+            items_data = {}
+            for item in items:
+                row = (item.name, item.type, item.item_id, ",".join(item.tags), item.asset_url)
+                if self.known_items.get(item.item_id) != row:
+                    items_data[item.item_id] = row
 
             # Пакетная вставка в таблицу items
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO items (
-                    name, type, item_id, tags, asset_url
-                ) VALUES (?, ?, ?, ?, ?)
-            """,
-                items_data,
-            )
+            if items_data:
+                cursor.executemany(
+                    """
+                    INSERT OR REPLACE INTO items (
+                        name, type, item_id, tags, asset_url
+                    ) VALUES (?, ?, ?, ?, ?)
+                """,
+                    list(items_data.values()),
+                )
 
-            # Подготовка данных для price_history
+            # Подготовка данных для price_history; повторы внутри пачки тоже отбрасываются
             price_history_data = []
+            new_records = {}
             for item in items:
-                market_info = item["market_info"]
-
-                # Проверяем наличие идентичной записи
-                if not self.has_identical_previous_record(cursor, item["item_id"], market_info):
-                    price_history_data.append(
-                        (
-                            item["item_id"],
-                            market_info["lowest_price"],
-                            market_info["highest_price"],
-                            market_info["active_listings"],
-                            market_info["last_sold_price"],
-                            market_info["last_sold_at"].isoformat() if market_info["last_sold_at"] else None,
-                            market_info["lowest_buy_price"],
-                            market_info["highest_buy_price"],
-                            market_info["active_buy_count"],
-                            market_info["recorded_at"],
-                        )
-                    )
+                fingerprint = item.market_info.fingerprint()
+                if new_records.get(item.item_id, self.last_records.get(item.item_id)) != fingerprint:
+                    new_records[item.item_id] = fingerprint
+                    price_history_data.append((item.item_id, *fingerprint, item.market_info.recorded_at))
 
             # Пакетная вставка в таблицу price_history
             if price_history_data:
@@ -214,5 +217,7 @@ class DatabaseManager:
                 )
 
             self.connection.commit()
+            self.known_items.update(items_data)
+            self.last_records.update(new_records)
         except sqlite3.Error as e:
             print(f"Ошибка при пакетной вставке предметов: {e}")
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from collections import deque
+from typing import AsyncContextManager, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from market_seller.config import HEDGE_MAX_EXTRA, HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES, HEDGE_QUANTILE
+from market_seller.other.metrics import metrics
+
+T = TypeVar("T")
+
+# Только идемпотентные чтения: мутации (ордера) дублировать нельзя
+HEDGED_OPERATIONS = frozenset(
+    {
+        "GetSellableItems",
+        "GetSellableItemsBatch",
+        "GetSellableItemsHot",
+        "GetSellableItemsHotBatch",
+        "GetSellableItemsCatalog",
+        "GetSellableItemsCatalogBatch",
+        "GetMarketableItems",
+        "GetTransactionsPending",
+    }
+)
+
+
+class RequestHedger:
+    """
+    Дублирование медленных запросов на чтение.
+
+    Если ответ не пришёл за адаптивный порог (квантиль quantile по последним ответам этой
+    операции), отправляется второй такой же запрос; берётся первый успешный ответ, второй
+    отменяется. Дубли не превышают max_extra от общего числа запросов.
+
+    run вызывается, когда исходный запрос уже получил место в ограничителе запросов: порог и замеры
+    считаются от отправки, без ожидания в очереди. Дубль занимает своё место через slot().
+    """
+
+    def __init__(
+        self,
+        quantile: float = HEDGE_QUANTILE,
+        max_extra: float = HEDGE_MAX_EXTRA,
+        min_delay: float = HEDGE_MIN_DELAY,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = 200,
+    ):
+        self.quantile = quantile
+        self.max_extra = max_extra
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.window = window
+        self.latencies: Dict[str, Deque[float]] = {}
+        self._thresholds: Dict[str, Optional[float]] = {}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0  # Сколько раз дубль ответил раньше исходного запроса
+
+    def record(self, operation: str, latency: float):
+        samples = self.latencies.setdefault(operation, deque(maxlen=self.window))
+        samples.append(latency)
+        self._thresholds.pop(operation, None)
+
+    def threshold(self, operation: str) -> Optional[float]:
+        """Порог ожидания перед дублем; None - пока мало замеров."""
+        if operation not in self._thresholds:
+            samples = self.latencies.get(operation)
+            if not samples or len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+            value = ordered[min(int(len(ordered) * self.quantile), len(ordered) - 1)]
+            self._thresholds[operation] = max(value, self.min_delay)
+        return self._thresholds[operation]
+
+    def _within_budget(self) -> bool:
+        return self.hedges + 1 <= self.max_extra * self.requests
+
+    async def _timed(self, operation: str, attempt: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await attempt()
+        self.record(operation, time.monotonic() - started)
+        return result
+
+    async def _extra(
+        self, operation: str, attempt: Callable[[], Awaitable[T]], slot: Callable[[], AsyncContextManager]
+    ) -> T:
+        async with slot():
+            return await self._timed(operation, attempt)
+
+    async def run(
+        self, operation: str, attempt: Callable[[], Awaitable[T]], slot: Callable[[], AsyncContextManager]
+    ) -> T:
+        """Выполнение attempt() с дублем, если он не уложился в порог."""
+        self.requests += 1
+        threshold = self.threshold(operation)
+        primary = asyncio.ensure_future(self._timed(operation, attempt))
+        if threshold is None:
+            return await primary
+
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=threshold)
+            if done or not self._within_budget():
+                return await primary
+
+            self.hedges += 1
+            metrics.inc("hedged_requests_total", operation=operation)
+            pending.add(asyncio.ensure_future(self._extra(operation, attempt, slot)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.hedge_wins += 1
+                            metrics.inc("hedge_wins_total", operation=operation)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
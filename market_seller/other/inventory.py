@@ -0,0 +1,150 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from market_seller.config import ERROR_MAPPING, SELL_SLOT_RECHECK, SELL_SLOTS
+from market_seller.other.metrics import metrics
+from market_seller.other.order_state import BLOCKED, SELLING, OrderRecord, OrderStateStore
+
+# Коды ошибок сервера (ключи ERROR_MAPPING), которые можно предсказать без запроса
+NOT_SELLABLE = "{'code': 1895}"
+NO_FREE_SLOTS = "{'code': 1898}"
+ALREADY_SELLING = "{'code': 1821}"
+NOT_OWNED = "not_owned"
+
+
+class OrderRejected(Exception):
+    """Ордер на продажу не отправлен: сервер наверняка ответил бы ошибкой code."""
+
+    def __init__(self, code: str, item_id: str):
+        super().__init__(f"{ERROR_MAPPING.get(code, 'Ошибка: Предмета нет в инвентаре')} (без запроса, {item_id})")
+        self.code = code
+        self.item_id = item_id
+
+
+class InventoryModel:
+    """
+    Локальная модель слотов продажи и инвентаря, чтобы не тратить мутации на заведомые отказы.
+
+    Занятые слоты - выставленные ордера в OrderStateStore (его сверяет get_pending_trades) плюс
+    ордера, уже отправленные на сервер. Когда слотов нет, ордер ждёт освобождения до wait секунд,
+    сверяясь с активными заказами раз в SELL_SLOT_RECHECK. Лимит слотов уточняется по ответу
+    1898: если сервер отказал при меньшем числе ордеров, значит лимит меньше.
+
+    Инвентарь (isOwned/quantity и activeTrade) заполняется из ответов GetMarketableItems: их
+    получает AsyncUbisoftMarketClient.sync_inventory, которую главный цикл вызывает вместе с
+    проверкой заказов. Наблюдение действует ttl секунд, после чего предмет снова считается неизвестным.
+    """
+
+    def __init__(self, orders: OrderStateStore, logger, capacity: int = SELL_SLOTS):
+        self.orders = orders
+        self.logger = logger
+        self.capacity = capacity
+        self.quantities: Dict[str, Tuple[int, float]] = {}  # item_id -> (количество, время наблюдения)
+        self._reserved = 0  # Ордера, отправленные на сервер и ещё не записанные в хранилище
+        self._released = asyncio.Event()
+        self._recheck_task: Optional[asyncio.Task] = None
+        self._rechecked_at = 0.0
+        orders.listeners.append(self._on_release)
+
+    @property
+    def used(self) -> int:
+        self.orders.expire()
+        return self.orders.selling + self._reserved
+
+    @property
+    def full(self) -> bool:
+        return self.used >= self.capacity
+
+    def _on_release(self, record: OrderRecord):
+        self._released.set()
+
+    def observe_marketable(self, nodes: Iterable[Dict]):
+        """Владение и активный заказ из узлов marketableItems запроса GetMarketableItems."""
+        now = self.orders.clock()
+        for node in nodes:
+            item = node.get("item") or {}
+            item_id = item.get("itemId")
+            meta = (item.get("viewer") or {}).get("meta")
+            if not item_id:
+                continue
+            if meta is not None:
+                self.quantities[item_id] = ((meta.get("quantity") or 0) if meta.get("isOwned") else 0, now)
+
+            trade = ((node.get("viewer") or {}).get("meta") or {}).get("activeTrade")
+            if trade and trade.get("category") == "Sell" and self.orders.by_trade(trade["tradeId"]) is None:
+                self.orders.record_trade(item_id, trade)
+
+    def check(self, item_id: str):
+        """Отказ без запроса, если ордер на этот предмет сервер точно не примет."""
+        code = self._predict_error(item_id)
+        if code:
+            metrics.inc("orders_rejected_locally_total", code=code)
+            raise OrderRejected(code, item_id)
+
+    def _predict_error(self, item_id: str) -> Optional[str]:
+        record = self.orders.get(item_id)
+        if record is not None:
+            if record.state == SELLING:
+                return ALREADY_SELLING
+            if record.state == BLOCKED and record.reason in (NOT_SELLABLE, ALREADY_SELLING):
+                return record.reason
+
+        observed = self.quantities.get(item_id)
+        if observed is not None:
+            quantity, observed_at = observed
+            if observed_at + self.orders.ttl <= self.orders.clock():
+                del self.quantities[item_id]
+            elif quantity <= 0:
+                return NOT_OWNED
+        return None
+
+    async def acquire(self, item_id: str, wait: float, recheck: Callable[[], Awaitable]):
+        """
+        Занять слот под ордер. Пока слотов нет - ждать освобождения (одна сверка заказов recheck
+        на всех ожидающих раз в SELL_SLOT_RECHECK), через wait секунд - OrderRejected с кодом 1898.
+        После ожидания предмет проверяется заново: за это время его могли выставить или продать.
+        """
+        deadline = time.monotonic() + wait
+        waited = self.full
+        if waited:
+            metrics.inc("sell_slot_waits_total")
+        while self.full:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                metrics.inc("orders_rejected_locally_total", code=NO_FREE_SLOTS)
+                raise OrderRejected(NO_FREE_SLOTS, item_id)
+            self._released.clear()
+            try:
+                await asyncio.wait_for(self._released.wait(), min(remaining, SELL_SLOT_RECHECK))
+            except asyncio.TimeoutError:
+                await self._shared_recheck(recheck)
+        if waited:
+            self.check(item_id)
+        self._reserved += 1
+
+    async def _shared_recheck(self, recheck: Callable[[], Awaitable]):
+        if self._recheck_task is None or self._recheck_task.done():
+            if time.monotonic() - self._rechecked_at < SELL_SLOT_RECHECK:
+                return
+            self._rechecked_at = time.monotonic()
+            self._recheck_task = asyncio.ensure_future(self._recheck(recheck))
+        await asyncio.shield(self._recheck_task)
+
+    async def _recheck(self, recheck: Callable[[], Awaitable]):
+        try:
+            await recheck()
+        except Exception as e:
+            self.logger.warning(f"Не удалось сверить заказы при ожидании слота: {e}")
+
+    def release(self):
+        """Слот, занятый acquire: ордер записан в хранилище или не создан."""
+        self._reserved -= 1
+        self._released.set()
+
+    def on_no_free_slots(self):
+        """Сервер ответил 1898 после сверки заказов: лимит не больше числа выставленных ордеров."""
+        selling = self.orders.selling
+        if 0 < selling < self.capacity:
+            self.logger.warning(f"Лимит слотов продажи уточнён: {self.capacity} -> {selling}")
+            self.capacity = selling
@@ -1,29 +1,84 @@
-from collections import deque, defaultdict
-from typing import List, Any, Dict
+import time
+from collections import deque
+from datetime import timedelta
+from typing import List, Any, Dict, Optional, Set, Tuple
 
 
 class MarketChangesTracker:
-    def __init__(self, history_size: int = 10):
+    """
+    Скользящее окно по итерациям с изменениями.
+
+    Для каждого item_id хранится число итераций окна, в которых он встречался. Новая итерация
+    прибавляет свои item_id, вытесненная из окна вычитает, поэтому обновление стоит O(изменений),
+    а не O(размер окна × изменений). Окно ограничивается количеством итераций (history_size)
+    и/или временем (window).
+    """
+
+    def __init__(self, history_size: Optional[int] = 10, window: Optional[timedelta] = None, frequency: int = 3):
         self.history_size = history_size
-        self.changes_history = deque(maxlen=history_size)  # Хранит списки changes для последних N итераций
+        self.window = window
+        self.frequency = frequency
+        self.changes_history: deque = deque()  # (время, множество item_id) для итераций окна
+        self.counts: Dict[str, int] = {}
+        self.frequent_items: Set[str] = set()
+
+    def _increment(self, item_id: str):
+        count = self.counts.get(item_id, 0) + 1
+        self.counts[item_id] = count
+        if count == self.frequency:
+            self.frequent_items.add(item_id)
+
+    def _decrement(self, item_id: str):
+        count = self.counts[item_id] - 1
+        if count:
+            self.counts[item_id] = count
+        else:
+            del self.counts[item_id]
+        if count == self.frequency - 1:
+            self.frequent_items.discard(item_id)
 
-    def add_changes(self, changes: List[Dict[str, Any]], frequency=3) -> List[Dict[str, Any]]:
+    def _evict(self, now: float):
+        history = self.changes_history
+        while history and (
+            (self.history_size and len(history) > self.history_size)
+            or (self.window and now - history[0][0] > self.window.total_seconds())
+        ):
+            for item_id in history.popleft()[1]:
+                self._decrement(item_id)
+
+    def _set_frequency(self, frequency: int):
+        self.frequency = frequency
+        self.frequent_items = {item_id for item_id, count in self.counts.items() if count >= frequency}
+
+    def add_changes(
+        self, changes: List[Dict[str, Any]], frequency: Optional[int] = None, now: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Добавляет новые изменения в историю и возвращает список item_id,
-        которые появились больше двух раз за последние N итераций
+        Добавляет новые изменения в историю и возвращает изменения тех item_id,
+        которые встретились не меньше frequency раз за окно (включая текущую итерацию).
+        now - время итерации в секундах (time.time()), нужно для окна по времени.
         """
-        self.changes_history.append(changes)
+        if frequency is not None and frequency != self.frequency:
+            self._set_frequency(frequency)
+        now = time.time() if now is None else now
+
+        item_ids = {change["item_id"] for change in changes}
+        self.changes_history.append((now, item_ids))
+        for item_id in item_ids:
+            self._increment(item_id)
+        self._evict(now)
 
-        # Подсчитываем частоту появления каждого item_id во всей истории
-        item_frequency = defaultdict(int)
-        for changes_list in self.changes_history:
-            # Получаем уникальные item_id из текущего списка изменений
-            unique_items = {change.item_id for change in changes_list}
-            for item_id in unique_items:
-                item_frequency[item_id] += 1
+        return [change for change in changes if change["item_id"] in self.frequent_items]
 
-        # Находим item_id, которые появились больше двух раз
-        frequent_items = [item_id for item_id, count in item_frequency.items() if count >= frequency]
+    def export_state(self) -> List[Tuple[float, List[str]]]:
+        return [(timestamp, list(item_ids)) for timestamp, item_ids in self.changes_history]
 
-        # Возвращаем изменения только для частых item_id
-        return [change for change in changes if change["item_id"] in frequent_items]
+    def restore_state(self, history: List[Tuple[float, List[str]]]):
+        self.changes_history.clear()
+        self.counts.clear()
+        self.frequent_items.clear()
+        for timestamp, item_ids in history:
+            self.changes_history.append((timestamp, set(item_ids)))
+            for item_id in item_ids:
+                self._increment(item_id)
+        self._evict(time.time())
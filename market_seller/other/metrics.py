@@ -0,0 +1,160 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from aiohttp import web
+
+# Границы корзин: геометрическая сетка от 10 мкс до ~2 минут с шагом 2^(1/8) (~9% точности)
+_BOUNDS: List[float] = [1e-5 * 2 ** (i / 8) for i in range(190)]
+QUANTILES = (0.5, 0.9, 0.99)
+
+LabelKey = Tuple[str, FrozenSet[Tuple[str, str]]]
+
+
+class Histogram:
+    """Гистограмма задержек с логарифмическими корзинами: запись O(log корзин), память постоянная."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q (не больше максимума)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(_BOUNDS[index] if index < len(_BOUNDS) else self.max, self.max)
+        return self.max
+
+
+class Metrics:
+    """
+    Реестр метрик процесса: гистограммы задержек и счётчики с метками.
+    Отдаётся в формате Prometheus (summary + counter) и кратким текстом для Telegram.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[LabelKey, Histogram] = {}
+        self.counters: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> LabelKey:
+        return name, frozenset((key, str(value)) for key, value in labels.items())
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        histogram.record(seconds)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Замер блока кода, в том числе содержащего await."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    @staticmethod
+    def _sorted(series: Dict) -> list:
+        return sorted(series.items(), key=lambda item: (item[0][0], sorted(item[0][1])))
+
+    @staticmethod
+    def _labels(labels: FrozenSet[Tuple[str, str]], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = sorted(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render_prometheus(self) -> str:
+        lines = []
+        typed = set()
+        for (name, labels), histogram in self._sorted(self.histograms):
+            if name not in typed:
+                lines.append(f"# TYPE {name} summary")
+                typed.add(name)
+            for q in QUANTILES:
+                lines.append(f"{name}{self._labels(labels, ('quantile', str(q)))} {histogram.quantile(q):.6f}")
+            lines.append(f"{name}_sum{self._labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {histogram.count}")
+        for (name, labels), value in self._sorted(self.counters):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _short(name: str, labels: FrozenSet[Tuple[str, str]]) -> str:
+        return f"{name}[{','.join(value for _, value in sorted(labels))}]" if labels else name
+
+    def render_text(self) -> str:
+        """Краткая сводка: p50/p95/max в миллисекундах и счётчики."""
+        lines = []
+        for (name, labels), histogram in self._sorted(self.histograms):
+            lines.append(
+                f"{self._short(name, labels)} n={histogram.count} p50={histogram.quantile(0.5) * 1000:.2f} "
+                f"p95={histogram.quantile(0.95) * 1000:.2f} max={histogram.max * 1000:.2f} мс"
+            )
+        for (name, labels), value in self._sorted(self.counters):
+            lines.append(f"{self._short(name, labels)} {value:g}")
+        return "\n".join(lines) or "Метрик пока нет"
+
+
+metrics = Metrics()
+
+
+class MetricsServer:
+    """Локальный HTTP-эндпоинт /metrics в формате Prometheus."""
+
+    def __init__(self, port: int, host: str = "127.0.0.1", registry: Metrics = metrics):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
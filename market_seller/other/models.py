@@ -0,0 +1,143 @@
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+
+@lru_cache(maxsize=16384)
+def parse_timestamp(value: str) -> datetime:
+    """Разбор performedAt с кэшем: у большинства предметов он не меняется между тиками."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+@lru_cache(maxsize=8192)
+def _intern_tags(tags: Tuple[str, ...]) -> Tuple[str, ...]:
+    return tuple(sys.intern(tag) for tag in tags)
+
+
+def _first(stats: Optional[list]) -> Optional[Dict]:
+    return stats[0] if stats else None
+
+
+@dataclass(slots=True)
+class MarketInfo:
+    lowest_price: Optional[int]
+    highest_price: Optional[int]
+    active_listings: Optional[int]
+    last_sold_price: Optional[int]
+    last_sold_at: Optional[datetime]
+    lowest_buy_price: int
+    highest_buy_price: int
+    active_buy_count: int
+    recorded_at: str
+
+    def fingerprint(self) -> tuple:
+        """Значения в порядке колонок price_history, без recorded_at."""
+        return (
+            self.lowest_price,
+            self.highest_price,
+            self.active_listings,
+            self.last_sold_price,
+            self.last_sold_at.isoformat() if self.last_sold_at else None,
+            self.lowest_buy_price,
+            self.highest_buy_price,
+            self.active_buy_count,
+        )
+
+
+@dataclass(slots=True)
+class CatalogEntry:
+    """Статические данные предмета, которые не меняются между тиками."""
+
+    name: str
+    type: str
+    tags: Tuple[str, ...]
+    asset_url: Optional[str]
+
+    @classmethod
+    def from_item(cls, item: Dict) -> "CatalogEntry":
+        """Разбор блока item из ответа с проекцией catalog или full."""
+        return cls(
+            name=sys.intern(item["name"]),
+            type=sys.intern(item["type"]),
+            tags=_intern_tags(tuple(item.get("tags") or ())),
+            asset_url=item.get("assetUrl"),
+        )
+
+
+@dataclass(slots=True)
+class MarketItem:
+    name: str
+    type: str
+    item_id: str
+    tags: Tuple[str, ...]
+    asset_url: Optional[str]
+    market_info: MarketInfo
+
+    @classmethod
+    def from_history_row(cls, row: tuple) -> "MarketItem":
+        """Предмет из строки DatabaseManager.iter_price_history."""
+        (item_id, name, type_, tags, asset_url, lowest, highest, active, last_price, last_at, *buy, recorded_at) = row
+        return cls(
+            name=sys.intern(name or item_id),
+            type=sys.intern(type_ or ""),
+            item_id=item_id,
+            tags=_intern_tags(tuple(tags.split(",")) if tags else ()),
+            asset_url=asset_url,
+            market_info=MarketInfo(
+                lowest_price=lowest,
+                highest_price=highest,
+                active_listings=active,
+                last_sold_price=last_price,
+                last_sold_at=parse_timestamp(last_at) if last_at else None,
+                lowest_buy_price=buy[0],
+                highest_buy_price=buy[1],
+                active_buy_count=buy[2],
+                recorded_at=recorded_at,
+            ),
+        )
+
+    @classmethod
+    def from_node(
+        cls, node: Dict, recorded_at: str, catalog: Optional[Dict[str, CatalogEntry]] = None
+    ) -> Optional["MarketItem"]:
+        """
+        Разбор узла marketableItems.nodes из сырого ответа. Для проекции hot статические поля
+        берутся из catalog по item_id. None - если нет статистики продаж или предмета нет в каталоге.
+        """
+        market_data = node.get("marketData") or {}
+        sell_stats = _first(market_data.get("sellStats"))
+        last_sold = _first(market_data.get("lastSoldAt"))
+        if not (sell_stats and last_sold):
+            return None
+
+        item = node["item"]
+        if "name" in item:
+            entry = CatalogEntry.from_item(item)
+        else:
+            entry = catalog.get(item["itemId"]) if catalog else None
+            if entry is None:
+                return None
+
+        buy_stats = _first(market_data.get("buyStats")) or {}
+        performed_at = last_sold.get("performedAt")
+
+        return cls(
+            name=entry.name,
+            type=entry.type,
+            item_id=item["itemId"],
+            tags=entry.tags,
+            asset_url=entry.asset_url,
+            market_info=MarketInfo(
+                lowest_price=sell_stats.get("lowestPrice"),
+                highest_price=sell_stats.get("highestPrice"),
+                active_listings=sell_stats.get("activeCount"),
+                last_sold_price=last_sold.get("price"),
+                last_sold_at=parse_timestamp(performed_at) if performed_at else None,
+                lowest_buy_price=buy_stats.get("lowestPrice", 0),
+                highest_buy_price=buy_stats.get("highestPrice", 0),
+                active_buy_count=buy_stats.get("activeCount", 0),
+                recorded_at=recorded_at,
+            ),
+        )
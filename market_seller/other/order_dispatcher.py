@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import suppress
+from typing import Awaitable, Callable, Dict, Set
+
+from market_seller.config import ORDER_EXECUTORS, ORDER_QUEUE_SIZE
+
+OrderAction = Callable[[], Awaitable]
+
+
+class OrderDispatcher:
+    """
+    Очередь намерений на создание/отмену ордеров, которую разбирает пул исполнителей.
+
+    Анализ только ставит намерения в очередь и не ждёт мутаций. Пока намерение с ключом
+    (обычно item_id) в очереди или выполняется, повторное с тем же ключом отбрасывается.
+    Долгое ожидание (свободного слота продажи) намерение продолжает через park() вне
+    исполнителей, чтобы они оставались свободны для остальных ордеров и отмен.
+    """
+
+    def __init__(self, logger, workers: int = ORDER_EXECUTORS, maxsize: int = ORDER_QUEUE_SIZE):
+        self.logger = logger
+        self.workers = workers
+        self.maxsize = maxsize
+        self.queue = None
+        self._in_flight: Set[str] = set()
+        self._worker_tasks = []
+        self._background: Set[asyncio.Task] = set()
+        self._parked: Dict[str, asyncio.Task] = {}  # Ключ -> намерение, продолженное вне исполнителей
+
+    def start(self):
+        """Запуск исполнителей в текущем event loop."""
+        if self._worker_tasks:
+            return
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 10):
+        """Дожидается текущих ордеров и уведомлений, затем останавливает исполнителей."""
+        if self.queue is not None:
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.queue.join(), timeout)
+        if self._parked:
+            await asyncio.wait(self._parked.values(), timeout=timeout)
+        for task in self._parked.values():
+            task.cancel()
+        if self._background:
+            await asyncio.wait(self._background, timeout=timeout)
+
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    def is_in_flight(self, key: str) -> bool:
+        return key in self._in_flight
+
+    def submit(self, key: str, action: OrderAction) -> bool:
+        """Поставить намерение в очередь. False - дубликат или очередь переполнена."""
+        if key in self._in_flight:
+            return False
+        if self.queue is None:
+            self.queue = asyncio.Queue(maxsize=self.maxsize)
+
+        try:
+            self.queue.put_nowait((key, action))
+        except asyncio.QueueFull:
+            self.logger.warning(f"Очередь ордеров переполнена, пропускаем {key}")
+            return False
+
+        self._in_flight.add(key)
+        return True
+
+    async def join(self):
+        """Ожидание выполнения всех поставленных намерений, включая продолженные через park()."""
+        if self.queue is not None:
+            await self.queue.join()
+        while self._parked:
+            await asyncio.wait(list(self._parked.values()))
+
+    def park(self, key: str, coro: Awaitable):
+        """Продолжение намерения key в фоне; ключ остаётся занятым, пока оно не завершится."""
+        task = asyncio.ensure_future(coro)
+        self._in_flight.add(key)
+        self._parked[key] = task
+        task.add_done_callback(lambda task: self._on_parked_done(key, task))
+
+    def _on_parked_done(self, key: str, task: asyncio.Task):
+        if self._parked.get(key) is task:
+            del self._parked[key]
+            self._in_flight.discard(key)
+        if not task.cancelled() and task.exception():
+            self.logger.error(f"Ошибка при выполнении ордера {key}: {task.exception()}")
+
+    def fire_and_forget(self, coro: Awaitable):
+        """Запуск фоновой задачи (уведомления), не блокирующей исполнителя."""
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._on_background_done)
+
+    def _on_background_done(self, task: asyncio.Task):
+        self._background.discard(task)
+        if not task.cancelled() and task.exception():
+            self.logger.error(f"Ошибка в фоновой задаче: {task.exception()}")
+
+    async def _worker(self):
+        while True:
+            key, action = await self.queue.get()
+            try:
+                await action()
+            except Exception as e:
+                self.logger.error(f"Ошибка при выполнении ордера {key}: {e}")
+            finally:
+                if key not in self._parked:
+                    self._in_flight.discard(key)
+                self.queue.task_done()
+
@@ -0,0 +1,199 @@
+import heapq
+import time
+from dataclasses import astuple, dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from market_seller.config import MAX_AGE_MINUTES_TRADE, TRADES_CANCEL_CHECK_INTERVAL
+
+SELLING = "selling"  # Ордер на продажу выставлен
+BLOCKED = "blocked"  # Сервер отказал с известным кодом (ERROR_MAPPING), повторять до истечения срока бессмысленно
+
+
+@dataclass(slots=True)
+class OrderRecord:
+    item_id: str
+    state: str
+    created_at: float
+    expires_at: float
+    trade_id: Optional[str] = None
+    price: Optional[int] = None
+    price_drop: bool = False  # Ордер на падении цены: снимается, когда последняя цена сравняется с нашей
+    reason: Optional[str] = None  # Для BLOCKED: код ошибки сервера (ключ ERROR_MAPPING)
+
+
+def _created_at(trade: Dict) -> Optional[float]:
+    created_at = trade.get("createdAt")
+    return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp() if created_at else None
+
+
+def _price(trade: Dict) -> Optional[int]:
+    payment = trade.get("paymentProposal") or (trade.get("paymentOptions") or [{}])[0]
+    return payment.get("price")
+
+
+class OrderStateStore:
+    """
+    Свои ордера на продажу с индексами по item_id и trade_id.
+
+    Запись живёт ttl (MAX_AGE_MINUTES_TRADE - столько ордер стоит до авто-снятия), после чего
+    предмет снова можно продавать; истёкшие записи удаляются при обращении и пачкой в expire().
+    reconcile() сверяет хранилище с активными заказами с сервера: новые заказы добавляются,
+    пропавшие (продан или снят) удаляются, остальные не трогаются.
+
+    Хранилище общее у клиента маркета, анализатора и Telegram-бота; все обращения идут из
+    одного event loop. clock позволяет бэктесту и replay.py подставить время записанных данных.
+    selling - число выставленных ордеров (занятых слотов продажи); listeners вызываются
+    с записью, когда выставленный ордер пропадает из хранилища (продан, снят или истёк).
+    """
+
+    def __init__(
+        self,
+        ttl: timedelta = timedelta(minutes=MAX_AGE_MINUTES_TRADE),
+        clock: Callable[[], float] = time.time,
+    ):
+        self.ttl = ttl.total_seconds()
+        self.clock = clock
+        self._by_item: Dict[str, OrderRecord] = {}
+        self._by_trade: Dict[str, OrderRecord] = {}
+        self.price_drops: Dict[str, OrderRecord] = {}  # item_id -> ордер на падении цены
+        self._expiry: List[Tuple[float, str]] = []  # heap (expires_at, item_id), возможны устаревшие элементы
+        self.selling = 0
+        self.expired = 0  # Сколько записей удалено по истечении срока
+        self.listeners: List[Callable[[OrderRecord], None]] = []
+
+    def __len__(self) -> int:
+        return len(self._by_item)
+
+    def __contains__(self, item_id: str) -> bool:
+        return self.get(item_id) is not None
+
+    def get(self, item_id: str) -> Optional[OrderRecord]:
+        record = self._by_item.get(item_id)
+        if record is not None and record.expires_at <= self.clock():
+            self._remove(record)
+            self.expired += 1
+            return None
+        return record
+
+    def by_trade(self, trade_id: str) -> Optional[OrderRecord]:
+        record = self._by_trade.get(trade_id)
+        return record if record is not None and self.get(record.item_id) is record else None
+
+    def _put(self, record: OrderRecord):
+        previous = self._by_item.get(record.item_id)
+        if previous is not None:
+            self._remove(previous)
+        self._by_item[record.item_id] = record
+        if record.state == SELLING:
+            self.selling += 1
+        if record.trade_id:
+            self._by_trade[record.trade_id] = record
+        if record.price_drop:
+            self.price_drops[record.item_id] = record
+        heapq.heappush(self._expiry, (record.expires_at, record.item_id))
+
+    def _remove(self, record: OrderRecord):
+        if self._by_item.get(record.item_id) is record:
+            del self._by_item[record.item_id]
+            if record.state == SELLING:
+                self.selling -= 1
+                for listener in self.listeners:
+                    listener(record)
+        if record.trade_id and self._by_trade.get(record.trade_id) is record:
+            del self._by_trade[record.trade_id]
+        if self.price_drops.get(record.item_id) is record:
+            del self.price_drops[record.item_id]
+
+    def record_order(
+        self, item_id: str, trade_id: str, price: int, created_at: Optional[float] = None, price_drop: bool = False
+    ) -> OrderRecord:
+        """Выставленный ордер на продажу."""
+        created_at = created_at or self.clock()
+        record = OrderRecord(item_id, SELLING, created_at, created_at + self.ttl, trade_id, price, price_drop)
+        self._put(record)
+        return record
+
+    def record_trade(self, item_id: str, trade: Dict) -> OrderRecord:
+        """Ордер из узла заказа API (trades из GetTransactionsPending, activeTrade из GetMarketableItems)."""
+        return self.record_order(item_id, trade["tradeId"], _price(trade), _created_at(trade))
+
+    def block(self, item_id: str, reason: Optional[str] = None) -> OrderRecord:
+        """Предмет, который сервер сейчас не даёт продать. Выставленный ордер не затирается."""
+        record = self.get(item_id)
+        if record is not None and record.state == SELLING:
+            return record
+        now = self.clock()
+        record = OrderRecord(item_id, BLOCKED, now, now + self.ttl, reason=reason)
+        self._put(record)
+        return record
+
+    def mark_price_drop(self, item_id: str):
+        record = self.get(item_id)
+        if record is not None:
+            record.price_drop = True
+            self.price_drops[item_id] = record
+
+    def update_price(self, trade_id: str, price: int):
+        record = self.by_trade(trade_id)
+        if record is not None:
+            record.price = price
+
+    def remove_trade(self, trade_id: str):
+        record = self._by_trade.get(trade_id)
+        if record is not None:
+            self._remove(record)
+
+    def expire(self) -> int:
+        """Удаление истёкших записей; O(1), если истекать нечему."""
+        now = self.clock()
+        expired = 0
+        while self._expiry and self._expiry[0][0] <= now:
+            _, item_id = heapq.heappop(self._expiry)
+            record = self._by_item.get(item_id)
+            if record is not None and record.expires_at <= now:
+                self._remove(record)
+                expired += 1
+        self.expired += expired
+        return expired
+
+    def reconcile(self, trades: Iterable[Dict], as_of: float) -> Tuple[int, int]:
+        """
+        Сверка с полным списком активных заказов на продажу (узлы trades из GetTransactionsPending).
+        as_of - время до запроса списка: более новые ордера в нём могут ещё не появиться.
+        Активный заказ остаётся известен хотя бы до следующей проверки заказов.
+        Возвращает (добавлено, удалено).
+        """
+        keep_until = self.clock() + TRADES_CANCEL_CHECK_INTERVAL.total_seconds()
+        pending = set()
+        added = 0
+        for trade in trades:
+            trade_id = trade["tradeId"]
+            pending.add(trade_id)
+            record = self._by_trade.get(trade_id)
+            if record is None:
+                item_id = trade["tradeItems"][0]["item"]["itemId"]
+                record = self.record_trade(item_id, trade)
+                added += 1
+            if record.expires_at < keep_until:
+                record.expires_at = keep_until
+                heapq.heappush(self._expiry, (keep_until, record.item_id))
+
+        gone = [
+            record
+            for trade_id, record in self._by_trade.items()
+            if trade_id not in pending and record.created_at < as_of
+        ]
+        for record in gone:
+            self._remove(record)
+        return added, len(gone)
+
+    def export_state(self) -> List[tuple]:
+        return [astuple(record) for record in self._by_item.values()]
+
+    def restore_state(self, state: List[tuple]):
+        now = self.clock()
+        for values in state:
+            record = OrderRecord(*values)
+            if record.expires_at > now:
+                self._put(record)
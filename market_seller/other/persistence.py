@@ -0,0 +1,102 @@
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from market_seller.config import PERSIST_BATCH_SIZE, PERSIST_FLUSH_INTERVAL, PERSIST_QUEUE_SIZE
+from market_seller.other.database import DatabaseManager
+from market_seller.other.metrics import metrics
+from market_seller.other.models import MarketItem
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Потоковая запись снимков в SQLite из отдельного потока.
+
+    Event loop только кладёт снимок в очередь. Поток сбрасывает накопленное пачками не реже
+    раза в flush_interval секунд; неизменившиеся предметы отбрасывает DatabaseManager по
+    последней записи каждого предмета, поэтому память не растёт со временем работы.
+    Упавший поток перезапускается при следующей постановке снимка, ошибка пишется в лог.
+    """
+
+    def __init__(
+        self,
+        db_name: str,
+        logger,
+        flush_interval: float = PERSIST_FLUSH_INTERVAL,
+        batch_size: int = PERSIST_BATCH_SIZE,
+        max_pending: int = PERSIST_QUEUE_SIZE,
+    ):
+        self.db_name = db_name
+        self.logger = logger
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self.error: Optional[Exception] = None  # Последняя ошибка, остановившая поток
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, items: List[MarketItem]):
+        """Неблокирующая постановка снимка в очередь на запись."""
+        if self._thread is not None and not self._thread.is_alive():
+            self.logger.error(f"Поток записи в БД остановился ({self.error}), перезапускаем")
+            metrics.inc("db_writer_restarts_total")
+            self._thread = None
+            self.start()
+        try:
+            self.queue.put_nowait(items)
+        except queue.Full:
+            self.logger.warning("Очередь записи в БД переполнена, снимок пропущен")
+
+    def stop(self, timeout: float = 30):
+        """Запись оставшихся данных и остановка потока. Блокирующий вызов."""
+        if self._thread is None:
+            return
+        if self._thread.is_alive():
+            try:
+                self.queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                self.logger.warning("Очередь записи в БД не разбирается, останавливаемся без записи остатка")
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.logger.warning("Поток записи в БД не завершился вовремя")
+        self._thread = None
+
+    def _flush(self, db: DatabaseManager, buffer: List[MarketItem]):
+        if buffer:
+            with metrics.timer("stage_seconds", stage="db_flush"):
+                db.insert_items_batch(buffer)
+            buffer.clear()
+
+    def _run(self):
+        # sqlite3-соединение создаётся и используется только в этом потоке
+        db = DatabaseManager(self.db_name)
+        buffer: List[MarketItem] = []
+        next_flush = time.monotonic() + self.flush_interval
+        try:
+            while True:
+                try:
+                    items = self.queue.get(timeout=max(next_flush - time.monotonic(), 0))
+                except queue.Empty:
+                    items = None
+
+                if items is _STOP:
+                    break
+                if items:
+                    buffer.extend(items)
+
+                if len(buffer) >= self.batch_size or time.monotonic() >= next_flush:
+                    self._flush(db, buffer)
+                    next_flush = time.monotonic() + self.flush_interval
+        except Exception as e:
+            self.error = e
+            self.logger.error(f"Ошибка в потоке записи в БД: {e}")
+        finally:
+            self._flush(db, buffer)
+            db.close_connection()
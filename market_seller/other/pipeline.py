@@ -0,0 +1,102 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Optional
+
+from market_seller.other.capture import CaptureWriter
+from market_seller.other.metrics import metrics
+from market_seller.other.models import MarketItem
+from market_seller.other.utils import play_notification_sound
+
+
+@dataclass(slots=True)
+class Snapshot:
+    seq: int
+    items: List[MarketItem]
+    started_at: float  # time.monotonic() начала запроса
+    received_at: float  # time.monotonic() получения и разбора ответа
+    parsed_at: float = 0.0  # time.time() окончания разбора, для трассировки реакции
+
+
+@dataclass
+class PollerStats:
+    ticks: int = 0
+    deadline_misses: int = 0
+    dropped_snapshots: int = 0
+    fetch_errors: int = 0
+    last_fetch_seconds: float = 0.0
+
+
+class FixedRatePoller:
+    """
+    Опрос рынка с фиксированной частотой по монотонным часам.
+
+    Снимки кладутся в ограниченную очередь; если анализ не успевает, устаревший снимок
+    выбрасывается в пользу свежего. Следующий запрос идёт параллельно с анализом предыдущего.
+    С interval = 0 fetch вызывается сразу снова: так работает источник, который сам ждёт данных.
+    Номер тика передаётся в capture, чтобы записанные ответы можно было сгруппировать по тикам.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[List[MarketItem]]],
+        interval: float,
+        queue: asyncio.Queue,
+        logger,
+        capture: Optional[CaptureWriter] = None,
+    ):
+        self.fetch = fetch
+        self.interval = interval
+        self.queue = queue
+        self.logger = logger
+        self.capture = capture
+        self.stats = PollerStats()
+
+    def _publish(self, snapshot: Snapshot):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.stats.dropped_snapshots += 1
+            metrics.inc("dropped_snapshots_total")
+        self.queue.put_nowait(snapshot)
+
+    async def run(self):
+        next_tick = time.monotonic()
+        seq = 0
+        while True:
+            started_at = time.monotonic()
+            seq += 1
+            if self.capture:
+                self.capture.tick = seq
+            try:
+                items = await self.fetch()
+                self._publish(
+                    Snapshot(
+                        seq=seq,
+                        items=items,
+                        started_at=started_at,
+                        received_at=time.monotonic(),
+                        parsed_at=time.time(),
+                    )
+                )
+            except Exception as e:
+                self.stats.fetch_errors += 1
+                metrics.inc("fetch_errors_total")
+                self.logger.critical(f"Ошибка: {e}")
+                play_notification_sound()
+
+            now = time.monotonic()
+            self.stats.ticks += 1
+            self.stats.last_fetch_seconds = now - started_at
+            metrics.observe("stage_seconds", now - started_at, stage="fetch")
+            if not self.interval:
+                continue  # Источник сам ждёт новых данных (процессы-опросчики)
+            next_tick += self.interval
+
+            if now > next_tick:
+                # Запрос не уложился в период: фиксируем промах и сразу начинаем следующий
+                self.stats.deadline_misses += 1
+                metrics.inc("deadline_misses_total")
+                self.logger.debug(f"Пропущен дедлайн тика {seq}: опоздание {now - next_tick:.3f} с")
+                next_tick = now
+            else:
+                await asyncio.sleep(next_tick - now)
@@ -0,0 +1,224 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from market_seller.config import (
+    API_URL,
+    BATCH_PAGES_SIZE,
+    ITEMS_LIMIT,
+    MAX_CONCURRENT_REQUESTS,
+    PAGES_TO_FETCH,
+    POLL_WORKER_RATE_SHARE,
+    POLL_WORKER_WAKEUP,
+    POLL_WORKERS,
+    RATE_LIMIT_BURST,
+    RATE_LIMIT_MAX_RPS,
+    RATE_LIMIT_MIN_RPS,
+    RATE_LIMIT_RAMP_STEP,
+    SLEEP_INTERVAL,
+    SPACE_ID,
+)
+from market_seller.market_client import AsyncUbisoftMarketClient, PageRequest
+from market_seller.other.auth import UbisoftAuth
+from market_seller.other.metrics import metrics
+from market_seller.other.models import CatalogEntry, MarketItem
+from market_seller.other.rate_limiter import AdaptiveRateLimiter
+from market_seller.other.shared_snapshot import SharedSnapshot, materialize
+from market_seller.other.token_manager import AsyncTokenManager
+from market_seller.other.utils import setup_logger
+
+
+def share_rate_limiter(share: float) -> AdaptiveRateLimiter:
+    """Ограничитель на долю share лимита аккаунта: сервер считает запросы всех процессов вместе."""
+    return AdaptiveRateLimiter(
+        max_rate=RATE_LIMIT_MAX_RPS * share,
+        min_rate=RATE_LIMIT_MIN_RPS * share,
+        burst=max(1, round(RATE_LIMIT_BURST * share)),
+        max_concurrency=max(1, round(MAX_CONCURRENT_REQUESTS * share)),
+        ramp_step=RATE_LIMIT_RAMP_STEP * share,
+    )
+
+
+class _RelayedTokenManager(AsyncTokenManager):
+    """Тикет опросчику передаёт главный процесс; сам опросчик сессию не обновляет."""
+
+    async def refresh(self, prefer_remember_me: bool = False) -> Dict[str, Any]:
+        return {}
+
+    def apply(self, token: str):
+        self.auth.token = token
+        self._notify_listeners()
+
+
+def _worker_main(index: int, workers: int, snapshot_name: str, settings: Dict, tokens, catalog_out, stop):
+    """Точка входа процесса-опросчика."""
+    try:
+        asyncio.run(_poll(index, workers, snapshot_name, settings, tokens, catalog_out, stop))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _poll(index: int, workers: int, snapshot_name: str, settings: Dict, tokens, catalog_out, stop):
+    logger = setup_logger(name=f"poll_worker_{index}")
+    limit, interval = settings["limit"], settings["interval"]
+    snapshot = SharedSnapshot.attach(snapshot_name, settings["pages"] * limit, workers)
+    token_manager = _RelayedTokenManager(UbisoftAuth(logger=logger, token_file=""), logger)
+    token_manager.apply(tokens.get())
+
+    client = AsyncUbisoftMarketClient(token_manager, logger, api_url=settings["api_url"])
+    client.rate_limiter = share_rate_limiter(POLL_WORKER_RATE_SHARE / workers)
+    # Страницы через одну: первые (самые горячие) страницы достаются разным процессам
+    pages = list(range(index, settings["pages"], workers))
+    requests = [PageRequest(offset=page * limit) for page in pages]
+    sent = set()
+    await client.init_session()
+
+    next_tick = time.monotonic()
+    try:
+        while not stop.is_set():
+            try:
+                while True:
+                    token_manager.apply(tokens.get_nowait())
+            except queue.Empty:
+                pass
+
+            try:
+                responses = await client.get_page_requests(
+                    settings["space_id"], requests, limit=limit, batch_size=BATCH_PAGES_SIZE
+                )
+                recorded_at = datetime.utcnow().isoformat()
+                new_entries = []
+                for page, response in zip(pages, responses):
+                    items = client.parse_market_data(response, recorded_at)
+                    for item in items:
+                        if item.item_id not in sent:
+                            sent.add(item.item_id)
+                            new_entries.append((item.item_id, item.name, item.type, item.tags, item.asset_url))
+                    snapshot.write_rows(page * limit, items, limit)
+                if new_entries:
+                    catalog_out.put(new_entries)
+                snapshot.publish(index, time.time())
+            except Exception as e:
+                logger.error(f"Опросчик {index}: ошибка тика: {e}")
+
+            next_tick += interval
+            now = time.monotonic()
+            if now > next_tick:
+                next_tick = now
+            else:
+                await asyncio.sleep(next_tick - now)
+    finally:
+        await client.close_session()
+        snapshot.close()
+
+
+class PollWorkers:
+    """
+    Опрос рынка в отдельных процессах: каждый процесс-опросчик владеет своей частью страниц,
+    сам декодирует и разбирает ответы и пишет числовые поля в SharedSnapshot. Главный процесс
+    только копирует колонки и собирает из них MarketItem для анализатора, поэтому разбор JSON
+    не конкурирует с анализом и отправкой ордеров, которые остаются в главном процессе.
+
+    Статические поля (название, тип, теги) опросчики присылают один раз на предмет через очередь,
+    тикет - получают от токен-менеджера главного процесса при каждом обновлении.
+    """
+
+    def __init__(
+        self,
+        token_manager: AsyncTokenManager,
+        logger,
+        workers: int = POLL_WORKERS,
+        api_url: str = API_URL,
+        space_id: str = SPACE_ID,
+        pages: int = PAGES_TO_FETCH,
+        limit: int = ITEMS_LIMIT,
+        interval: float = SLEEP_INTERVAL,
+    ):
+        self.token_manager = token_manager
+        self.logger = logger
+        self.workers = workers
+        self.settings = {"api_url": api_url, "space_id": space_id, "pages": pages, "limit": limit, "interval": interval}
+        self.catalog: Dict[str, CatalogEntry] = {}
+        self.snapshot: Optional[SharedSnapshot] = None
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self._token_queues: List[Optional[multiprocessing.Queue]] = [None] * workers
+        self._catalog_queue = None
+        self._stop = None
+        self._generation = 0
+
+    def _spawn(self, index: int):
+        tokens = self._context.Queue()
+        if self.token_manager.token:
+            tokens.put(self.token_manager.token)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self.workers, self.snapshot.name, self.settings, tokens, self._catalog_queue, self._stop),
+            name=f"poll_worker_{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+        self._token_queues[index] = tokens
+
+    def start(self):
+        self.snapshot = SharedSnapshot.create(self.settings["pages"] * self.settings["limit"], self.workers)
+        self._catalog_queue = self._context.Queue()
+        self._stop = self._context.Event()
+        for index in range(self.workers):
+            self._spawn(index)
+        self.token_manager.add_listener(self._relay_token)
+        self.logger.info(f"Запущено процессов-опросчиков: {self.workers}")
+
+    def _relay_token(self, token: str):
+        if self._stop is None or self._stop.is_set():
+            return
+        for tokens in self._token_queues:
+            tokens.put(token)
+
+    def _check_workers(self):
+        for index, process in enumerate(self._processes):
+            if not process.is_alive():
+                self.logger.warning(f"Опросчик {index} завершился с кодом {process.exitcode}, перезапускаем")
+                metrics.inc("poll_worker_restarts_total")
+                self._spawn(index)
+
+    def _drain_catalog(self):
+        try:
+            while True:
+                for item_id, name, type_, tags, asset_url in self._catalog_queue.get_nowait():
+                    self.catalog[item_id] = CatalogEntry(name=name, type=type_, tags=tags, asset_url=asset_url)
+        except queue.Empty:
+            pass
+
+    async def fetch(self) -> List[MarketItem]:
+        """Следующий снимок: ждёт, пока хотя бы один опросчик опубликует тик, и читает все строки."""
+        while self.snapshot.generation() == self._generation:
+            self._check_workers()
+            await asyncio.sleep(POLL_WORKER_WAKEUP)
+        self._generation = self.snapshot.generation()
+        self._drain_catalog()
+
+        with metrics.timer("stage_seconds", stage="parse"):
+            ids, values, torn = self.snapshot.read()
+            items, _ = materialize(ids, values, self.catalog, datetime.utcnow().isoformat())
+        if torn:
+            metrics.inc("snapshot_torn_rows_total", torn)
+        return items
+
+    def stop(self, timeout: float = 5):
+        if self._stop is None:
+            return
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        for channel in (*self._token_queues, self._catalog_queue):
+            channel.cancel_join_thread()
+            channel.close()
+        self.snapshot.close()
+        self.snapshot = None
@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, suppress
+from enum import IntEnum
+from typing import Optional
+
+
+class Priority(IntEnum):
+    HIGH = 0  # Мутации: создание/отмена ордеров
+    NORMAL = 1  # Опрос рынка
+    LOW = 2  # Фоновый обход каталога
+
+
+class AdaptiveRateLimiter:
+    """
+    Общий для клиента ограничитель запросов: token bucket + лимит параллельности.
+
+    Скорость подстраивается под сервер: при "Too many requests ... N seconds" все вызовы
+    ставятся на паузу на N секунд, скорость снижается до наблюдаемой в момент ответа,
+    после чего плавно растёт обратно. Ожидающие обслуживаются по приоритету, затем по очереди.
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        min_rate: float,
+        burst: int,
+        max_concurrency: int,
+        ramp_step: float,
+        backoff: float = 0.5,
+    ):
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.ramp_step = ramp_step
+        self.backoff = backoff
+
+        self.rate = max_rate
+        self.ceiling = max_rate  # Последняя выученная допустимая скорость
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        self._waiters = []  # heap из (priority, seq)
+        self._seq = itertools.count()
+        self._grants = deque(maxlen=1024)
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _refill(self, now: float):
+        """Пополнение токенов и постепенное восстановление скорости после паузы."""
+        elapsed = now - max(self._updated, self._paused_until)
+        if elapsed > 0 and self.rate < self.max_rate:
+            # До выученного потолка растём быстро, выше него - осторожно прощупываем
+            step = self.ramp_step if self.rate < self.ceiling else self.ramp_step / 4
+            self.rate = min(self.max_rate, self.rate + step * elapsed)
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = max(self._updated, now)
+
+    def _try_grant(self, entry) -> Optional[float]:
+        """0 - слот выдан; число - сколько подождать; None - ждать уведомления."""
+        if self._waiters[0] != entry or self._active >= self.max_concurrency:
+            return None
+
+        now = time.monotonic()
+        if now < self._paused_until:
+            return self._paused_until - now
+
+        self._refill(now)
+        if self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+
+        self._tokens -= 1
+        self._active += 1
+        self._grants.append(now)
+        heapq.heappop(self._waiters)
+        return 0
+
+    async def acquire(self, priority: Priority = Priority.NORMAL):
+        condition = self._get_condition()
+        entry = (int(priority), next(self._seq))
+
+        async with condition:
+            heapq.heappush(self._waiters, entry)
+            condition.notify_all()
+            try:
+                while True:
+                    delay = self._try_grant(entry)
+                    if delay == 0:
+                        condition.notify_all()
+                        return
+                    if delay is None:
+                        await condition.wait()
+                    else:
+                        with suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(condition.wait(), delay)
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    condition.notify_all()
+                raise
+
+    async def release(self):
+        condition = self._get_condition()
+        async with condition:
+            self._active -= 1
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def on_rate_limited(self, seconds: float):
+        """Обработка подсказки сервера: пауза для всех и снижение скорости."""
+        now = time.monotonic()
+        window = max(float(seconds), 1.0)
+        observed = sum(1 for granted_at in self._grants if now - granted_at <= window) / window
+
+        self._refill(now)
+        self.ceiling = max(self.min_rate, min(observed, self.rate) if observed else self.rate * self.backoff)
+        self.rate = max(self.min_rate, min(self.rate * self.backoff, self.ceiling))
+        self._tokens = 0.0
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._updated = self._paused_until
+
+    @property
+    def paused(self) -> bool:
+        return time.monotonic() < self._paused_until
+
+    def headroom(self) -> float:
+        """Сколько запросов можно отправить прямо сейчас без ожидания (с учётом очереди)."""
+        now = time.monotonic()
+        if now < self._paused_until:
+            return 0.0
+        self._refill(now)
+        return max(0.0, self._tokens - len(self._waiters))
@@ -88,6 +88,76 @@ class RequestsParams(str, Enum):
                     }
                 }
             """
+    # Проекция для опроса: только то, что читает анализатор. Статика предмета берётся из каталога
+    GET_SELLABLE_ITEMS_HOT_QUERY = """
+                query GetSellableItemsHot($spaceId: String!, $limit: Int!, $offset: Int, $filterBy: MarketableItemFilter, $sortBy: MarketableItemSort) {
+                    game(spaceId: $spaceId) {
+                        viewer {
+                            meta {
+                                marketableItems(
+                                    limit: $limit
+                                    offset: $offset
+                                    filterBy: $filterBy
+                                    sortBy: $sortBy
+                                    withMarketData: true
+                                ) {
+                                    nodes {
+                                        item {
+                                            itemId
+                                        }
+                                        marketData {
+                                            sellStats {
+                                                lowestPrice
+                                                highestPrice
+                                                activeCount
+                                            }
+                                            lastSoldAt {
+                                                price
+                                                performedAt
+                                            }
+                                            buyStats {
+                                                lowestPrice
+                                                highestPrice
+                                                activeCount
+                                            }
+                                        }
+                                    }
+                                    totalCount
+                                }
+                            }
+                        }
+                    }
+                }
+            """
+    # Статические данные предметов (название, тип, теги, картинка), запрашиваются только для новых item_id
+    GET_SELLABLE_ITEMS_CATALOG_QUERY = """
+                query GetSellableItemsCatalog($spaceId: String!, $limit: Int!, $offset: Int, $filterBy: MarketableItemFilter, $sortBy: MarketableItemSort) {
+                    game(spaceId: $spaceId) {
+                        viewer {
+                            meta {
+                                marketableItems(
+                                    limit: $limit
+                                    offset: $offset
+                                    filterBy: $filterBy
+                                    sortBy: $sortBy
+                                    withMarketData: true
+                                ) {
+                                    nodes {
+                                        item {
+                                            assetUrl
+                                            itemId
+                                            name
+                                            tags
+                                            type
+                                        }
+                                    }
+                                    totalCount
+                                }
+                            }
+                        }
+                    }
+                }
+            """
     GET_MARKETABLE_ITEMS_QUERY = """
                 query GetMarketableItems($spaceId: String!, $limit: Int!, $offset: Int, $filterBy: MarketableItemFilter, $withOwnership: Boolean = true, $sortBy: MarketableItemSort) {
                     game(spaceId: $spaceId) {
@@ -293,3 +363,12 @@ class RequestsParams(str, Enum):
             }
         }
     """
+
+
+# Проекции GetSellableItems: "full" - все поля в одном запросе, "hot" - цены для опроса,
+# "catalog" - статика предметов для кэша по item_id
+SELLABLE_ITEMS_QUERIES = {
+    "full": RequestsParams.GET_SELLABLE_ITEMS_REQUEST,
+    "hot": RequestsParams.GET_SELLABLE_ITEMS_HOT_QUERY,
+    "catalog": RequestsParams.GET_SELLABLE_ITEMS_CATALOG_QUERY,
+}
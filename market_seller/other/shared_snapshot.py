@@ -0,0 +1,209 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from market_seller.other.models import CatalogEntry, MarketInfo, MarketItem
+
+# Колонки в порядке MarketInfo.fingerprint(); last_sold_at хранится в микросекундах эпохи (точно в float64)
+COLUMNS = 8
+ITEM_ID_DTYPE = np.dtype("S64")
+READ_RETRIES = 100
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=16384)
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def _to_micros(value: Optional[datetime]) -> float:
+    return (value - _EPOCH) // timedelta(microseconds=1) if value else np.nan
+
+
+def _optional_int(value: float) -> Optional[int]:
+    return None if value != value else int(value)
+
+
+def _layout(rows: int, workers: int) -> List[Tuple[str, tuple, np.dtype]]:
+    return [
+        ("versions", (rows,), np.dtype(np.uint64)),
+        ("values", (COLUMNS, rows), np.dtype(np.float64)),
+        ("item_ids", (rows,), ITEM_ID_DTYPE),
+        ("ticks", (workers,), np.dtype(np.int64)),
+        ("published_at", (workers,), np.dtype(np.float64)),
+    ]
+
+
+class SharedSnapshot:
+    """
+    Колоночный снимок рынка в разделяемой памяти: строка на позицию предмета в выдаче
+    (страница * limit + номер на странице), колонки - числовые поля MarketInfo и item_id.
+
+    Каждую строку пишет ровно один процесс-опросчик (владелец страницы), поэтому достаточно
+    seqlock на строку: счётчик версии нечётный, пока строка пишется. Читатель копирует колонки
+    и перечитывает строки, у которых версия была нечётной или изменилась за время копирования.
+    Строки с неизменившимися значениями не переписываются и версию не меняют.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, rows: int, workers: int, owner: bool):
+        self.shm = shm
+        self.rows = rows
+        self.workers = workers
+        self.owner = owner
+        offset = 0
+        for name, shape, dtype in _layout(rows, workers):
+            setattr(self, name, np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+            offset += int(np.prod(shape)) * dtype.itemsize
+
+    @classmethod
+    def create(cls, rows: int, workers: int) -> "SharedSnapshot":
+        size = sum(int(np.prod(shape)) * dtype.itemsize for _, shape, dtype in _layout(rows, workers))
+        snapshot = cls(shared_memory.SharedMemory(create=True, size=size), rows, workers, owner=True)
+        snapshot.versions[:] = 0
+        snapshot.values[:] = np.nan
+        snapshot.item_ids[:] = b""
+        snapshot.ticks[:] = 0
+        snapshot.published_at[:] = 0.0
+        return snapshot
+
+    @classmethod
+    def attach(cls, name: str, rows: int, workers: int) -> "SharedSnapshot":
+        return cls(shared_memory.SharedMemory(name=name), rows, workers, owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        # Представления NumPy держат буфер, без их удаления SharedMemory.close() падает
+        for name, _, _ in _layout(self.rows, self.workers):
+            delattr(self, name)
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    # Запись (процесс-опросчик)
+
+    @staticmethod
+    def _columns(items: List[MarketItem], size: int) -> np.ndarray:
+        values = np.full((COLUMNS, size), np.nan)
+        if items:
+            values[:, : len(items)] = np.array(
+                [
+                    (
+                        info.lowest_price,
+                        info.highest_price,
+                        info.active_listings,
+                        info.last_sold_price,
+                        _to_micros(info.last_sold_at),
+                        info.lowest_buy_price,
+                        info.highest_buy_price,
+                        info.active_buy_count,
+                    )
+                    for info in (item.market_info for item in items)
+                ],
+                dtype=np.float64,
+            ).T
+        return values
+
+    def write_rows(self, start: int, items: List[MarketItem], size: int) -> int:
+        """
+        Запись страницы в строки [start, start + size); лишние строки очищаются.
+        Возвращает число изменившихся строк.
+        """
+        items = items[:size]
+        values = self._columns(items, size)
+        ids = np.array([item.item_id.encode() for item in items] + [b""] * (size - len(items)), dtype=ITEM_ID_DTYPE)
+
+        current = self.values[:, start : start + size]
+        same = ((current == values) | (np.isnan(current) & np.isnan(values))).all(axis=0)
+        changed = np.flatnonzero(~(same & (self.item_ids[start : start + size] == ids)))
+        if changed.size:
+            rows = start + changed
+            self.versions[rows] += 1
+            self.values[:, rows] = values[:, changed]
+            self.item_ids[rows] = ids[changed]
+            self.versions[rows] += 1
+        return int(changed.size)
+
+    def publish(self, worker: int, parsed_at: float):
+        """Отметка окончания тика опросчика: читатель по ней узнаёт о новых данных."""
+        self.published_at[worker] = parsed_at
+        self.ticks[worker] += 1
+
+    # Чтение (главный процесс)
+
+    def generation(self) -> int:
+        return int(self.ticks.sum())
+
+    def read(self) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+        Согласованная копия (item_ids, values) и число строк, которые так и не удалось
+        прочитать целиком за READ_RETRIES попыток (они возвращаются пустыми).
+        """
+        before = self.versions.copy()
+        values = self.values.copy()
+        ids = self.item_ids.copy()
+        after = self.versions.copy()
+        torn = np.flatnonzero((before != after) | (before & 1).astype(bool))
+
+        for _ in range(READ_RETRIES):
+            if not torn.size:
+                break
+            before = self.versions[torn]
+            values[:, torn] = self.values[:, torn]
+            ids[torn] = self.item_ids[torn]
+            after = self.versions[torn]
+            torn = torn[(before != after) | (before & 1).astype(bool)]
+
+        ids[torn] = b""
+        return ids, values, int(torn.size)
+
+
+def materialize(
+    ids: np.ndarray, values: np.ndarray, catalog: Dict[str, CatalogEntry], recorded_at: str
+) -> Tuple[List[MarketItem], int]:
+    """
+    Предметы из прочитанных колонок со статическими полями из каталога. Предмет может на мгновение
+    оказаться на двух страницах у разных опросчиков, поэтому дубли по item_id схлопываются.
+    Возвращает предметы и число строк без записи в каталоге (они будут на следующем тике).
+    """
+    filled = np.flatnonzero(ids != b"")
+    block = values[:, filled]
+    # Пустые значения (NaN -> None) редки: общий путь берёт уже целые числа из NumPy
+    with_nan = set(np.flatnonzero(np.isnan(block).any(axis=0)).tolist())
+    rows = zip(*np.nan_to_num(block).astype(np.int64).tolist())
+    items: Dict[str, MarketItem] = {}
+    missing = 0
+    for position, (item_id, row) in enumerate(zip(ids[filled].tolist(), rows)):
+        item_id = item_id.decode()
+        entry = catalog.get(item_id)
+        if entry is None:
+            missing += 1
+            continue
+        if position in with_nan:
+            row = [_optional_int(value) for value in block[:, position].tolist()]
+        lowest, highest, active, last_price, last_at, low_buy, high_buy, buy_count = row
+        items[item_id] = MarketItem(
+            name=entry.name,
+            type=entry.type,
+            item_id=item_id,
+            tags=entry.tags,
+            asset_url=entry.asset_url,
+            market_info=MarketInfo(
+                lowest_price=lowest,
+                highest_price=highest,
+                active_listings=active,
+                last_sold_price=last_price,
+                last_sold_at=None if last_at is None else _from_micros(last_at),
+                lowest_buy_price=low_buy,
+                highest_buy_price=high_buy,
+                active_buy_count=buy_count,
+                recorded_at=recorded_at,
+            ),
+        )
+    return list(items.values()), missing
@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+import numpy as np
+
+from market_seller.other.models import MarketInfo, MarketItem
+
+# Колонки снимка, которые сравниваются между тиками
+LAST_SOLD_PRICE, ACTIVE_LISTINGS, HIGHEST_PRICE, LAST_SOLD_AT = range(4)
+COLUMNS = 4
+
+
+@dataclass(slots=True)
+class SnapshotDiff:
+    changed: np.ndarray  # Позиции в снимке, где прошла новая продажа с изменением цены/количества
+    price_drops: np.ndarray  # Позиции, где highest_price вырос так, что prev / cur <= порога
+
+
+class SnapshotDiffEngine:
+    """
+    Колоночное сравнение снимков рынка.
+
+    Каждому item_id навсегда назначается строка. Предыдущие значения хранятся в массивах
+    NumPy по строкам, поэтому изменения всего снимка считаются несколькими векторными
+    операциями, а объекты изменений строятся только для сработавших строк.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.rows: Dict[str, int] = {}
+        self._previous = np.full((COLUMNS, capacity), np.nan)
+        self._seen = np.zeros(capacity, dtype=bool)
+
+    def _ensure_capacity(self, size: int):
+        capacity = self._seen.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        previous = np.full((COLUMNS, new_capacity), np.nan)
+        previous[:, :capacity] = self._previous
+        seen = np.zeros(new_capacity, dtype=bool)
+        seen[:capacity] = self._seen
+        self._previous, self._seen = previous, seen
+
+    def _row_indices(self, item_ids: List[str]) -> np.ndarray:
+        rows = self.rows
+        indices = np.empty(len(item_ids), dtype=np.intp)
+        for position, item_id in enumerate(item_ids):
+            row = rows.get(item_id)
+            if row is None:
+                row = rows[item_id] = len(rows)
+            indices[position] = row
+        self._ensure_capacity(len(rows))
+        return indices
+
+    @staticmethod
+    def _columns(infos: List[MarketInfo]) -> np.ndarray:
+        """Текущий снимок в виде матрицы COLUMNS x len(infos); None превращается в NaN."""
+        return np.array(
+            [
+                [info.last_sold_price for info in infos],
+                [info.active_listings for info in infos],
+                [info.highest_price for info in infos],
+                [info.last_sold_at.timestamp() if info.last_sold_at else None for info in infos],
+            ],
+            dtype=np.float64,
+        ).reshape(COLUMNS, len(infos))
+
+    def seed(self, previous_data: Dict[str, MarketInfo]):
+        """Загрузка предыдущего состояния без поиска изменений (например, после перезапуска)."""
+        self.update(self._row_indices(list(previous_data)), self._columns(list(previous_data.values())))
+
+    def update(self, indices: np.ndarray, current: np.ndarray):
+        self._previous[:, indices] = current
+        self._seen[indices] = True
+
+    def diff(self, items: List[MarketItem], difference_ratio: float) -> SnapshotDiff:
+        """Сравнение снимка с предыдущими значениями и запоминание текущего."""
+        indices = self._row_indices([item.item_id for item in items])
+        current = self._columns([item.market_info for item in items])
+        previous = self._previous[:, indices]
+        seen = self._seen[indices]
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # Как и раньше: нужны ненулевые цены последней продажи с обеих сторон
+            has_prices = (current[LAST_SOLD_PRICE] > 0) & (previous[LAST_SOLD_PRICE] > 0)
+            price_change = current[LAST_SOLD_PRICE] - previous[LAST_SOLD_PRICE]
+            active_count_change = previous[ACTIVE_LISTINGS] - current[ACTIVE_LISTINGS]
+            # NaN != NaN: предмет без продаж с обеих сторон не должен считаться изменившимся
+            current_null, previous_null = np.isnan(current[LAST_SOLD_AT]), np.isnan(previous[LAST_SOLD_AT])
+            sold_again = (current_null != previous_null) | (
+                ~current_null & ~previous_null & (current[LAST_SOLD_AT] != previous[LAST_SOLD_AT])
+            )
+            changed = seen & has_prices & ((price_change != 0) | (active_count_change > 0)) & sold_again
+
+            ratio = previous[HIGHEST_PRICE] / current[HIGHEST_PRICE]
+            price_drops = seen & (ratio <= difference_ratio)
+
+        self.update(indices, current)
+        return SnapshotDiff(changed=np.flatnonzero(changed), price_drops=np.flatnonzero(price_drops))
@@ -4,30 +4,35 @@ import threading
 from datetime import datetime, timezone
 from functools import partial
 
-import aiohttp
 import requests
 import telebot
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardButton, InlineKeyboardMarkup
 
 from market_seller import config
 from market_seller.config import SPACE_ID
+from market_seller.other.metrics import metrics
+from market_seller.other.transport import HttpTransport
 from market_seller.other.utils import update_reserved_ids
 
 
 class MarketTelegramBot:
     _is_running = False
 
-    def __init__(self, token: str, market_client, logger, admin_chat_id):
+    def __init__(self, token: str, market_client, logger, admin_chat_id, transport: HttpTransport = None):
         telebot.logger.handlers = []
-        self.bot = telebot.TeleBot(token)
+        # Без токена бот не создаётся: уведомления и команды отключены (например, при работе с mock-сервером)
+        self.bot = telebot.TeleBot(token) if token else None
         self.client = market_client
         self.admin_chat_id = admin_chat_id
         self.loop = None
         self.logger = logger
+        # Картинки грузятся через переданный пул (обычно общий с клиентом маркета) или свой
+        self.transport = transport or HttpTransport(logger, limit=2)
         self._thread = None
         self._stop_event = threading.Event()
         self.price_update_state = {}
-        self._setup_handlers()
+        if self.bot:
+            self._setup_handlers()
 
     def _setup_handlers(self):
         """Настройка обработчиков сообщений"""
@@ -41,6 +46,13 @@ class MarketTelegramBot:
                 reply_markup=keyboard,
             )
 
+        @self.bot.message_handler(commands=["stats"])
+        def stats_command(message):
+            if not self.loop or not self.admin_chat_id or str(message.chat.id) != str(self.admin_chat_id):
+                return
+            # Хранилище ордеров читается только из event loop клиента
+            asyncio.run_coroutine_threadsafe(self._send_stats(message.chat.id), self.loop)
+
         @self.bot.message_handler(content_types=["text"])
         def handle_text(message):
             if not self.loop:
@@ -85,6 +97,17 @@ class MarketTelegramBot:
         keyboard.add(KeyboardButton("Обновить цену"))
         return keyboard
 
+    async def _send_stats(self, chat_id):
+        """Ордера из OrderStateStore клиента и метрики"""
+        orders, inventory = self.client.orders, self.client.inventory
+        orders.expire()
+        text = (
+            f"Ордера: выставлено {orders.selling} (слотов занято {inventory.used} из {inventory.capacity}), "
+            f"заблокировано {len(orders) - orders.selling}, на падении цены {len(orders.price_drops)}, "
+            f"истекло {orders.expired}\n\n"
+        )
+        await self.send_message(chat_id, (text + metrics.render_text())[:4000])
+
     async def _cancel_old_trades(self, chat_id):
         """Отмена старых заказов"""
         if not self.admin_chat_id or not self.bot:
@@ -277,20 +300,18 @@ class MarketTelegramBot:
             return
         await asyncio.get_event_loop().run_in_executor(None, partial(self.bot.send_message, chat_id, text))
 
-    @staticmethod
-    async def _download_image(url):
+    async def _download_image(self, url):
         """Загрузка изображения по URL"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    return await response.read()
-                return None
+        return await self.transport.get_bytes(url)
 
     async def notify_order_created(self, order_data):
         """Уведомление о создании нового заказа с изображением"""
         if not self.admin_chat_id or not self.bot:
             return  # Если бот остановлен, не отправлять уведомления
+        with metrics.timer("stage_seconds", stage="notify"):
+            await self._send_order_notification(order_data)
 
+    async def _send_order_notification(self, order_data):
         message = (
             "🔔 Создан новый заказ:\n\n"
             f"Предмет: {order_data.get('name')}\n"
@@ -338,13 +359,18 @@ class MarketTelegramBot:
     def run(self, loop):
         """Запуск бота в отдельном потоке с указанным event loop"""
         self.loop = loop
+        if not self.bot:
+            self.logger.info("TELEGRAM_TOKEN не задан, бот не запускается")
+            return
         self._stop_event.clear()
         self._thread = threading.Thread(target=self._run_polling, daemon=True)
         self._thread.start()
 
     def stop(self):
-        self.logger.info("Остановка бота...")
         self._stop_event.set()
+        if not self.bot:
+            return
+        self.logger.info("Остановка бота...")
 
         try:
             self.bot.stop_polling()
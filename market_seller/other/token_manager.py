@@ -0,0 +1,219 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+
+from market_seller.config import REFRESH_INTERVAL_MINUTES, TOKEN_REFRESH_AHEAD
+from market_seller.other.auth import UbisoftAuth
+from market_seller.other.utils import play_notification_sound
+
+
+class AsyncTokenManager:
+    """
+    Асинхронная работа с сессиями Ubisoft поверх состояния UbisoftAuth.
+
+    Параллельные запросы на обновление объединяются в одно обновление,
+    фоновая задача обновляет токен заранее, до истечения срока, и передаёт
+    новый тикет подписчикам (например, заголовкам клиента маркета).
+    """
+
+    def __init__(self, auth: UbisoftAuth, logger, refresh_ahead: timedelta = TOKEN_REFRESH_AHEAD):
+        self.auth = auth
+        self.logger = logger
+        self.refresh_ahead = refresh_ahead
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
+        self._last_refresh = datetime.now()
+        self._listeners: List[Callable[[str], None]] = []
+
+    @property
+    def token(self) -> Optional[str]:
+        return self.auth.token
+
+    def add_listener(self, callback: Callable[[str], None]):
+        """Подписка на получение нового тикета после каждого обновления."""
+        self._listeners.append(callback)
+        if self.auth.token:
+            callback(self.auth.token)
+
+    def _notify_listeners(self):
+        for callback in self._listeners:
+            try:
+                callback(self.auth.token)
+            except Exception as e:
+                self.logger.error(f"Ошибка при передаче нового токена: {e}")
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=15))
+        return self.session
+
+    async def _post_sessions(self, headers: Dict[str, str]) -> Dict[str, Any]:
+        """POST /profiles/sessions. Ответ с ошибкой обрабатывается так же, как в UbisoftAuth."""
+        session = await self._get_session()
+        url = f"{self.auth.base_url}/profiles/sessions"
+        try:
+            async with session.post(url, headers=headers, json={"rememberMe": True}) as response:
+                response_data = await response.json(content_type=None) or {}
+                if response.status != 200:
+                    self.auth._handle_authentication_response(response_data)
+                    response_data.setdefault("error", f"HTTP {response.status}")
+                return response_data
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # Сетевые ошибки не сбрасывают сохранённые тикеты
+            return {"error": str(e)}
+
+    def start(self):
+        """Запуск фонового обновления токена до истечения срока."""
+        if self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        """Остановка фонового обновления и закрытие HTTP-сессии."""
+        for task in (self._timer_task, self._refresh_task):
+            if task and not task.done():
+                task.cancel()
+        self._timer_task = None
+        self._refresh_task = None
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    def _seconds_until_refresh(self) -> float:
+        deadline = self._last_refresh + timedelta(minutes=REFRESH_INTERVAL_MINUTES)
+        if self.auth.token_expiry:
+            deadline = min(deadline, self.auth.token_expiry - self.refresh_ahead)
+        return max((deadline - datetime.now()).total_seconds(), 0)
+
+    async def _refresh_loop(self):
+        """Фоновый цикл обновления токена."""
+        while True:
+            await asyncio.sleep(self._seconds_until_refresh())
+            try:
+                result = await self.refresh()
+                if "ticket" not in result:
+                    # Не даём циклу крутиться вхолостую, если сервер недоступен
+                    await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.error(f"Ошибка в цикле обновления токена: {e}")
+                await asyncio.sleep(60)
+
+    async def refresh(self, prefer_remember_me: bool = False) -> Dict[str, Any]:
+        """
+        Обновление токена с объединением параллельных вызовов:
+        пока идёт одно обновление, остальные ждут его результат.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh(prefer_remember_me))
+        return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self, prefer_remember_me: bool) -> Dict[str, Any]:
+        methods = [self.refresh_token, self.refresh_session_with_remember_me]
+        if prefer_remember_me:
+            methods.reverse()
+
+        response_data = {}
+        for method in methods:
+            response_data = await method()
+            if "ticket" in response_data:
+                break
+        return response_data
+
+    def _apply_tokens(self, response_data: Dict[str, Any]):
+        self.auth._update_tokens_and_headers(response_data)
+        self._last_refresh = datetime.now()
+        self._notify_listeners()
+
+    async def refresh_token(self) -> Dict[str, Any]:
+        """Обновление токена с использованием текущего токена."""
+        if not self.auth.token:
+            return {"error": "Нет доступного токена"}
+
+        response_data = await self._post_sessions(self.auth._prepare_auth_headers(self.auth.token))
+        if "ticket" in response_data:
+            self._apply_tokens(response_data)
+        elif "error" in response_data:
+            self.logger.error(f"Ошибка запроса при обновлении токена: {response_data['error']}")
+            play_notification_sound()
+        return response_data
+
+    async def refresh_session_with_remember_me(self) -> Dict[str, Any]:
+        """Обновление сессии с помощью remember_me_ticket."""
+        if not self.auth.remember_me_ticket:
+            return {"error": "Отсутствует remember_me_ticket"}
+
+        response_data = await self._post_sessions(
+            self.auth._prepare_auth_headers(remember_me=self.auth.remember_me_ticket)
+        )
+        if "ticket" in response_data:
+            self._apply_tokens(response_data)
+        return response_data
+
+    async def is_token_expired(self) -> bool:
+        """Проверка, истёк ли текущий токен."""
+        if not self.auth.token or not self.auth.token_expiry:
+            return True
+
+        if datetime.now() > self.auth.token_expiry:
+            return True
+
+        session = await self._get_session()
+        try:
+            async with session.get(f"{self.auth.base_url}/profiles/me", headers=self.auth.headers) as response:
+                return response.status != 200
+        except Exception as e:
+            self.logger.error(f"Ошибка при проверке токена: {e}")
+            return True
+
+    async def ensure_valid_token(self) -> bool:
+        """Проверка и обновление токена, если это необходимо."""
+        if not await self.is_token_expired():
+            return True
+
+        try:
+            if "ticket" in await self.refresh():
+                return True
+        except Exception as e:
+            self.logger.error(f"Ошибка при обновлении токена: {e}")
+            play_notification_sound()
+
+        self.auth.clear_saved_data()
+        return False
+
+    async def basic_auth(self, email: str, password: str) -> Dict[str, Any]:
+        """Выполнение базовой аутентификации."""
+        auth_base64 = base64.b64encode(f"{email}:{password}".encode()).decode()
+        headers = self.auth._prepare_auth_headers()
+        headers["Authorization"] = f"Basic {auth_base64}"
+
+        response_data = await self._post_sessions(headers)
+        if "error" in response_data:
+            return response_data
+
+        self.auth.two_factor_ticket = response_data.get("twoFactorAuthenticationTicket")
+        self.auth.session_id = response_data.get("sessionId")
+        if "ticket" in response_data:
+            self._apply_tokens(response_data)
+        else:
+            self.auth.save_token(None, self.auth.session_id, self.auth.two_factor_ticket, None)
+        return response_data
+
+    async def complete_2fa(self, code: str) -> Dict[str, Any]:
+        """Завершение двухфакторной аутентификации."""
+        if not self.auth.two_factor_ticket:
+            self.logger.warning("Двухфакторный тикет отсутствует")
+            raise Exception
+
+        headers = self.auth._prepare_auth_headers()
+        headers["Ubi-2FACode"] = str(code)
+        headers["Authorization"] = f"ubi_2fa_v1 t={self.auth.two_factor_ticket}"
+
+        response_data = await self._post_sessions(headers)
+        if "ticket" in response_data:
+            self._apply_tokens(response_data)
+        return response_data
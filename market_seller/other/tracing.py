@@ -0,0 +1,123 @@
+import json
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Deque, Dict, List, Optional
+
+from market_seller.config import TRACE_BUFFER_SIZE, TRACE_SLOW_FILE, TRACE_SLOW_THRESHOLD
+from market_seller.other.metrics import metrics
+
+# Этапы реакции: (название, начальная отметка, конечная отметка)
+STAGES = (
+    ("sale_to_receive", "sold_at", "received_at"),
+    ("parse", "received_at", "parsed_at"),
+    ("decide", "parsed_at", "decided_at"),
+    ("queue", "decided_at", "sent_at"),
+    ("mutation", "sent_at", "acked_at"),
+    ("internal", "received_at", "acked_at"),
+    ("total", "sold_at", "acked_at"),
+)
+
+
+@dataclass(slots=True)
+class ReactionTrace:
+    """
+    Путь одного изменения от продажи на рынке до подтверждённого ордера.
+    Все отметки - time.time() в секундах; sold_at - время сервера (last_sold_at).
+    """
+
+    item_id: str
+    name: str
+    sold_at: Optional[float]
+    received_at: float
+    parsed_at: float
+    decided_at: Optional[float] = None
+    sent_at: Optional[float] = None
+    acked_at: Optional[float] = None
+    outcome: Optional[str] = None
+
+    def mark(self, stage: str):
+        setattr(self, stage, time.time())
+
+    def durations(self) -> Dict[str, float]:
+        result = {}
+        for stage, start, end in STAGES:
+            started, finished = getattr(self, start), getattr(self, end)
+            if started is not None and finished is not None:
+                result[stage] = finished - started
+        return result
+
+
+class ReactionTracer:
+    """
+    Кольцевой буфер завершённых трасс реакции с перцентилями по этапам.
+
+    Трассы дольше slow_threshold (от получения снимка до подтверждения ордера) дописываются
+    в slow_file построчно в JSON, чтобы разобрать их после запуска.
+    """
+
+    def __init__(
+        self,
+        logger,
+        size: int = TRACE_BUFFER_SIZE,
+        slow_threshold: float = TRACE_SLOW_THRESHOLD,
+        slow_file: Optional[str] = TRACE_SLOW_FILE,
+    ):
+        self.logger = logger
+        self.traces: Deque[ReactionTrace] = deque(maxlen=size)
+        self.slow_threshold = slow_threshold
+        self.slow_file = slow_file
+        self.slow_traces = 0
+
+    @staticmethod
+    def start(item_id: str, name: str, sold_at: Optional[datetime], received_at: float, parsed_at: float):
+        return ReactionTrace(
+            item_id=item_id,
+            name=name,
+            sold_at=sold_at.timestamp() if sold_at else None,
+            received_at=received_at,
+            parsed_at=parsed_at,
+        )
+
+    def finish(self, trace: ReactionTrace, outcome: str):
+        trace.outcome = outcome
+        if trace.acked_at is None:
+            trace.mark("acked_at")
+        self.traces.append(trace)
+
+        durations = trace.durations()
+        for stage, seconds in durations.items():
+            metrics.observe("reaction_seconds", seconds, stage=stage)
+        if durations.get("internal", 0) > self.slow_threshold:
+            self.slow_traces += 1
+            self._dump(trace, durations)
+
+    def _dump(self, trace: ReactionTrace, durations: Dict[str, float]):
+        if not self.slow_file:
+            return
+        try:
+            with open(self.slow_file, "a", encoding="utf-8") as file:
+                file.write(json.dumps({**asdict(trace), "durations": durations}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            self.logger.warning(f"Не удалось записать медленную трассу: {e}")
+
+    def percentiles(self, quantiles=(0.5, 0.95, 0.99)) -> Dict[str, List[float]]:
+        """Перцентили длительностей по этапам для трасс в буфере."""
+        samples: Dict[str, List[float]] = {}
+        for trace in self.traces:
+            for stage, seconds in trace.durations().items():
+                samples.setdefault(stage, []).append(seconds)
+
+        result = {}
+        for stage, _, _ in STAGES:
+            values = sorted(samples.get(stage, ()))
+            if values:
+                result[stage] = [values[min(int(len(values) * q), len(values) - 1)] for q in quantiles]
+        return result
+
+    def summary(self) -> str:
+        lines = [f"Трасс реакции: {len(self.traces)}, медленных: {self.slow_traces}"]
+        for stage, (p50, p95, p99) in self.percentiles().items():
+            lines.append(f"{stage}: p50 {p50 * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс, p99 {p99 * 1000:.0f} мс")
+        return "\n".join(lines)
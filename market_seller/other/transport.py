@@ -0,0 +1,119 @@
+import asyncio
+import time
+from functools import lru_cache
+from typing import Dict, Optional
+
+import aiohttp
+
+from market_seller.config import (
+    HTTP_DNS_CACHE_TTL,
+    HTTP_KEEPALIVE_TIMEOUT,
+    HTTP_POOL_SIZE,
+    HTTP_TIMEOUTS,
+)
+
+READ = "read"
+MUTATION = "mutation"
+ASSET = "asset"
+
+
+@lru_cache(maxsize=64)
+def operation_class(query: str) -> str:
+    """Класс GraphQL-операции для выбора таймаута: мутация или чтение."""
+    return MUTATION if query.lstrip().startswith("mutation") else READ
+
+
+class HttpTransport:
+    """
+    Общий пул HTTP-соединений: keep-alive коннектор по размеру лимита параллельных запросов,
+    кэш DNS и таймауты по классам операций. Живёт всё время работы процесса, в том числе при
+    обновлении сессии раз в RESTART_INTERVAL, и может использоваться и для API маркета,
+    и для загрузки картинок. TCP_NODELAY aiohttp включает на каждом соединении сам.
+
+    Соединения, простоявшие keepalive_timeout, закрываются, поэтому keep_warm заново прогревает
+    пул, если запросов через него не было дольше половины этого срока (used_at отмечает клиент).
+    """
+
+    def __init__(
+        self,
+        logger,
+        limit: int = HTTP_POOL_SIZE,
+        keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT,
+        dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+        timeouts: Dict[str, Dict[str, float]] = HTTP_TIMEOUTS,
+    ):
+        self.logger = logger
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeouts = {name: aiohttp.ClientTimeout(**values) for name, values in timeouts.items()}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.used_at = 0.0  # time.monotonic() последнего ответа через пул
+        self._keep_warm_task: Optional[asyncio.Task] = None
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """Сессия пула; создаётся при первом обращении внутри event loop."""
+        if self.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+                enable_cleanup_closed=True,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeouts[READ])
+        return self._session
+
+    def timeout(self, operation: str) -> aiohttp.ClientTimeout:
+        return self.timeouts.get(operation, self.timeouts[READ])
+
+    async def _open_connection(self, url: str):
+        async with self.session.head(url, timeout=self.timeouts[MUTATION]) as response:
+            await response.read()
+        self.used_at = time.monotonic()
+
+    async def warm(self, url: str, connections: int) -> int:
+        """
+        Заранее открывает до connections соединений с хостом url (параллельные HEAD-запросы),
+        чтобы первый ордер не ждал TCP и TLS рукопожатий. Возвращает число удачных.
+        """
+        results = await asyncio.gather(
+            *(self._open_connection(url) for _ in range(connections)), return_exceptions=True
+        )
+        opened = sum(1 for result in results if not isinstance(result, BaseException))
+        self.logger.debug(f"Прогрето соединений с {url}: {opened}/{connections}")
+        return opened
+
+    def keep_warm(self, url: str, connections: int):
+        """Запуск фонового прогрева пула после простоя, чтобы ордер не ждал новых соединений."""
+        if self._keep_warm_task is None or self._keep_warm_task.done():
+            self._keep_warm_task = asyncio.create_task(self._keep_warm_loop(url, connections))
+
+    async def _keep_warm_loop(self, url: str, connections: int):
+        interval = self.keepalive_timeout / 2
+        while True:
+            idle = time.monotonic() - self.used_at
+            if idle >= interval:
+                await self.warm(url, connections)
+                idle = 0
+            await asyncio.sleep(interval - idle)
+
+    async def get_bytes(self, url: str) -> Optional[bytes]:
+        """Загрузка файла (картинки предмета) через общий пул."""
+        async with self.session.get(url, timeout=self.timeouts[ASSET]) as response:
+            self.used_at = time.monotonic()
+            if response.status == 200:
+                return await response.read()
+            return None
+
+    async def close(self):
+        if self._keep_warm_task:
+            self._keep_warm_task.cancel()
+            self._keep_warm_task = None
+        if self._session:
+            await self._session.close()
+            self._session = None
@@ -12,6 +12,7 @@ from typing import TypeVar
 import winsound
 
 from market_seller import config
+from market_seller.other.metrics import metrics
 
 T = TypeVar("T")
 DEFAULT_SOUND_PATH = r"C:\Windows\Media\Windows Logon.wav"
@@ -61,6 +62,7 @@ def async_retry(max_retries=3, delay=1, exceptions=(Exception,)):
                 except exceptions as e:
                     if attempt == max_retries - 1:
                         raise
+                    metrics.inc("retries_total", function=func.__name__)
                     # logging.warning(f"Retry {attempt + 1}: {e}")
                     await asyncio.sleep(delay)
 
@@ -74,63 +76,49 @@ def update_reserved_ids(item_id):
 
 
 def timing_decorator(func):
+    """Замер времени выполнения функции в гистограмму function_seconds."""
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        start_time = time.perf_counter()
-        result = func(*args, **kwargs)
-        end_time = time.perf_counter()
-        print(f"Функция {func.__name__} выполнялась {end_time - start_time:.6f} секунд")
-        return result
+        with metrics.timer("function_seconds", function=func.__name__):
+            return func(*args, **kwargs)
 
     return wrapper
 
 
 def async_timing_decorator(func):
+    """То же, что timing_decorator, но и для корутин."""
     if asyncio.iscoroutinefunction(func):
 
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            start_time = time.perf_counter()
-            result = await func(*args, **kwargs)
-            end_time = time.perf_counter()
-            print(f"Функция {func.__name__} выполнялась {end_time - start_time:.6f} секунд")
-            return result
-
-    else:
+            with metrics.timer("function_seconds", function=func.__name__):
+                return await func(*args, **kwargs)
 
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            start_time = time.perf_counter()
-            result = func(*args, **kwargs)
-            end_time = time.perf_counter()
-            print(f"Функция {func.__name__} выполнялась {end_time - start_time:.6f} секунд")
-            return result
-
-    return wrapper
+        return wrapper
+    return timing_decorator(func)
 
 
 def profile_calls(func):
     """Декоратор для замера времени выполнения всех вызовов функций внутри обёрнутой функции."""
 
-    def tracer(frame, event, arg):
-        if event == "call":
-            func_name = frame.f_code.co_name
-            start_time = time.perf_counter()
-
-            def tracer_return(frame, event, arg):
-                if event == "return":
-                    elapsed_time = time.perf_counter() - start_time
-                    print(f"Функция {func_name} выполнялась {elapsed_time:.6f} секунд")
-                    sys.setprofile(tracer)  # Возвращаем основной обработчик
-
-            sys.setprofile(tracer_return)  # Переключаемся на замер завершения функции
-
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
+        # Стек времён начала: вложенные вызовы закрываются в обратном порядке
+        started = []
+
+        def tracer(frame, event, arg):
+            if event == "call":
+                started.append(time.perf_counter())
+            elif event == "return" and started:
+                metrics.observe("function_seconds", time.perf_counter() - started.pop(), function=frame.f_code.co_name)
+
+        previous = sys.getprofile()
         sys.setprofile(tracer)
         try:
             return func(*args, **kwargs)
         finally:
-            sys.setprofile(None)  # Убираем профилирование после выполнения
+            sys.setprofile(previous)
 
     return wrapper
 
@@ -139,11 +127,8 @@ def async_profile_calls(func):
     """Декоратор, измеряющий время выполнения всех асинхронных вызовов внутри обёрнутой функции."""
 
     async def timing_wrapper(coro, func_name):
-        start_time = time.perf_counter()
-        result = await coro
-        elapsed_time = time.perf_counter() - start_time
-        print(f"Функция {func_name} выполнялась {elapsed_time:.6f} секунд")
-        return result
+        with metrics.timer("function_seconds", function=func_name):
+            return await coro
 
     @functools.wraps(func)
     async def wrapper(*args, **kwargs):
@@ -0,0 +1,30 @@
+import gzip
+import os
+import pickle
+import time
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+
+def save_state(path: str, state: Dict[str, Any]):
+    """Атомарная запись снимка состояния: сначала во временный файл, затем замена."""
+    tmp_path = f"{path}.tmp"
+    with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+        pickle.dump({"saved_at": time.time(), "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_state(path: str, max_age: timedelta) -> Optional[Dict[str, Any]]:
+    """
+    Загрузка снимка состояния. Слишком старый снимок не используется:
+    сравнение с давно устаревшими ценами дало бы ложные срабатывания.
+    """
+    if not os.path.exists(path):
+        return None
+
+    with gzip.open(path, "rb") as f:
+        data = pickle.load(f)
+
+    if time.time() - data["saved_at"] > max_age.total_seconds():
+        return None
+    return data["state"]
@@ -0,0 +1,224 @@
+"""
+Воспроизведение записанных ответов API (CAPTURE_FILE) через parse_market_data и MarketAnalyzer.analyze.
+
+Ордера не отправляются: ReplayMarketClient только запоминает их. Пороги анализа задаются
+аргументами, поэтому их можно подбирать на записях за несколько дней за секунды.
+
+    python replay.py capture.jsonl.gz                       # максимально быстро
+    python replay.py capture.jsonl.gz --speed 1             # в реальном времени
+    python replay.py capture.jsonl.gz --significant-price-change 800 --extreme-price-change 5000
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import argparse
+import asyncio
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from config import *
+from market_seller import config
+from market_seller.analyzer import AnalyzerParams, MarketAnalyzer
+from market_seller.market_client import AsyncUbisoftMarketClient
+from market_seller.other.capture import read_capture
+from market_seller.other.models import CatalogEntry
+from market_seller.other.inventory import InventoryModel
+from market_seller.other.order_state import OrderStateStore
+from market_seller.other.rate_limiter import Priority
+from market_seller.other.requests_params import RequestsParams
+from market_seller.other.utils import setup_logger
+
+SELLABLE_OPERATIONS = ("GetSellableItems", "GetSellableItemsBatch", "GetSellableItemsHot", "GetSellableItemsHotBatch")
+CATALOG_OPERATIONS = ("GetSellableItemsCatalog", "GetSellableItemsCatalogBatch")
+
+
+@dataclass
+class ReplayTick:
+    t: float  # time.monotonic() записи первого ответа тика
+    wall: float  # time.time() записи первого ответа тика
+    run: Optional[float] = None  # Запуск, записавший тик (t сравнимо только внутри запуска)
+    seq: Optional[int] = None  # Номер тика опроса в запуске (нет в записях старых версий)
+    pages: Dict[tuple, Dict] = field(default_factory=dict)  # (offset, фильтр, сортировка) -> ответ страницы
+
+
+class ReplayMarketClient(AsyncUbisoftMarketClient):
+    """Клиент без сети: разбор ответов наследуется, запросы только записываются."""
+
+    def __init__(self, logger):
+        # Токен и HTTP-сессия не нужны, поэтому инициализация родителя не вызывается
+        self.logger = logger
+        self.catalog: Dict[str, CatalogEntry] = {}
+        self.now = 0.0  # time.time() записи текущего тика
+        # Ордера живут и истекают по записанному времени, как в бэктесте
+        self.orders = OrderStateStore(clock=lambda: self.now)
+        # Ордера воспроизведения не исполняются: лимит слотов обрезал бы вывод на SELL_SLOTS
+        # ордерах, поэтому здесь он не действует (бэктест его задаёт)
+        self.inventory = InventoryModel(self.orders, logger, capacity=sys.maxsize)
+        self.sell_slot_wait = 0  # Записанное время не идёт, пока ордер ждёт: без свободного слота сразу отказ
+        self.requests: List[tuple] = []
+        self._trade_seq = 0
+
+    async def execute_query(self, query: str, variables: dict, priority: Priority = Priority.NORMAL) -> Dict:
+        self.requests.append((query, variables))
+        self._trade_seq += 1
+        trade = {"id": f"replay-{self._trade_seq}", "tradeId": f"replay-{self._trade_seq}", "state": "Created"}
+        if query is RequestsParams.CREATE_SELL_ORDER_REQUEST:
+            return {"createSellOrder": {"trade": trade}}
+        if query is RequestsParams.CANCEL_OLD_TRADE_QUERY:
+            return {"cancelOrder": {"trade": trade}}
+        if query is RequestsParams.UPDATE_SELL_ORDER_REQUEST:
+            return {"updateSellOrder": {"trade": trade}}
+        return {}
+
+
+def _page_key(variables: Dict, suffix="") -> tuple:
+    """Страница определяется смещением, фильтром и сортировкой (общими или своими для страницы)."""
+    return (
+        variables.get(f"offset{suffix}") or 0,
+        json.dumps(variables.get(f"filterBy{suffix}", variables.get("filterBy")), sort_keys=True),
+        json.dumps(variables.get(f"sortBy{suffix}", variables.get("sortBy")), sort_keys=True),
+    )
+
+
+def _pages(record: Dict) -> Iterator[tuple]:
+    """Пары (ключ страницы, ответ страницы) из записи одиночного или объединённого запроса."""
+    data = record["data"].get("data")
+    if not data:
+        return
+    variables = record.get("variables") or {}
+    if record["op"].endswith("Batch"):
+        index = 0
+        while f"offset{index}" in variables:
+            yield _page_key(variables, index), {"game": data.get(f"page{index}") or {}}
+            index += 1
+    else:
+        yield _page_key(variables), data
+
+
+def read_ticks(path: str, catalog: Optional[Dict[str, CatalogEntry]] = None) -> Iterator[ReplayTick]:
+    """
+    Группировка записанных страниц по тикам опроса: по запуску и номеру тика из записи.
+    В записях без номера тика новый тик начинается, когда повторяется страница.
+    Ответы с проекцией catalog пополняют catalog: они записаны сразу после страниц своего тика.
+    """
+    tick = None
+    for record in read_capture(path):
+        if record["op"] in CATALOG_OPERATIONS and catalog is not None:
+            for _, page in _pages(record):
+                for node in AsyncUbisoftMarketClient._nodes(page):
+                    catalog[node["item"]["itemId"]] = CatalogEntry.from_item(node["item"])
+            continue
+        if record["op"] not in SELLABLE_OPERATIONS:
+            continue
+        run, seq = record.get("run"), record.get("tick")
+        for key, page in _pages(record):
+            if tick is None or ((tick.run, tick.seq) != (run, seq) if seq is not None else key in tick.pages):
+                if tick is not None:
+                    yield tick
+                tick = ReplayTick(t=record["t"], wall=record["wall"], run=run, seq=seq)
+            tick.pages[key] = page
+    if tick is not None:
+        yield tick
+
+
+async def replay(path: str, params: AnalyzerParams, sell_price: int, speed: float, logger) -> Dict:
+    client = ReplayMarketClient(logger)
+    analyzer = MarketAnalyzer(client, logger, params=params)
+    analyzer.start()
+
+    ticks = items_count = changes_count = 0
+    recorded_seconds = 0.0
+    last_tick = None
+    started = time.perf_counter()
+    try:
+        for tick in read_ticks(path, client.catalog):
+            # Между запусками в одном файле пауза не воспроизводится и в записанное время не входит
+            if last_tick is not None and tick.run == last_tick.run:
+                gap = max(tick.t - last_tick.t, 0)
+                recorded_seconds += gap
+                if speed:
+                    await asyncio.sleep(gap / speed)
+            last_tick = tick
+            client.now = tick.wall
+
+            recorded_at = datetime.fromtimestamp(tick.wall, tz=timezone.utc).replace(tzinfo=None).isoformat()
+            items = [
+                item
+                for _, page in sorted(tick.pages.items())
+                for item in client.parse_market_data(page, recorded_at)
+            ]
+            changes = await analyzer.analyze(items, sell_price=sell_price)
+            # Ордера исполняются до следующего тика, как при живом опросе с запасом по времени
+            await analyzer.dispatcher.join()
+
+            ticks += 1
+            items_count += len(items)
+            changes_count += len(changes)
+    finally:
+        await analyzer.stop()
+
+    sell_orders = [
+        variables for query, variables in client.requests if query is RequestsParams.CREATE_SELL_ORDER_REQUEST
+    ]
+    return {
+        "ticks": ticks,
+        "items": items_count,
+        "changes": changes_count,
+        "sell_orders": len(sell_orders),
+        "orders_by_price": Counter(variables["paymentOptions"][0]["price"] for variables in sell_orders),
+        "cancels": sum(query is RequestsParams.CANCEL_OLD_TRADE_QUERY for query, _ in client.requests),
+        "recorded_seconds": recorded_seconds,
+        "elapsed_seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="Файл, записанный при CAPTURE_FILE")
+    parser.add_argument("--speed", type=float, default=0, help="0 - максимально быстро, 1 - в реальном времени")
+    parser.add_argument("--sell-price", type=int, default=SELL_PRICE)
+    parser.add_argument("--significant-price-change", type=int, default=SIGNIFICANT_PRICE_CHANGE)
+    parser.add_argument("--significant-active-count-change", type=int, default=SIGNIFICANT_ACTIVE_COUNT_CHANGE)
+    parser.add_argument("--extreme-price-change", type=int, default=EXTREME_PRICE_CHANGE)
+    parser.add_argument("--difference-sell-price", type=float, default=DIFFERENCE_SELL_PRICE)
+    parser.add_argument("--verbose", action="store_true", help="Выводить лог анализатора")
+    args = parser.parse_args()
+
+    config.USE_SOUND = False
+    logger = setup_logger(name="market_replay")
+    logger.setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    params = AnalyzerParams(
+        significant_price_change=args.significant_price_change,
+        significant_active_count_change=args.significant_active_count_change,
+        extreme_price_change=args.extreme_price_change,
+        difference_sell_price=args.difference_sell_price,
+    )
+    result = asyncio.run(replay(args.capture, params, args.sell_price, args.speed, logger))
+
+    print(f"Параметры: {params}")
+    print(
+        f"Тиков: {result['ticks']}, предметов: {result['items']}, изменений: {result['changes']}, "
+        f"отмен по падению цены: {result['cancels']}"
+    )
+    print(f"Ордеров на продажу: {result['sell_orders']}")
+    for price, count in sorted(result["orders_by_price"].items()):
+        print(f"  {price:>7}: {count}")
+    elapsed = result["elapsed_seconds"]
+    print(
+        f"Записано {result['recorded_seconds']:.0f} с, воспроизведено за {elapsed:.2f} с "
+        f"({result['ticks'] / elapsed if elapsed else 0:.0f} тиков/с)"
+    )
+
+
+if __name__ == "__main__":
+    main()
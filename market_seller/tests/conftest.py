@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Модули скрипта импортируются и как market_seller.*, и напрямую (from config import *)
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
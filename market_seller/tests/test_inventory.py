@@ -0,0 +1,126 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+import pytest
+
+from market_seller.other.inventory import ALREADY_SELLING, NO_FREE_SLOTS, NOT_OWNED, InventoryModel, OrderRejected
+from market_seller.other.order_state import OrderStateStore
+
+logger = logging.getLogger("test_inventory")
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _inventory(capacity: int = 1, clock=None) -> InventoryModel:
+    return InventoryModel(OrderStateStore(ttl=timedelta(seconds=60), clock=clock or Clock()), logger, capacity)
+
+
+async def _no_recheck():
+    pass
+
+
+def _marketable_node(item_id: str, owned: bool, quantity: int = 1, trade: dict = None) -> dict:
+    return {
+        "item": {"itemId": item_id, "viewer": {"meta": {"isOwned": owned, "quantity": quantity}}},
+        "viewer": {"meta": {"activeTrade": trade}},
+    }
+
+
+def test_waiter_is_woken_on_release():
+    async def scenario():
+        inventory = _inventory()
+        await inventory.acquire("a", 1, _no_recheck)
+        waiter = asyncio.ensure_future(inventory.acquire("b", 10, _no_recheck))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        inventory.release()
+        # Без пробуждения ожидающий проснулся бы только через SELL_SLOT_RECHECK
+        await asyncio.wait_for(waiter, 0.5)
+        assert inventory.used == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiter_is_woken_when_order_leaves_store():
+    async def scenario():
+        inventory = _inventory()
+        inventory.orders.record_order("a", "t1", 100)
+        waiter = asyncio.ensure_future(inventory.acquire("b", 10, _no_recheck))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+
+        inventory.orders.remove_trade("t1")
+        await asyncio.wait_for(waiter, 0.5)
+
+    asyncio.run(scenario())
+
+
+def test_acquire_rejects_with_no_free_slots_after_wait():
+    async def scenario():
+        inventory = _inventory()
+        inventory.orders.record_order("a", "t1", 100)
+        with pytest.raises(OrderRejected) as error:
+            await inventory.acquire("b", 0.05, _no_recheck)
+        assert error.value.code == NO_FREE_SLOTS
+        assert inventory.used == 1
+
+    asyncio.run(scenario())
+
+
+def test_item_blocked_while_waiting_is_rejected():
+    async def scenario():
+        inventory = _inventory()
+        await inventory.acquire("a", 1, _no_recheck)
+        waiter = asyncio.ensure_future(inventory.acquire("b", 10, _no_recheck))
+        await asyncio.sleep(0.01)
+
+        # Пока ордер ждал слота, сервер ответил на другой запрос, что предмет уже выставлен
+        inventory.orders.block("b", ALREADY_SELLING)
+        inventory.release()
+        with pytest.raises(OrderRejected) as error:
+            await asyncio.wait_for(waiter, 0.5)
+        assert error.value.code == ALREADY_SELLING
+
+    asyncio.run(scenario())
+
+
+def test_check_uses_observed_ownership_until_ttl():
+    clock = Clock()
+    inventory = _inventory(capacity=5, clock=clock)
+    inventory.observe_marketable(
+        [
+            _marketable_node("gone", owned=False),
+            _marketable_node("listed", owned=True, trade={"tradeId": "t1", "category": "Sell"}),
+            _marketable_node("free", owned=True),
+        ]
+    )
+
+    with pytest.raises(OrderRejected) as error:
+        inventory.check("gone")
+    assert error.value.code == NOT_OWNED
+    with pytest.raises(OrderRejected) as error:
+        inventory.check("listed")
+    assert error.value.code == ALREADY_SELLING
+    inventory.check("free")
+
+    clock.now += 60
+    inventory.check("gone")
+
+
+def test_no_free_slots_lowers_capacity():
+    inventory = _inventory(capacity=5)
+    inventory.orders.record_order("a", "t1", 100)
+    inventory.orders.record_order("b", "t2", 100)
+
+    inventory.on_no_free_slots()
+
+    assert inventory.capacity == 2
+    assert inventory.full
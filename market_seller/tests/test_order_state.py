@@ -0,0 +1,88 @@
+from datetime import timedelta
+
+from market_seller.other.order_state import BLOCKED, SELLING, OrderStateStore
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _trade(trade_id: str, item_id: str, price: int = 100) -> dict:
+    return {"tradeId": trade_id, "tradeItems": [{"item": {"itemId": item_id}}], "paymentProposal": {"price": price}}
+
+
+def test_record_expires_after_ttl():
+    clock = Clock()
+    store = OrderStateStore(ttl=timedelta(seconds=60), clock=clock)
+    released = []
+    store.listeners.append(released.append)
+    store.record_order("a", "t1", 100)
+
+    clock.now += 59
+    assert store.get("a").state == SELLING
+    assert store.expire() == 0
+
+    clock.now += 1
+    assert store.expire() == 1
+    assert store.get("a") is None
+    assert store.by_trade("t1") is None
+    assert store.selling == 0
+    assert store.expired == 1
+    assert [record.item_id for record in released] == ["a"]
+
+
+def test_get_expires_lazily():
+    clock = Clock()
+    store = OrderStateStore(ttl=timedelta(seconds=60), clock=clock)
+    store.block("a", "{'code': 1895}")
+
+    clock.now += 60
+
+    assert "a" not in store
+    assert len(store) == 0
+    assert store.expired == 1
+
+
+def test_block_keeps_selling_record():
+    store = OrderStateStore(clock=Clock())
+    store.record_order("a", "t1", 100)
+
+    assert store.block("a").state == SELLING
+    assert store.block("b").state == BLOCKED
+    assert store.selling == 1
+
+
+def test_reconcile_removes_trades_gone_from_server():
+    clock = Clock()
+    store = OrderStateStore(clock=clock)
+    store.record_order("sold", "t1", 100)
+    store.record_order("kept", "t2", 100)
+    clock.now += 10
+    as_of = clock.now
+    # Ордер выставлен после запроса списка: сервер мог ещё не вернуть его
+    clock.now += 1
+    store.record_order("fresh", "t3", 100)
+
+    added, removed = store.reconcile([_trade("t2", "kept"), _trade("t4", "new", 150)], as_of)
+
+    assert (added, removed) == (1, 1)
+    assert store.by_trade("t1") is None
+    assert store.get("kept").trade_id == "t2"
+    assert store.get("fresh").trade_id == "t3"
+    assert store.get("new").price == 150
+    assert store.selling == 3
+
+
+def test_reconcile_keeps_active_trade_until_next_check():
+    clock = Clock()
+    store = OrderStateStore(ttl=timedelta(seconds=60), clock=clock)
+    store.record_order("a", "t1", 100)
+
+    store.reconcile([_trade("t1", "a")], clock.now)
+    clock.now += 120
+
+    assert store.get("a") is not None
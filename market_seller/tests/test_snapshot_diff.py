@@ -0,0 +1,100 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from market_seller.other.models import MarketInfo, MarketItem
+from market_seller.other.snapshot_diff import SnapshotDiffEngine
+
+DIFFERENCE_RATIO = 0.8
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def _calculate_market_changes(current: MarketInfo, previous: MarketInfo) -> bool:
+    """Поштучная проверка из Analyzer до перехода на SnapshotDiffEngine."""
+    if not (current.last_sold_price and previous.last_sold_price):
+        return False
+    price_change = current.last_sold_price - previous.last_sold_price
+    active_count_change = previous.active_listings - current.active_listings
+    return (abs(price_change) > 0 or active_count_change > 0) and current.last_sold_at != previous.last_sold_at
+
+
+def _is_price_drop(current: MarketInfo, previous: MarketInfo) -> bool:
+    if not (current.highest_price and previous.highest_price):
+        return False
+    return previous.highest_price / current.highest_price <= DIFFERENCE_RATIO
+
+
+def _info(last_sold_price, active_listings, highest_price, last_sold_at) -> MarketInfo:
+    return MarketInfo(
+        lowest_price=None,
+        highest_price=highest_price,
+        active_listings=active_listings,
+        last_sold_price=last_sold_price,
+        last_sold_at=last_sold_at,
+        lowest_buy_price=0,
+        highest_buy_price=0,
+        active_buy_count=0,
+        recorded_at="",
+    )
+
+
+def _item(item_id: str, info: MarketInfo) -> MarketItem:
+    return MarketItem(name=item_id, type="Skin", item_id=item_id, tags=(), asset_url=None, market_info=info)
+
+
+def _random_info(rng: random.Random) -> MarketInfo:
+    sold_at = rng.choice([None, BASE_TIME, BASE_TIME + timedelta(minutes=rng.randint(1, 3))])
+    return _info(
+        last_sold_price=rng.choice([None, 0, 100, 150]),
+        active_listings=rng.randint(0, 3),
+        highest_price=rng.choice([None, 100, 120, 200]),
+        last_sold_at=sold_at,
+    )
+
+
+def _expected(items, previous):
+    changed, price_drops = [], []
+    for position, item in enumerate(items):
+        before = previous.get(item.item_id)
+        if before is None:
+            continue
+        if _calculate_market_changes(item.market_info, before):
+            changed.append(position)
+        if _is_price_drop(item.market_info, before):
+            price_drops.append(position)
+    return changed, price_drops
+
+
+def test_items_without_sales_are_not_changed():
+    engine = SnapshotDiffEngine()
+    engine.seed({"a": _info(100, 3, 100, None)})
+
+    diff = engine.diff([_item("a", _info(150, 2, 100, None))], DIFFERENCE_RATIO)
+
+    assert diff.changed.tolist() == []
+
+
+def test_first_sale_is_changed():
+    engine = SnapshotDiffEngine()
+    engine.seed({"a": _info(100, 3, 100, None)})
+
+    diff = engine.diff([_item("a", _info(150, 3, 100, BASE_TIME))], DIFFERENCE_RATIO)
+
+    assert diff.changed.tolist() == [0]
+
+
+def test_parity_with_per_item_check():
+    rng = random.Random(6)
+    item_ids = [f"item-{i}" for i in range(200)]
+    engine = SnapshotDiffEngine(capacity=16)
+    previous = {}
+
+    for _ in range(20):
+        # Часть предметов выпадает из снимка, новые появляются без предыдущего состояния
+        items = [_item(item_id, _random_info(rng)) for item_id in item_ids if rng.random() < 0.9]
+        expected_changed, expected_drops = _expected(items, previous)
+
+        diff = engine.diff(items, DIFFERENCE_RATIO)
+
+        assert diff.changed.tolist() == expected_changed
+        assert diff.price_drops.tolist() == expected_drops
+        previous.update({item.item_id: item.market_info for item in items})